@@ -0,0 +1,171 @@
+"""
+Semantic answer cache for the unified AI path.
+
+Members ask the same questions in many phrasings ("water on 17", "ball in the
+water on seventeen"). Each AI answer is stored next to its normalized query
+embedding; a later question whose embedding is within a cosine threshold of a
+stored one - with the same knowledge-base version and the same guard (hole and
+rule numbers) - reuses the stored answer instead of calling the chat model.
+
+Entries live in each process, but invalidation is shared: invalidate() bumps a
+generation counter in shared memory, and every cache created in a process forked
+from the one that imported this module (the gunicorn workers of a preloaded app)
+drops its entries on its next lookup or store. Separate instances (e.g. Cloud Run
+scale-out) each need their own invalidation.
+
+Configuration (environment):
+    ANSWER_CACHE_ENABLED       "true"/"false" (default true)
+    ANSWER_CACHE_THRESHOLD     cosine similarity needed for a hit (default 0.95)
+    ANSWER_CACHE_MAX_ENTRIES   stored answers before LRU eviction (default 512)
+    ANSWER_CACHE_TTL_SECONDS   answer lifetime (default 7 days)
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+DEFAULT_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+DEFAULT_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Invalidation generation, in shared memory inherited by forked workers
+_SHARED_GENERATION = multiprocessing.Value("Q", 0)
+
+
+def compute_kb_version(*sources) -> str:
+    """Short content hash of the knowledge-base sources; changes whenever any rule text does."""
+    digest = hashlib.sha256()
+    for source in sources:
+        # Artifact-backed views hash the same as the module literals they were built from
+        if isinstance(source, Mapping) and not isinstance(source, dict):
+            source = dict(source)
+        elif isinstance(source, Sequence) and not isinstance(source, (list, str)):
+            source = list(source)
+        digest.update(json.dumps(source, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+class SemanticAnswerCache:
+    """Fixed-capacity matrix of query embeddings with their stored answers."""
+
+    def __init__(self, threshold: float = None, max_entries: int = None, ttl_seconds: float = None, kb_version: str = ""):
+        self.threshold = DEFAULT_THRESHOLD if threshold is None else threshold
+        self.max_entries = DEFAULT_MAX_ENTRIES if max_entries is None else max_entries
+        self.ttl_seconds = DEFAULT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.kb_version = kb_version
+
+        self._vectors = None                       # (max_entries, dim), allocated on first store
+        self._entries = [None] * self.max_entries  # slot -> entry dict
+        self._lock = threading.Lock()
+        self._generation = _SHARED_GENERATION.value
+
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    def lookup(self, query_vector: np.ndarray, kb_version: str, guard=None) -> Optional[Dict]:
+        """Return the stored payload for the closest valid entry above threshold, or None."""
+        with self._lock:
+            self._sync_generation()
+            if self._vectors is None or kb_version != self.kb_version:
+                self.counters["misses"] += 1
+                return None
+
+            now = time.time()
+            scores = self._vectors @ query_vector
+
+            # Only entries above threshold are checked, best first
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for slot in candidates[np.argsort(-scores[candidates])]:
+                entry = self._entries[slot]
+                if (entry is None or entry["guard"] != guard
+                        or now - entry["created_at"] > self.ttl_seconds):
+                    continue
+
+                entry["last_used"] = now
+                entry["hits"] += 1
+                self.counters["hits"] += 1
+
+                payload = dict(entry["payload"])
+                payload["cache_similarity"] = round(float(scores[slot]), 4)
+                payload["cached_question"] = entry["question"]
+                return payload
+
+            self.counters["misses"] += 1
+            return None
+
+    def store(self, query_vector: np.ndarray, question: str, payload: Dict, kb_version: str, guard=None):
+        """Store an answer, evicting the least recently used entry when full."""
+        with self._lock:
+            self._sync_generation()
+            if kb_version != self.kb_version:
+                return
+
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(query_vector)), dtype=np.float32)
+
+            free = [slot for slot, entry in enumerate(self._entries) if entry is None]
+            if free:
+                slot = free[0]
+            else:
+                slot = min(range(self.max_entries), key=lambda i: self._entries[i]["last_used"])
+                self.counters["evictions"] += 1
+
+            now = time.time()
+            self._vectors[slot] = query_vector
+            self._entries[slot] = {
+                "question": question,
+                "payload": dict(payload),
+                "guard": guard,
+                "created_at": now,
+                "last_used": now,
+                "hits": 0
+            }
+            self.counters["stores"] += 1
+
+    def invalidate(self, kb_version: str = None):
+        """
+        Drop every stored answer, here and (on their next use) in every sibling worker;
+        call when the knowledge base (or its version) changes.
+        """
+        with _SHARED_GENERATION.get_lock():
+            _SHARED_GENERATION.value += 1
+            generation = _SHARED_GENERATION.value
+        with self._lock:
+            self._clear(generation)
+            if kb_version is not None:
+                self.kb_version = kb_version
+        logger.info(f" Answer cache invalidated (kb_version={self.kb_version})")
+
+    def _sync_generation(self):
+        """Drop entries invalidated by another process (call with self._lock held)."""
+        generation = _SHARED_GENERATION.value
+        if generation != self._generation:
+            self._clear(generation)
+            logger.info(f" Answer cache invalidated by another worker (generation {generation})")
+
+    def _clear(self, generation: int):
+        self._entries = [None] * self.max_entries
+        if self._vectors is not None:
+            self._vectors[:] = 0
+        self._generation = generation
+        self.counters["invalidations"] += 1
+
+    def stats(self) -> Dict:
+        """Counters and sizes for /api/health."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["size"] = sum(1 for entry in self._entries if entry is not None)
+        stats["max_entries"] = self.max_entries
+        stats["threshold"] = self.threshold
+        stats["kb_version"] = self.kb_version
+        return stats
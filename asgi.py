@@ -0,0 +1,164 @@
+"""
+ASGI entry point: native async /api/ask, every other route served by the Flask app.
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+POST /api/ask (JSON answers) runs on the event loop through AsyncGolfPipeline:
+the query embedding starts as soon as the question is parsed (unless the lexical
+index alone decides the search), definition and template matching run alongside
+it, and the embeddings/chat calls are awaited on an AsyncOpenAI client instead of
+holding a worker thread each. The response body
+is the same JSON the Flask handler returns.
+
+Everything else - /api/ask with Accept: text/event-stream, /api/ask/stream,
+/api/health, /metrics, admin routes and CORS preflights - goes to web_api.app
+through asgiref's WsgiToAsgi adapter.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+from asgiref.wsgi import WsgiToAsgi
+from openai import AsyncOpenAI
+
+import web_api
+from async_pipeline import AsyncGolfPipeline
+from query_analysis import QueryAnalysis
+
+logger = logging.getLogger(__name__)
+
+wsgi_app = WsgiToAsgi(web_api.app)
+
+
+def get_async_pipeline():
+    """Process-wide async pipeline over the simplified system, or None if it is not ready."""
+    pipeline = web_api.app.extensions.get('golf_async_pipeline')
+    if pipeline is None and web_api.simplified_system is not None:
+        pipeline = AsyncGolfPipeline(web_api.simplified_system, AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")))
+        web_api.app.extensions['golf_async_pipeline'] = pipeline
+    return pipeline
+
+
+async def answer_question(question):
+    """The /api/ask answer for a question, as the Flask handler builds it."""
+    start_time = time.time()
+    logger.info(f" Question: {question}")
+
+    # A worker that came up without the AI system retries (rate-limited, see web_api)
+    await asyncio.to_thread(web_api.retry_ai_system_init)
+
+    # Analyze the question once for every stage of this request
+    analysis = QueryAnalysis(question)
+
+    use_simplified = web_api.ai_system_available and web_api.USE_SIMPLIFIED_SYSTEM
+    pipeline = get_async_pipeline() if use_simplified else None
+
+    # Speculative: embed while the definition and template checks run (not for queries
+    # with a decisive lexical match, which the search answers without an embedding)
+    embedding = pipeline.start_embedding(question, analysis) if pipeline else None
+    try:
+        definition_id = await asyncio.to_thread(web_api.detect_definition_query, question, analysis)
+        if definition_id:
+            logger.info(f" Definition query detected: {definition_id}")
+            response_data = web_api.build_definition_answer(definition_id, question, start_time)
+            if response_data:
+                return response_data
+
+        if web_api.ai_system_available:
+            try:
+                if pipeline:
+                    logger.info(" Using SIMPLIFIED system (async)")
+                    result = await pipeline.process_query(question, verbose=True, analysis=analysis,
+                                                          embedding=embedding)
+                else:
+                    logger.info(" Using ORIGINAL hybrid system")
+                    result = await asyncio.to_thread(web_api.get_hybrid_interpretation, question, True, analysis)
+                return web_api.build_ai_answer(question, result, start_time)
+
+            except Exception as e:
+                logger.error(f" Hybrid system error: {str(e)}")
+                # Fall through to fallback
+
+        # Fallback if AI unavailable
+        return web_api.build_fallback_answer(question, start_time)
+    finally:
+        if embedding is not None:
+            embedding.cancel()
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def _send_json(send, status, data, headers):
+    # Same serialization as flask.jsonify
+    body = web_api.app.json.response(data).get_data()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())] + headers,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def ask_question(scope, receive, send):
+    """Native async POST /api/ask."""
+    request_headers = dict(scope.get('headers') or [])
+    # flask-cors allows any origin on every route; keep that for the native route
+    headers = [(b'access-control-allow-origin', b'*')] if b'origin' in request_headers else []
+
+    try:
+        data = json.loads(await _read_body(receive) or b'null')
+        question = data.get('question', '').strip()
+
+        if not question:
+            await _send_json(send, 400, {
+                'success': False,
+                'error': 'Question is required'
+            }, headers)
+            return
+
+        await _send_json(send, 200, await answer_question(question), headers)
+
+    except Exception as e:
+        logger.error(f" API Error: {str(e)}")
+        await _send_json(send, 500, {
+            'success': False,
+            'error': f'Failed to process question: {str(e)}',
+            'timestamp': datetime.now().isoformat()
+        }, headers)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http' and scope['path'] == '/api/ask' and scope['method'] == 'POST':
+        accept = dict(scope.get('headers') or []).get(b'accept', b'')
+        # Clients that accept Server-Sent Events get the Flask streaming variant
+        if b'text/event-stream' not in accept:
+            await ask_question(scope, receive, send)
+            return
+
+    await wsgi_app(scope, receive, send)
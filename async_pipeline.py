@@ -0,0 +1,115 @@
+"""
+Asyncio pipeline for the simplified system, used by the native /api/ask in asgi.py.
+
+Same stages and results as SimplifiedGolfRulesSystem.process_query, with two
+differences:
+
+- the query embedding is started speculatively as soon as the question arrives,
+  while template and definition matching run, and is cancelled if a fast path
+  answers (templates and definitions never need it). Queries the search answers
+  without an embedding (a decisive lexical match, see lexical_index.py) never
+  start one;
+- the embeddings and chat calls are awaited on an AsyncOpenAI client, so one
+  event loop holds many in-flight LLM calls without a thread per request.
+
+CPU-bound stages (matching, search, context building) run in worker threads via
+asyncio.to_thread so the loop keeps driving other requests' network I/O.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from metrics import timed
+from query_analysis import QueryAnalysis
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncGolfPipeline:
+    """Awaitable process_query over a SimplifiedGolfRulesSystem."""
+
+    def __init__(self, system: Any, async_client: Any):
+        self.system = system
+        self.search_engine = system.search_engine
+        self.async_client = async_client
+
+    def start_embedding(self, question: str, analysis: Optional[QueryAnalysis] = None) -> asyncio.Future:
+        """
+        Begin embedding the question now; await the result for the vector (or None).
+        Already None, with no embeddings call, when the search would not use the vector.
+        """
+        if not self.search_engine.needs_query_embedding(question, analysis):
+            skipped = asyncio.get_running_loop().create_future()
+            skipped.set_result(None)
+            return skipped
+        return asyncio.create_task(self.search_engine.embed_query_async(question, self.async_client))
+
+    async def process_query(self, question: str, verbose: bool = False,
+                            analysis: Optional[QueryAnalysis] = None,
+                            embedding: Optional[asyncio.Future] = None) -> Dict:
+        """
+        Async process_query. embedding is the result of start_embedding if the caller
+        already started one; it is cancelled when a fast path answers.
+        """
+        system = self.system
+        start_time = time.time()
+        query_id = f"q_{int(time.time()*1000)}"
+        system._log_query_start(query_id, question)
+        analysis = QueryAnalysis.of(question, analysis)
+
+        if embedding is None:
+            embedding = self.start_embedding(question, analysis)
+
+        try:
+            # STAGE 1 + 2 run while the embedding request is in flight
+            instant_result = await asyncio.to_thread(system._check_fast_paths, question, verbose, query_id, analysis)
+            if instant_result:
+                result = system._format_response(instant_result, start_time, query_id)
+                system._log_query_complete(query_id, question, result)
+                return result
+
+            # STAGE 3: Unified AI with exception handling
+            if verbose:
+                logger.info(f" [{query_id}] Using unified AI with exception checking")
+            ai_result = await self._unified_ai_response(question, verbose, query_id, analysis, embedding)
+        finally:
+            embedding.cancel()
+
+        result = system._format_response(ai_result, start_time, query_id)
+        system._log_query_complete(query_id, question, result)
+        return result
+
+    async def _unified_ai_response(self, question: str, verbose: bool, query_id: str,
+                                   analysis: QueryAnalysis, embedding: asyncio.Future) -> Dict:
+        system = self.system
+        try:
+            # Only the part of the embedding call not hidden behind stages 1 + 2
+            with timed('embedding_wait'):
+                query_vector = await embedding
+
+            request = await asyncio.to_thread(system._prepare_ai_request, question, verbose, query_id,
+                                              analysis, query_vector)
+            if 'cached_result' in request:
+                return request['cached_result']
+
+            with timed('llm'):
+                response = await self.async_client.chat.completions.create(
+                    model=system.model,
+                    messages=system._unified_messages(request['prompt']),
+                    temperature=0.1,
+                    max_tokens=400
+                )
+
+            # Enrich AI response with local rule templates where relevant
+            answer = response.choices[0].message.content
+            with timed('enrichment'):
+                answer = system._enrich_ai_response(answer, question, analysis)
+
+            tokens_used = response.usage.total_tokens if response.usage else 0
+            return system._finish_ai_response(request, answer, tokens_used, response.usage)
+
+        except Exception as e:
+            logger.error(f" [{query_id}] Unified AI error: {e}")
+            return system._ai_error_result(e)
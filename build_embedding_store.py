@@ -0,0 +1,56 @@
+"""
+Bake the rule and intent-example embeddings into the embedding store (see embedding_store.py).
+
+    python build_embedding_store.py
+
+Run in the Docker build so every instance starts from a populated store instead of
+re-embedding the rulebook on the API. The OpenAI key comes from OPENAI_API_KEY or,
+in the Docker build, from the BuildKit secret mounted at /run/secrets/openai_api_key,
+so it never ends up in an image layer. Without a key the step is skipped and
+instances embed at startup as before.
+"""
+
+import logging
+import os
+import sys
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SECRET_PATH = "/run/secrets/openai_api_key"
+
+
+def main():
+    if not os.getenv("OPENAI_API_KEY") and os.path.exists(SECRET_PATH):
+        with open(SECRET_PATH) as f:
+            os.environ["OPENAI_API_KEY"] = f.read().strip()
+    if not os.getenv("OPENAI_API_KEY"):
+        logger.warning(" No OpenAI key - embedding store not baked, instances will embed at startup")
+        return 0
+
+    start = time.time()
+    # Importing the app builds the search engine, which fills the store
+    import web_api
+    from embedding_store import DEFAULT_STORE_DIR
+
+    if not DEFAULT_STORE_DIR:
+        logger.error(" EMBEDDING_STORE_DIR is empty - nothing to bake")
+        return 1
+
+    engine = web_api.get_search_engine()
+    if engine.is_degraded():
+        logger.error(" Rule embeddings could not be computed - embedding store not baked")
+        return 1
+    classifier = web_api.get_intent_classifier()
+    if not classifier.is_ready():
+        logger.error(" Intent examples could not be embedded - embedding store not baked")
+        return 1
+
+    logger.info(f" Embedding store baked in {DEFAULT_STORE_DIR}: {len(engine.embedding_store)} rule chunks "
+                f"({engine.embedder.name}) in {time.time() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""
+Build the compiled knowledge-base artifact (see kb_artifact.py).
+
+    python build_kb_artifact.py [output path]
+
+Run after any change to golf_rules_data.py or golf_clarifications_db.py; a stale
+artifact is detected at startup and ignored in favour of the Python modules.
+"""
+
+import logging
+import sys
+import time
+
+import kb_artifact
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else kb_artifact.DEFAULT_ARTIFACT_PATH
+    if not path:
+        logger.error(" No artifact path (KB_ARTIFACT_PATH is empty)")
+        return 1
+
+    start = time.time()
+    from golf_rules_data import RULES_DATABASE
+    from golf_clarifications_db import USGA_CLARIFICATIONS
+
+    header = kb_artifact.build_artifact(path, RULES_DATABASE, USGA_CLARIFICATIONS, kb_artifact.source_hashes())
+
+    # Round-trip check: the artifact must hold exactly the module data
+    artifact = kb_artifact.KnowledgeBaseArtifact(path)
+    if list(artifact.rules) != RULES_DATABASE or dict(artifact.clarifications) != USGA_CLARIFICATIONS:
+        logger.error(f" {path} does not round-trip the source data (non-JSON values?)")
+        return 1
+
+    logger.info(f" Wrote {path}: {len(RULES_DATABASE)} rules, {len(USGA_CLARIFICATIONS)} clarification groups, "
+                f"content {header['content_hash'][:12]} in {time.time() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
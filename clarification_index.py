@@ -0,0 +1,117 @@
+"""
+Inverted index over the USGA clarifications used by context building.
+
+Context building used to walk every clarification key for each rule in the
+results and lowercase each clarification's text for every query. The index is
+built once:
+
+- rule id -> clarifications: keys are kept sorted, so the clarifications filed
+  under a rule or any of its sub-rules (key == id or key.startswith(id), the
+  matching context building has always used) are one contiguous slice;
+- term -> postings: the clarifications whose title + text contains a question
+  term, computed on first use against the precomputed lowercase text and kept.
+
+Scoring then only touches the candidate clarifications for the rules in play.
+"""
+
+import bisect
+import threading
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple
+
+# Characters of clarification text that term matching and the context each see
+MATCH_TEXT_CHARS = 800
+CONTEXT_TEXT_CHARS = 1000
+
+# Distinct terms whose postings are kept (question vocabulary is open-ended)
+MAX_CACHED_TERMS = 20000
+
+
+class Clarification(NamedTuple):
+    """One clarification with its match text and context block rendered once."""
+    position: int       # database order, used to break score ties
+    id: str
+    rule_key: str
+    match_text: str     # lowercased title + first MATCH_TEXT_CHARS of text
+    context_text: str   # block injected into the prompt context
+
+
+class ClarificationIndex:
+    """Rule-id and term lookups over a {rule_id: [clarification, ...]} database."""
+
+    def __init__(self, clarifications_db: Dict[str, List[Dict]]):
+        self.entries: List[Clarification] = []
+        self._by_key: Dict[str, range] = {}
+        for rule_key, clar_list in (clarifications_db or {}).items():
+            start = len(self.entries)
+            for clar in clar_list:
+                self.entries.append(Clarification(
+                    position=len(self.entries),
+                    id=clar['id'],
+                    rule_key=rule_key,
+                    match_text=(clar['title'] + ' ' + clar['text'][:MATCH_TEXT_CHARS]).lower(),
+                    context_text=f"USGA Clarification {clar['id']}: {clar['title']}\n{clar['text'][:CONTEXT_TEXT_CHARS]}",
+                ))
+            self._by_key[rule_key] = range(start, len(self.entries))
+
+        self._sorted_keys = sorted(self._by_key)
+        self._postings: Dict[str, FrozenSet[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def positions_for_rule(self, rule_id: str) -> List[int]:
+        """Clarifications filed under rule_id or any key starting with it."""
+        keys = self._sorted_keys
+        start = bisect.bisect_left(keys, rule_id)
+        positions = []
+        for key in keys[start:]:
+            if not key.startswith(rule_id):
+                break
+            positions.extend(self._by_key[key])
+        return positions
+
+    def postings(self, term: str) -> FrozenSet[int]:
+        """Positions of clarifications whose match text contains term (substring match)."""
+        found = self._postings.get(term)
+        if found is None:
+            found = frozenset(entry.position for entry in self.entries if term in entry.match_text)
+            with self._lock:
+                if len(self._postings) >= MAX_CACHED_TERMS:
+                    self._postings.clear()
+                self._postings[term] = found
+        return found
+
+    def score(self, rule_ids: Iterable[str], terms: List[str], min_terms: int = 2) -> List[Dict]:
+        """
+        Clarifications for the given rules matching at least min_terms question terms.
+
+        Returns [{'id', 'score', 'terms', 'text'}] best first; equal scores keep
+        database order, and a clarification id filed under two rules appears once.
+        """
+        candidates = set()
+        for rule_id in rule_ids:
+            candidates.update(self.positions_for_rule(rule_id))
+        if not candidates or len(terms) < min_terms:
+            return []
+
+        term_postings = [(term, self.postings(term)) for term in terms]
+        scored = []
+        seen_ids = set()
+        for position in sorted(candidates):
+            matching_terms = [term for term, posting in term_postings if position in posting]
+            if len(matching_terms) < min_terms:
+                continue
+            entry = self.entries[position]
+            if entry.id in seen_ids:
+                continue
+            seen_ids.add(entry.id)
+            scored.append({
+                'id': entry.id,
+                'score': len(matching_terms),
+                'terms': matching_terms,
+                'text': entry.context_text,
+            })
+
+        scored.sort(key=lambda x: x['score'], reverse=True)
+        return scored
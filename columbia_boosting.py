@@ -0,0 +1,148 @@
+"""
+Columbia CC search boosting, compiled from the declarative COLUMBIA_CC_BOOST_RULES.
+
+Every boost's trigger terms (and hole mentions) go into one phrase automaton and a
+term -> boosts index, and every target is resolved to the engine rows it hits. Per
+query, a single scan of the search text picks the boosts that can fire, their hole
+and term conditions are checked, and each active boost multiplies its target rows
+of the score vector in one numpy update. Boosts apply in declaration order, so the
+scores are the same as applying them one by one to each result. The rows an
+active boost lifts (promoted_rows) join the search's candidate pool, so a boosted
+target is returned even when its unboosted score ranks outside the top-k.
+
+Adding or editing a boost is a data change in columbia_cc_local_rules_db.py.
+"""
+
+import logging
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from columbia_cc_local_rules_db import COLUMBIA_CC_BOOST_RULES
+from pattern_matcher import PhraseAutomaton
+from query_analysis import QueryAnalysis
+
+logger = logging.getLogger(__name__)
+
+
+class BoostTarget(NamedTuple):
+    label: str              # rule id, or a description of the match
+    rows: np.ndarray        # engine rows the multiplier applies to
+    multiplier: float
+
+
+class CompiledBoost(NamedTuple):
+    name: str
+    any_terms: Tuple[str, ...]
+    all_terms: Tuple[str, ...]
+    none_terms: Tuple[str, ...]
+    holes: FrozenSet[int]
+    hole_mentions: Tuple[str, ...]  # hole numbers as text, if mentions count
+    targets: Tuple[BoostTarget, ...]
+
+
+def _target_rows(selector, rules: List[Dict]) -> Tuple[str, np.ndarray]:
+    """Label and rows of the rules a target selector matches."""
+    if isinstance(selector, str):
+        return selector, np.array([i for i, rule in enumerate(rules) if rule['id'] == selector], dtype=np.intp)
+
+    def matches(rule):
+        if 'id_contains' in selector and selector['id_contains'] not in rule['id']:
+            return False
+        if 'title_contains' in selector and selector['title_contains'] not in rule['title'].lower():
+            return False
+        if 'text_contains' in selector and selector['text_contains'] not in rule['text'].lower():
+            return False
+        if 'official' in selector and selector['official'] == rule['is_local']:
+            return False
+        return True
+
+    label = ', '.join(f"{key}={value}" for key, value in selector.items())
+    return label, np.array([i for i, rule in enumerate(rules) if matches(rule)], dtype=np.intp)
+
+
+class ColumbiaBooster:
+    """Declarative Columbia CC boosts compiled against the search engine's rule rows."""
+
+    def __init__(self, rules: List[Dict], boost_rules: List[Dict] = None):
+        boost_rules = COLUMBIA_CC_BOOST_RULES if boost_rules is None else boost_rules
+        self.boosts: List[CompiledBoost] = []
+        for spec in boost_rules:
+            holes = frozenset(spec.get('holes') or ())
+            targets = []
+            for selector, multiplier in spec['targets']:
+                label, rows = _target_rows(selector, rules)
+                if not len(rows):
+                    logger.warning(f" Columbia boost '{spec['name']}': target {label} matches no rule")
+                targets.append(BoostTarget(label, rows, float(multiplier)))
+            self.boosts.append(CompiledBoost(
+                name=spec['name'],
+                any_terms=tuple(spec.get('any', ())),
+                all_terms=tuple(spec.get('all', ())),
+                none_terms=tuple(spec.get('none', ())),
+                holes=holes,
+                hole_mentions=tuple(sorted(str(hole) for hole in holes)) if spec.get('hole_mentions') else (),
+                targets=tuple(targets),
+            ))
+
+        # Trigger index: a boost can only fire if one of its 'any' terms (or, failing
+        # that, its 'all' terms) is in the text; boosts with neither are always checked
+        self._triggers: Dict[str, List[int]] = {}
+        self._always: List[int] = []
+        terms = set()
+        for index, boost in enumerate(self.boosts):
+            terms.update(boost.any_terms + boost.all_terms + boost.none_terms + boost.hole_mentions)
+            keys = boost.any_terms or boost.all_terms
+            if not keys:
+                self._always.append(index)
+            for term in keys:
+                self._triggers.setdefault(term, []).append(index)
+        self.automaton = PhraseAutomaton(terms)
+
+        logger.info(f" Compiled {len(self.boosts)} Columbia CC boosts over {len(terms)} trigger terms")
+
+    def active_boosts(self, analysis: QueryAnalysis, hole_number: Optional[int] = None) -> List[CompiledBoost]:
+        """Boosts that fire for this query, in declaration order."""
+        hits = analysis.phrase_hits(self.automaton, analysis.search_lower)
+        if hole_number is None:
+            hole_number = analysis.hole_number
+
+        candidates = set(self._always)
+        for term in hits.positions:
+            candidates.update(self._triggers.get(term, ()))
+
+        active = []
+        for index in sorted(candidates):
+            boost = self.boosts[index]
+            if boost.any_terms and not hits.any(boost.any_terms):
+                continue
+            if not all(term in hits for term in boost.all_terms) or hits.any(boost.none_terms):
+                continue
+            if boost.holes and hole_number not in boost.holes and not hits.any(boost.hole_mentions):
+                continue
+            active.append(boost)
+        return active
+
+    def promoted_rows(self, boosts: List[CompiledBoost]) -> np.ndarray:
+        """Rows the given boosts lift (multiplier > 1); they join the candidate pool like local rules do."""
+        rows = [target.rows for boost in boosts for target in boost.targets if target.multiplier > 1.0]
+        return np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.intp)
+
+    def apply(self, scores: np.ndarray, analysis: QueryAnalysis, hole_number: Optional[int] = None,
+              verbose: bool = False, boosts: Optional[List[CompiledBoost]] = None) -> np.ndarray:
+        """Boosted float64 copy of a per-rule score vector (boosts: active_boosts, if already known)."""
+        boosted = scores.astype(np.float64)
+        if boosts is None:
+            boosts = self.active_boosts(analysis, hole_number)
+        for boost in boosts:
+            if verbose:
+                logger.info(f" Columbia CC: {boost.name} boost (hole {hole_number or analysis.hole_number or 'unknown'})")
+            for target in boost.targets:
+                if verbose and len(target.rows) == 1:
+                    row = target.rows[0]
+                    logger.info(f"   - {target.label}: {boosted[row]:.3f}  ->  {boosted[row] * target.multiplier:.3f} "
+                                f"({target.multiplier}x)")
+                elif verbose:
+                    logger.info(f"   - {target.label}: {len(target.rows)} rules ({target.multiplier}x)")
+                boosted[target.rows] *= target.multiplier
+        return boosted
@@ -577,26 +577,93 @@ COLUMBIA_CC_LOCAL_RULES = {
     }
 }
 
+# Search boosts for known Columbia CC problem scenarios, applied in order (see columbia_boosting.py).
+# A boost fires when the search text contains at least one 'any' term, every 'all' term and no
+# 'none' term, and - if 'holes' is given - the query is about one of those holes ('hole_mentions'
+# also accepts the hole number appearing anywhere in the text). Each target is a rule id or a
+# match on the rule ('id_contains', 'title_contains', 'text_contains', 'official'), with its multiplier.
+BRIDGE_TERMS = ['bridge', 'cart bridge', 'footbridge']
+
+COLUMBIA_CC_BOOST_RULES = [
+    {
+        'name': 'purple line',
+        'any': ['purple line'],
+        'targets': [('CCC-6', 3.0)]
+    },
+    {
+        # Must come before cart path
+        'name': 'bridge',
+        'any': BRIDGE_TERMS,
+        'targets': [('CCC-15', 4.0)]
+    },
+    {
+        'name': 'bridge near penalty area dropping zones',
+        'any': BRIDGE_TERMS,
+        'holes': [13, 16, 17, 18],
+        'hole_mentions': True,
+        'targets': [
+            ('CCC-2', 4.0),
+            ('CCC-4', 0.3),
+            ({'id_contains': '16.1', 'official': True}, 0.4)
+        ]
+    },
+    {
+        'name': 'cart path behind 12 green',
+        'any': ['cart path', 'path', 'road', 'unpaved road'],
+        'all': ['behind', 'green'],
+        'none': BRIDGE_TERMS,
+        'holes': [12],
+        'targets': [('CCC-4', 5.0), ('CCC-10', 0.3)]
+    },
+    {
+        'name': 'cart path behind 14/17 green',
+        'any': ['cart path', 'path', 'road', 'unpaved road'],
+        'all': ['behind', 'green'],
+        'none': BRIDGE_TERMS,
+        'holes': [14, 17],
+        'targets': [('CCC-4', 3.0), ('CCC-10', 0.3)]
+    },
+    {
+        'name': 'water on holes 15-18',
+        'any': ['water', 'penalty area', 'pond', 'creek', 'hazard'],
+        'holes': [15, 16, 17, 18],
+        'targets': [('CCC-2', 4.0), ('CCC-1', 0.4)]
+    },
+    {
+        'name': 'construction fence',
+        'any': ['construction', 'purple line', 'boundary'],
+        'all': ['fence'],
+        'targets': [
+            ('CCC-6', 4.0),
+            ({'title_contains': 'obstruction', 'text_contains': 'free relief'}, 0.4)
+        ]
+    },
+    {
+        'name': 'left side penalty area on holes 2-4',
+        'any': ['left', 'left side', 'left of', 'tall grass', 'unmaintained', 'fescue'],
+        'holes': [2, 3, 4],
+        'targets': [('CCC-3', 4.0), ('CCC-1', 0.3)]
+    }
+]
+
+# Local rule id -> rule, and the rules that apply on every hole (built once at import)
+LOCAL_RULES_BY_ID = {}
+for _rule in COLUMBIA_CC_LOCAL_RULES['local_rules']:
+    LOCAL_RULES_BY_ID.setdefault(_rule['id'], _rule)
+del _rule
+ALL_HOLES_LOCAL_RULES = [rule for rule in COLUMBIA_CC_LOCAL_RULES['local_rules'] if rule.get('holes') == 'all']
+
 # Update helper functions to work with new structure
 def get_local_rules_for_hole(hole_number):
     """Get all local rules that apply to a specific hole."""
     hole_str = str(hole_number)
-    rules = []
     
     # Get hole-specific rules
-    if hole_str in COLUMBIA_CC_LOCAL_RULES['hole_specific_rules']:
-        rule_ids = COLUMBIA_CC_LOCAL_RULES['hole_specific_rules'][hole_str]
-        for rule_id in rule_ids:
-            # Find rule in the list
-            for rule in COLUMBIA_CC_LOCAL_RULES['local_rules']:
-                if rule['id'] == rule_id:
-                    rules.append(rule)
-                    break
+    rule_ids = COLUMBIA_CC_LOCAL_RULES['hole_specific_rules'].get(hole_str, [])
+    rules = [LOCAL_RULES_BY_ID[rule_id] for rule_id in rule_ids if rule_id in LOCAL_RULES_BY_ID]
     
     # Add rules that apply to all holes (if any)
-    for rule in COLUMBIA_CC_LOCAL_RULES['local_rules']:
-        if rule.get('holes') == 'all':
-            rules.append(rule)
+    rules.extend(ALL_HOLES_LOCAL_RULES)
     
     return rules
 
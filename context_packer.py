@@ -0,0 +1,122 @@
+"""
+Token-budgeted packing of the rules context sent to the unified prompt.
+
+Context building produces fragments (primary rules, related exception rules,
+USGA clarifications), each with a priority. The packer fills the budget greedily
+by priority, skipping fragments that no longer fit, and emits the chosen ones in
+their original order under their section headers. The highest-priority fragment
+is always kept so the model never gets an empty context.
+
+Priorities:
+    primary rule     retrieval similarity, + EXCEPTION_BONUS if it carries exceptions
+    related rule     RELATED_RULE_PRIORITY, + EXCEPTION_BONUS if it carries exceptions
+    clarification    CLARIFICATION_PRIORITY + CLARIFICATION_TERM_WEIGHT per matched term
+
+Tokens are estimated at ~4 characters per token (the same estimate used for
+streamed answers without usage data).
+
+Configuration (environment):
+    CONTEXT_TOKEN_BUDGET   max context tokens (default 3000; 0 = unlimited)
+"""
+
+import logging
+import os
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+EXCEPTION_BONUS = 0.15
+RELATED_RULE_PRIORITY = 0.45
+CLARIFICATION_PRIORITY = 0.40
+CLARIFICATION_TERM_WEIGHT = 0.05
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+class ContextFragment(NamedTuple):
+    """One packable piece of context."""
+    section: Optional[str]  # header line emitted before the section's first fragment, or None
+    text: str
+    priority: float
+    label: str              # rule or clarification id, for logging
+
+
+class PackedContext(NamedTuple):
+    text: str
+    included: List[ContextFragment]
+    dropped: List[ContextFragment]
+    included_tokens: int
+    dropped_tokens: int
+
+
+def rule_priority(similarity: float, has_exceptions: bool) -> float:
+    return similarity + (EXCEPTION_BONUS if has_exceptions else 0.0)
+
+
+def related_rule_priority(has_exceptions: bool) -> float:
+    return RELATED_RULE_PRIORITY + (EXCEPTION_BONUS if has_exceptions else 0.0)
+
+
+def clarification_priority(matched_terms: int) -> float:
+    return CLARIFICATION_PRIORITY + CLARIFICATION_TERM_WEIGHT * matched_terms
+
+
+class ContextPacker:
+    """Greedy priority packer over ContextFragments."""
+
+    def __init__(self, token_budget: int = None):
+        self.token_budget = DEFAULT_TOKEN_BUDGET if token_budget is None else token_budget
+
+    def pack(self, fragments: List[ContextFragment]) -> PackedContext:
+        costs = [estimate_tokens(fragment.text) for fragment in fragments]
+        section_costs = {fragment.section: estimate_tokens(fragment.section)
+                         for fragment in fragments if fragment.section}
+
+        if self.token_budget and self.token_budget > 0:
+            # Highest priority first; ties keep context order
+            ranked = sorted(range(len(fragments)), key=lambda i: -fragments[i].priority)
+            chosen = set()
+            open_sections = set()
+            used = 0
+            for rank, i in enumerate(ranked):
+                section = fragments[i].section
+                cost = costs[i] + (section_costs[section] if section and section not in open_sections else 0)
+                if rank == 0 or used + cost <= self.token_budget:
+                    chosen.add(i)
+                    used += cost
+                    if section:
+                        open_sections.add(section)
+        else:
+            chosen = set(range(len(fragments)))
+
+        parts = []
+        included, dropped = [], []
+        included_tokens = dropped_tokens = 0
+        current_section = None
+        for i, fragment in enumerate(fragments):
+            if i not in chosen:
+                dropped.append(fragment)
+                dropped_tokens += costs[i]
+                continue
+            if fragment.section and fragment.section != current_section:
+                parts.append(fragment.section)
+                included_tokens += section_costs[fragment.section]
+            current_section = fragment.section
+            parts.append(fragment.text)
+            included.append(fragment)
+            included_tokens += costs[i]
+
+        if dropped:
+            logger.info(f" Context packer: included {included_tokens} tokens ({len(included)} fragments), "
+                        f"dropped {dropped_tokens} tokens ({len(dropped)}: "
+                        f"{', '.join(fragment.label for fragment in dropped)}) - budget {self.token_budget}")
+        else:
+            logger.info(f" Context packer: included {included_tokens} tokens ({len(included)} fragments), "
+                        f"dropped 0 - budget {self.token_budget or 'unlimited'}")
+
+        return PackedContext("\n".join(parts), included, dropped, included_tokens, dropped_tokens)
@@ -0,0 +1,145 @@
+"""
+Embedding backends for the search engine, answer cache and intent classifier.
+
+Every backend turns a list of texts into a list of vectors and has an identity
+(name) that the embedding stores and query caches key on, so vectors from
+different backends never mix:
+
+    openai   OpenAI embeddings API (default)       name: the model, e.g. text-embedding-3-small
+    local    SentenceTransformer model on the CPU   name: local/<model>
+    hash     deterministic hashed bag-of-words      name: hash/<dim>
+
+The local backend needs sentence-transformers (not in requirements.txt - install it
+where the local model is wanted). The hash backend has no dependencies and no
+semantic quality; it exists for tests and benchmarks that must run without network.
+
+Configuration (environment):
+    EMBEDDING_BACKEND       openai | local | hash (default openai)
+    LOCAL_EMBEDDING_MODEL   SentenceTransformer model for the local backend (default all-MiniLM-L6-v2)
+    HASH_EMBEDDING_DIM      dimensions of the hash backend (default 256)
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+HASH_EMBEDDING_DIM = int(os.getenv("HASH_EMBEDDING_DIM", "256"))
+
+
+class Embedder:
+    """Interface: embed(texts) -> vectors. Raises on failure; callers log and degrade."""
+
+    backend = ""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def name(self) -> str:
+        """Identity recorded with stored vectors and used in cache keys."""
+        return f"{self.backend}/{self.model}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    async def embed_async(self, texts: List[str], async_client: Any = None) -> List[List[float]]:
+        """Awaitable embed; CPU and blocking backends run in a worker thread."""
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class OpenAIEmbedder(Embedder):
+    """OpenAI embeddings API through a (sync or async) OpenAI client."""
+
+    backend = "openai"
+
+    def __init__(self, model: str = OPENAI_EMBEDDING_MODEL, get_client: Callable[[], Any] = None):
+        super().__init__(model)
+        # Resolved per call: the app replaces its client after fork
+        self.get_client = get_client
+
+    @property
+    def name(self) -> str:
+        # Bare model name, as stores and caches were keyed before backends were pluggable
+        return self.model
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = self.get_client().embeddings.create(model=self.model, input=texts)
+        return [d.embedding for d in response.data]
+
+    async def embed_async(self, texts: List[str], async_client: Any = None) -> List[List[float]]:
+        if async_client is None:
+            return await super().embed_async(texts)
+        response = await async_client.embeddings.create(model=self.model, input=texts)
+        return [d.embedding for d in response.data]
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """Local SentenceTransformer model on the CPU (no network once the model is downloaded)."""
+
+    backend = "local"
+
+    def __init__(self, model: str = LOCAL_EMBEDDING_MODEL):
+        super().__init__(model)
+        from sentence_transformers import SentenceTransformer
+        self._model = SentenceTransformer(model, device="cpu")
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self._model.encode(texts, convert_to_numpy=True, batch_size=32).tolist()
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class HashEmbedder(Embedder):
+    """
+    Deterministic signed feature hashing of words and word pairs. Same text, same
+    vector, in every process; texts sharing words land close together.
+    """
+
+    backend = "hash"
+
+    def __init__(self, dim: int = HASH_EMBEDDING_DIM):
+        super().__init__(str(dim))
+        self.dim = dim
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = _WORD.findall(text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += 1.0 if (digest >> 32) & 1 else -1.0
+        return vector.tolist()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    async def embed_async(self, texts: List[str], async_client: Any = None) -> List[List[float]]:
+        return self.embed(texts)
+
+
+def create_embedder(backend: Optional[str] = None, get_client: Callable[[], Any] = None) -> Embedder:
+    """
+    Embedder for a backend name (default EMBEDDING_BACKEND). An unknown backend, or a
+    local backend whose model cannot be loaded, falls back to OpenAI with an error logged.
+    """
+    backend = (EMBEDDING_BACKEND if backend is None else backend).lower()
+    try:
+        if backend == "local":
+            return SentenceTransformerEmbedder()
+        if backend == "hash":
+            return HashEmbedder()
+        if backend != "openai":
+            logger.error(f" Unknown EMBEDDING_BACKEND {backend!r} - using OpenAI embeddings")
+    except Exception as e:
+        logger.error(f" Embedding backend {backend!r} unavailable ({e}) - using OpenAI embeddings")
+    return OpenAIEmbedder(get_client=get_client)
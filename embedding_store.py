@@ -0,0 +1,203 @@
+"""
+Persistent, content-hashed embedding store for rule embeddings.
+
+Each text is keyed by a SHA-256 digest of the embedding model name plus the text
+itself, so a cold start only sends new or changed texts to the embeddings API.
+Vectors are kept L2-normalized in a float32 .npy matrix that is memory-mapped on
+load, next to a small JSON index of content keys and the embedding backend
+(see embedders.py) that produced them. Each save writes its matrix under a new
+file name carrying a random save token, then atomically replaces the index that
+names it, so the index is the commit point: a crash at any step leaves an index
+that still names the complete matrix it was written with.
+
+The store starts out populated in the Docker image (build_embedding_store.py bakes
+it at build time). EMBEDDING_STORE_DIR can instead point at persistent storage
+shared by instances (e.g. a Cloud Run volume mount of a GCS bucket), so embeddings
+computed by one instance are reused by the next.
+
+Usage:
+    store = EmbeddingStore(model="text-embedding-3-small", name="rule_embeddings")
+    matrix = store.embed(texts, embed_fn)   # embed_fn(list_of_texts) -> list of vectors
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import uuid
+from typing import Callable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Directory for persisted embeddings. Set to an empty string to keep the store in memory only.
+DEFAULT_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "./embeddings_cache")
+
+STORE_FORMAT_VERSION = 2
+
+
+def content_key(text: str, model: str) -> str:
+    """Stable key for one text under one embedding model."""
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so dot products are cosine similarities."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EmbeddingStore:
+    """On-disk embedding matrix keyed by content hash, loaded memory-mapped."""
+
+    def __init__(self, model: str, name: str = "rule_embeddings", store_dir: Optional[str] = None,
+                 backend: str = "openai"):
+        self.model = model
+        self.backend = backend
+        self.name = name
+        self.store_dir = DEFAULT_STORE_DIR if store_dir is None else store_dir
+
+        self.file_prefix = f"{name}_{model.replace('/', '_')}"
+        self.index_path = os.path.join(self.store_dir, f"{self.file_prefix}.json") if self.store_dir else None
+        self.matrix_path = None  # matrix file named by the current index
+
+        self._keys: List[str] = []
+        self._rows = {}
+        self._vectors = None
+
+        # Counters from the most recent embed() call, for startup logging
+        self.last_reused = 0
+        self.last_embedded = 0
+
+        self._load()
+
+    def _load(self):
+        """Load the index and memory-map the matrix if a compatible store exists."""
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+
+            # Stores written before backends were recorded are all OpenAI
+            if (index.get("format") != STORE_FORMAT_VERSION or index.get("model") != self.model
+                    or index.get("backend", "openai") != self.backend):
+                logger.info(f" Embedding store {self.name}: incompatible index, ignoring")
+                return
+
+            # The index names the matrix file written for it (and only that one)
+            matrix_file = index.get("matrix", "")
+            if not matrix_file.startswith(f"{self.file_prefix}.") or os.sep in matrix_file:
+                logger.info(f" Embedding store {self.name}: incompatible index, ignoring")
+                return
+            matrix_path = os.path.join(self.store_dir, matrix_file)
+
+            vectors = np.load(matrix_path, mmap_mode="r")
+            keys = index.get("keys", [])
+            if vectors.ndim != 2 or vectors.shape[0] != len(keys):
+                logger.warning(f" Embedding store {self.name}: matrix/index mismatch, ignoring")
+                return
+
+            self._keys = keys
+            self._rows = {key: row for row, key in enumerate(keys)}
+            self._vectors = vectors
+            self.matrix_path = matrix_path
+            logger.info(f" Embedding store {self.name}: loaded {len(keys)} vectors from {self.matrix_path}")
+
+        except Exception as e:
+            logger.warning(f" Embedding store {self.name}: failed to load ({e}), starting empty")
+
+    def __len__(self):
+        return len(self._keys)
+
+    def embed(self, texts: List[str], embed_fn: Callable[[List[str]], Optional[List[List[float]]]]) -> Optional[np.ndarray]:
+        """
+        Return an (n_texts, dim) float32 matrix of L2-normalized embeddings.
+
+        Texts already in the store are reused; only new or changed texts are passed to
+        embed_fn. Returns None if embed_fn fails for the missing texts.
+        """
+        keys = [content_key(text, self.model) for text in texts]
+        missing = [i for i, key in enumerate(keys) if key not in self._rows]
+
+        self.last_reused = len(keys) - len(missing)
+        self.last_embedded = len(missing)
+
+        if missing:
+            new_vectors = embed_fn([texts[i] for i in missing])
+            if not new_vectors or len(new_vectors) != len(missing):
+                return None
+            self._merge(keys, [keys[i] for i in missing], normalize_rows(np.asarray(new_vectors, dtype=np.float32)))
+
+        rows = [self._rows[key] for key in keys]
+        if rows == list(range(len(self._keys))):
+            # Store order matches the request - hand back the (memory-mapped) matrix as is
+            return self._vectors
+        return np.ascontiguousarray(self._vectors[rows], dtype=np.float32)
+
+    def _merge(self, live_keys: List[str], new_keys: List[str], new_vectors: np.ndarray):
+        """Rebuild the store with exactly the live keys (dropping stale ones) and persist it."""
+        new_rows = {key: row for row, key in enumerate(new_keys)}
+        ordered_keys = list(dict.fromkeys(live_keys))
+
+        dim = new_vectors.shape[1]
+        matrix = np.empty((len(ordered_keys), dim), dtype=np.float32)
+        for row, key in enumerate(ordered_keys):
+            if key in new_rows:
+                matrix[row] = new_vectors[new_rows[key]]
+            else:
+                matrix[row] = self._vectors[self._rows[key]]
+
+        self._keys = ordered_keys
+        self._rows = {key: row for row, key in enumerate(ordered_keys)}
+        self._vectors = matrix
+        self._save()
+
+    def _save(self):
+        """
+        Write the matrix under a new save token, then atomically replace the index that
+        names it, then remove the matrix this store replaced. Failures only cost a
+        re-embed next start.
+        """
+        if not self.index_path:
+            return
+
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+
+            matrix_file = f"{self.file_prefix}.{uuid.uuid4().hex}.npy"
+            matrix_path = os.path.join(self.store_dir, matrix_file)
+            fd, tmp_matrix = tempfile.mkstemp(dir=self.store_dir, suffix=".npy.tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, self._vectors)
+            os.replace(tmp_matrix, matrix_path)
+
+            fd, tmp_index = tempfile.mkstemp(dir=self.store_dir, suffix=".json.tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({
+                    "format": STORE_FORMAT_VERSION,
+                    "model": self.model,
+                    "backend": self.backend,
+                    "dim": int(self._vectors.shape[1]),
+                    "matrix": matrix_file,
+                    "keys": self._keys
+                }, f)
+            os.replace(tmp_index, self.index_path)
+
+            # Processes that mapped the old matrix keep their mapping after the unlink
+            previous, self.matrix_path = self.matrix_path, matrix_path
+            if previous and previous != matrix_path:
+                try:
+                    os.remove(previous)
+                except FileNotFoundError:
+                    pass
+
+            logger.info(f" Embedding store {self.name}: saved {len(self._keys)} vectors to {self.matrix_path}")
+
+        except Exception as e:
+            logger.warning(f" Embedding store {self.name}: could not persist ({e})")
@@ -803,12 +803,15 @@ DEFINITIONS_SEARCH_DATA = {
     }
 }
 
+# Definition id -> definition (first entry wins, like the original scan)
+DEFINITIONS_BY_ID = {}
+for _definition in GOLF_DEFINITIONS_DATABASE:
+    DEFINITIONS_BY_ID.setdefault(_definition['id'], _definition)
+del _definition
+
 def get_definition_by_id(definition_id):
     """Get a specific definition by ID."""
-    for definition in GOLF_DEFINITIONS_DATABASE:
-        if definition['id'] == definition_id:
-            return definition
-    return None
+    return DEFINITIONS_BY_ID.get(definition_id)
 
 def search_definitions_by_keyword(keywords):
     """Search definitions by keywords."""
@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration for production serving.
+
+    gunicorn -c gunicorn.conf.py asgi:app
+
+The app is preloaded in the master process: the knowledge-base modules, compiled
+matchers, rule embedding matrix and caches are built once, startup warm-up runs,
+and workers are forked from that state so they share it copy-on-write. Each
+worker then recreates its OpenAI clients and SQLite connections (post_fork).
+
+Workers are uvicorn ASGI workers, so asgi.py's async /api/ask is served natively.
+Point the Cloud Run startup/readiness probe at GET /api/ready.
+
+Configuration (environment):
+    PORT              listen port (default 8080)
+    WEB_CONCURRENCY   worker processes (default: CPU count)
+    GUNICORN_TIMEOUT  worker timeout in seconds (default 120)
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count())))
+worker_class = 'uvicorn_worker.UvicornWorker'
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # Runs after the preload, before workers fork. Everything allocated so far lives
+    # for the whole process; freezing it keeps the collector from touching (and so
+    # copying) those pages in every worker.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import web_api
+    web_api.reset_after_fork()
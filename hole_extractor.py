@@ -0,0 +1,112 @@
+"""
+Precompiled hole-number extraction for Columbia CC queries.
+
+Every pattern is compiled once at import. A single scan of the query collects the
+candidates (ordinal words, digits, course-feature terms); the ordered hole patterns
+are then only checked for candidates that are actually present, so the common
+question with no hole reference costs one regex pass. Precedence is unchanged:
+ordinal words near a course term (first..eighteenth, in that order) win, then the
+numeric patterns in order.
+
+Results are memoized per query text, so boosting, templates and enrichment for one
+request share a single extraction.
+"""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+ORDINAL_TO_NUM = {
+    'first': 1, 'second': 2, 'third': 3, 'fourth': 4,
+    'fifth': 5, 'sixth': 6, 'seventh': 7, 'eighth': 8,
+    'ninth': 9, 'tenth': 10, 'eleventh': 11, 'twelfth': 12,
+    'thirteenth': 13, 'fourteenth': 14, 'fifteenth': 15,
+    'sixteenth': 16, 'seventeenth': 17, 'eighteenth': 18,
+}
+
+COURSE_CONTEXT = ['hole', 'fairway', 'green', 'tee', 'rough', 'bunker',
+                  'bridge', 'pond', 'creek', 'water']
+
+_CONTEXT = '|'.join(COURSE_CONTEXT)
+
+# Ordinal near a course term (within ~3 words), before or after it: "third fairway", "fairway on the third"
+_ORDINAL_PATTERNS = [
+    (num,
+     re.compile(rf'(?:{ordinal})\s+(?:\w+\s+){{0,2}}(?P<feature>{_CONTEXT})'),
+     re.compile(rf'(?P<feature>{_CONTEXT})\s+(?:\w+\s+){{0,3}}(?:{ordinal})'))
+    for ordinal, num in ORDINAL_TO_NUM.items()
+]
+
+_NUMERIC_PATTERNS = [re.compile(pattern) for pattern in (
+    r'\b(\d{1,2})(?:th|st|nd|rd)?\s+(?P<feature>hole|green)\b',
+    r'\b(?P<feature>hole)\s+(\d{1,2})\b',
+    r'#(\d{1,2})\b',
+    r'\b(\d{1,2})(?:th|st|nd|rd)\b',
+    r'\b(\d{1,2})\s+(?P<feature>bridge|fairway|tee|rough|bunker|pond|creek|water)\b',
+    r'(?:hole|number)\s*#?\s*(\d{1,2})\b',
+    r'(?P<feature>bridge|fairway|tee|green|rough|bunker|pond|creek|water)\s+(?:on|over|at|near)\s+(\d{1,2})\b',
+    r'\bon\s+(\d{1,2})\b',
+)]
+
+# One pass finds whether any ordinal, digit or course term occurs (course terms as plain
+# substrings, like the patterns use them) and the first whole-word course term
+_CANDIDATE_SCAN = re.compile(
+    rf'(?P<ordinal>{"|".join(ORDINAL_TO_NUM)})|(?P<digit>\d)|\b(?P<feature>{_CONTEXT})\b|(?P<context>{_CONTEXT})'
+)
+
+
+class HoleReference(NamedTuple):
+    """Hole number mentioned in a query (or None) and the course feature it was tied to."""
+    number: Optional[int]
+    feature: Optional[str]
+
+
+def _number_group(match) -> str:
+    """The hole-number capture of a numeric pattern (the group that is not 'feature')."""
+    feature_index = match.re.groupindex.get('feature')
+    for index in range(1, match.re.groups + 1):
+        if index != feature_index:
+            return match.group(index)
+
+
+@lru_cache(maxsize=4096)
+def extract_hole_reference(query: str) -> HoleReference:
+    """Hole number plus the matched course-feature term, e.g. ("water on 17") -> (17, 'water')."""
+    query_lower = query.lower()
+
+    has_ordinal = has_digit = has_context = False
+    first_feature = None
+    for match in _CANDIDATE_SCAN.finditer(query_lower):
+        kind = match.lastgroup
+        if kind == 'ordinal':
+            has_ordinal = True
+        elif kind == 'digit':
+            has_digit = True
+        else:
+            has_context = True
+            if kind == 'feature' and first_feature is None:
+                first_feature = match.group('feature')
+
+    if has_ordinal and has_context:
+        for ordinal, (num, ordinal_first, feature_first) in zip(ORDINAL_TO_NUM, _ORDINAL_PATTERNS):
+            if ordinal not in query_lower:
+                continue
+            match = ordinal_first.search(query_lower) or feature_first.search(query_lower)
+            if match:
+                return HoleReference(num, match.group('feature'))
+
+    if has_digit:
+        for pattern in _NUMERIC_PATTERNS:
+            match = pattern.search(query_lower)
+            if match:
+                hole_num = int(_number_group(match))
+                if 1 <= hole_num <= 18:
+                    feature = match.groupdict().get('feature') or first_feature
+                    return HoleReference(hole_num, feature)
+
+    return HoleReference(None, first_feature)
+
+
+def extract_hole_number(query: str) -> Optional[int]:
+    """Hole number mentioned in the query, or None."""
+    return extract_hole_reference(query).number
@@ -0,0 +1,199 @@
+"""
+Local intent classifier for the hybrid (legacy) answering path.
+
+Replaces the one-letter gpt-4 classification round-trip with a nearest-centroid
+classifier over the query embedding that the search step needs anyway. Each
+intent has a handful of labelled example questions; their embeddings are kept in
+the content-hashed EmbeddingStore, so after the first start no API calls are made
+to build the centroids.
+
+Extra labelled examples (e.g. reviewed queries from the GOLF_QUERY logs) can be
+supplied as JSON lines: {"question": "...", "intent": "relief"}.
+
+Configuration (environment):
+    INTENT_EXAMPLES_PATH   optional JSONL file of extra labelled examples
+    INTENT_MIN_SIMILARITY  best-centroid similarity needed to trust the label (default 0.30)
+    INTENT_MIN_MARGIN      gap to the runner-up needed to trust the label (default 0.02)
+"""
+
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_store import EmbeddingStore, normalize_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXAMPLES_PATH = os.getenv("INTENT_EXAMPLES_PATH", "")
+DEFAULT_MIN_SIMILARITY = float(os.getenv("INTENT_MIN_SIMILARITY", "0.30"))
+DEFAULT_MIN_MARGIN = float(os.getenv("INTENT_MIN_MARGIN", "0.02"))
+
+# Same labels the gpt-4 classifier returned (categories A-H)
+INTENT_LABELS = ['relief', 'obstruction', 'position', 'penalty', 'definition', 'procedure', 'equipment', 'general']
+
+SEED_EXAMPLES = {
+    'relief': [
+        "How do I take relief from a cart path?",
+        "Where do I drop after taking unplayable ball relief?",
+        "What are my relief options from a penalty area?",
+        "How big is the relief area for free relief?",
+        "Do I drop from knee height?",
+        "Can I take back-on-the-line relief?",
+        "Where is the nearest point of complete relief?",
+        "My ball is in the water, what are my options?",
+    ],
+    'obstruction': [
+        "Do I get relief from a sprinkler head on my line of play?",
+        "My stance is on a cart path, is there free relief?",
+        "Is there relief from ground under repair?",
+        "Ball is in casual water in the fairway, do I get relief?",
+        "A drainage grate interferes with my swing",
+        "Ball is near a staked tree, can I move it?",
+        "Can I get relief from an animal hole?",
+        "Is a yardage marker an immovable obstruction?",
+    ],
+    'position': [
+        "Is my ball out of bounds if it is on the white line?",
+        "Is my ball in the bunker if it touches the edge?",
+        "Is my ball in the penalty area if it is on the red line?",
+        "My ball is lost, what now?",
+        "Which area of the course is my ball in?",
+        "Is a ball on the fringe on the putting green?",
+        "Ball went past the fence on the left",
+        "Is the ball in or out of the hazard on hole 17?",
+    ],
+    'penalty': [
+        "What is the penalty for hitting the wrong ball?",
+        "I accidentally moved my ball, is that a penalty?",
+        "Is there a penalty for grounding my club in a bunker?",
+        "What is the penalty for playing from the wrong place?",
+        "My putt hit the flagstick, is that a penalty?",
+        "Two stroke penalty or one stroke?",
+        "I signed a wrong scorecard, what happens?",
+        "Is it a penalty if my ball hits my bag?",
+    ],
+    'definition': [
+        "What is a provisional ball?",
+        "What does nearest point of complete relief mean?",
+        "Define abnormal course condition",
+        "What counts as a loose impediment?",
+        "What is a movable obstruction?",
+        "What does general area mean?",
+        "What is the definition of a stroke?",
+        "What does it mean when a ball is embedded?",
+    ],
+    'procedure': [
+        "Who plays first on the tee?",
+        "How do I mark my ball on the green?",
+        "When should I play a provisional ball?",
+        "How long can I search for my ball?",
+        "What do I do if I am not sure of the ruling?",
+        "How do I play two balls when unsure?",
+        "Can I clean my ball when I lift it?",
+        "What is the order of play in stroke play?",
+    ],
+    'equipment': [
+        "How many clubs can I carry?",
+        "Can I use a rangefinder during my round?",
+        "My club broke during the round, can I replace it?",
+        "Can I use a ball that is not on the conforming list?",
+        "Is it legal to use an alignment stick while playing?",
+        "Can I change balls between holes?",
+        "Can I borrow a club from my partner?",
+        "Are distance measuring devices allowed?",
+    ],
+    'general': [
+        "Tell me about the rules of golf",
+        "What are the Columbia local rules?",
+        "How does match play differ from stroke play?",
+        "What is the etiquette for pace of play?",
+        "What is the history of the rules?",
+        "Help me with a rules question",
+    ],
+}
+
+
+def load_labelled_examples(path: str) -> Dict[str, List[str]]:
+    """Read extra {"question", "intent"} JSON lines; unknown intents are skipped."""
+    examples = {label: [] for label in INTENT_LABELS}
+    if not path or not os.path.exists(path):
+        return examples
+
+    skipped = 0
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                intent = record.get("intent")
+                question = record.get("question", "").strip()
+            except (ValueError, AttributeError):
+                skipped += 1
+                continue
+            if intent in examples and question:
+                examples[intent].append(question)
+            else:
+                skipped += 1
+
+    total = sum(len(questions) for questions in examples.values())
+    logger.info(f" Intent classifier: loaded {total} labelled examples from {path} ({skipped} skipped)")
+    return examples
+
+
+class IntentClassifier:
+    """Nearest-centroid classifier over L2-normalized query embeddings."""
+
+    def __init__(self, embed_fn: Callable[[List[str]], Optional[List[List[float]]]], model: str,
+                 examples_path: str = None, min_similarity: float = None, min_margin: float = None,
+                 backend: str = "openai"):
+        self.min_similarity = DEFAULT_MIN_SIMILARITY if min_similarity is None else min_similarity
+        self.min_margin = DEFAULT_MIN_MARGIN if min_margin is None else min_margin
+
+        examples = {label: list(SEED_EXAMPLES.get(label, [])) for label in INTENT_LABELS}
+        extra = load_labelled_examples(DEFAULT_EXAMPLES_PATH if examples_path is None else examples_path)
+        for label, questions in extra.items():
+            examples[label].extend(questions)
+
+        self.labels = [label for label in INTENT_LABELS if examples[label]]
+        self.centroids = None  # (n_labels, dim), L2-normalized rows
+
+        texts = [question for label in self.labels for question in examples[label]]
+        owners = np.array([i for i, label in enumerate(self.labels) for _ in examples[label]], dtype=np.intp)
+
+        store = EmbeddingStore(model=model, name="intent_examples", backend=backend)
+        vectors = store.embed(texts, embed_fn)
+        if vectors is None:
+            logger.error(" Intent classifier: could not embed labelled examples")
+            return
+
+        sums = np.zeros((len(self.labels), vectors.shape[1]), dtype=np.float32)
+        np.add.at(sums, owners, np.asarray(vectors, dtype=np.float32))
+        self.centroids = normalize_rows(sums)
+        logger.info(f" Intent classifier ready: {len(self.labels)} intents from {len(texts)} examples "
+                    f"({store.last_embedded} embedded via API)")
+
+    def is_ready(self) -> bool:
+        return self.centroids is not None
+
+    def classify(self, query_vector: np.ndarray) -> Tuple[str, float, bool]:
+        """
+        Return (intent, similarity, confident) for a normalized query embedding.
+
+        confident is False when the best centroid is weak or barely ahead of the
+        runner-up - the caller may then fall back to an LLM classification.
+        """
+        if self.centroids is None or query_vector is None:
+            return 'general', 0.0, False
+
+        scores = self.centroids @ query_vector
+        order = np.argsort(-scores)
+        best = float(scores[order[0]])
+        margin = best - float(scores[order[1]]) if len(order) > 1 else best
+
+        confident = best >= self.min_similarity and margin >= self.min_margin
+        return self.labels[order[0]], best, confident
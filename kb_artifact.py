@@ -0,0 +1,238 @@
+"""
+Compiled knowledge-base artifact: one versioned binary file, memory-mapped and decoded lazily.
+
+golf_rules_data.py and golf_clarifications_db.py are large Python literals that
+every process has to compile and build into dict/list trees at import. The build
+step (build_kb_artifact.py) writes them into a single file instead:
+
+    magic "GOLFKB" + format version (uint16)
+    header length (uint32) + JSON header: source file hashes, content hash, table directory
+    tables: each a string column - (count + 1) little-endian uint32 offsets, then UTF-8 data
+
+Tables:
+    rules.id              rule id per row
+    rules.record          JSON of the full rule dict per row
+    clarifications.key    rule key per group
+    clarifications.group  JSON list of that key's clarifications
+
+At runtime the file is memory-mapped (pages are shared by every worker through the
+page cache) and wrapped in read-only list/dict views that decode a record the first
+time it is touched. load_knowledge_base() falls back to the Python modules when the
+artifact is missing, unreadable or older than the source files.
+
+Configuration (environment):
+    KB_ARTIFACT_PATH   artifact location (default kb_artifact.bin next to this file; empty disables)
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Mapping, Sequence
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GOLFKB"
+FORMAT_VERSION = 1
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ARTIFACT_PATH = os.getenv("KB_ARTIFACT_PATH", os.path.join(_BASE_DIR, "kb_artifact.bin"))
+
+# Source modules compiled into the artifact; their file hashes detect a stale build
+SOURCE_FILES = ("golf_rules_data.py", "golf_clarifications_db.py")
+
+_PREAMBLE = struct.Struct("<6sHI")  # magic, format version, header length
+
+
+def source_hashes(base_dir: str = _BASE_DIR) -> Dict[str, Optional[str]]:
+    """sha256 of each source module file (None if the file is not shipped)."""
+    hashes = {}
+    for name in SOURCE_FILES:
+        path = os.path.join(base_dir, name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                hashes[name] = hashlib.sha256(f.read()).hexdigest()
+        else:
+            hashes[name] = None
+    return hashes
+
+
+def _encode_column(values: List[str]) -> bytes:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    return struct.pack(f"<{len(offsets)}I", *offsets) + b"".join(encoded)
+
+
+def build_artifact(path: str, rules: List[Dict], clarifications: Dict[str, List[Dict]],
+                   sources: Dict[str, Optional[str]]) -> Dict:
+    """Write the artifact for these rules and clarifications; returns its header."""
+    columns = {
+        "rules.id": [rule["id"] for rule in rules],
+        "rules.record": [json.dumps(rule, ensure_ascii=False, separators=(",", ":")) for rule in rules],
+        "clarifications.key": list(clarifications),
+        "clarifications.group": [json.dumps(group, ensure_ascii=False, separators=(",", ":"))
+                                 for group in clarifications.values()],
+    }
+
+    blobs = {name: _encode_column(values) for name, values in columns.items()}
+    content_hash = hashlib.sha256(b"".join(blobs.values())).hexdigest()
+
+    tables = {}
+    offset = 0
+    for name, values in columns.items():
+        tables[name] = {"offset": offset, "count": len(values)}
+        offset += len(blobs[name])
+
+    header = {"format": FORMAT_VERSION, "sources": sources, "content_hash": content_hash, "tables": tables}
+    header_bytes = json.dumps(header, sort_keys=True).encode("utf-8")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name in columns:
+            f.write(blobs[name])
+    os.replace(tmp_path, path)
+    return header
+
+
+class StringColumn:
+    """Read-only view of one string table inside the mapped file."""
+
+    def __init__(self, buffer: memoryview, start: int, count: int):
+        self.count = count
+        self._offsets = buffer[start:start + 4 * (count + 1)].cast("I")
+        self._data = buffer[start + 4 * (count + 1):]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index: int) -> str:
+        return str(self._data[self._offsets[index]:self._offsets[index + 1]], "utf-8")
+
+
+class _LazyJSON:
+    """JSON values of a column, each decoded on first access and then kept."""
+
+    def __init__(self, column: StringColumn):
+        self._column = column
+        self._values = [None] * len(column)
+        self._lock = threading.Lock()
+
+    def get(self, index: int):
+        value = self._values[index]
+        if value is None:
+            decoded = json.loads(self._column[index])
+            with self._lock:
+                # Keep the first decode so every caller sees the same object
+                if self._values[index] is None:
+                    self._values[index] = decoded
+                value = self._values[index]
+        return value
+
+
+class LazyRecordList(Sequence):
+    """List of rule dicts backed by the artifact; a rule is decoded when first read."""
+
+    def __init__(self, ids: StringColumn, records: StringColumn):
+        self.ids = ids
+        self._records = _LazyJSON(records)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._records.get(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("rule index out of range")
+        return self._records.get(index)
+
+
+class LazyRecordMap(Mapping):
+    """{rule key: [clarification, ...]} backed by the artifact; a group is decoded when first read."""
+
+    def __init__(self, keys: StringColumn, groups: StringColumn):
+        self._positions = {keys[i]: i for i in range(len(keys))}
+        self._groups = _LazyJSON(groups)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __getitem__(self, key):
+        return self._groups.get(self._positions[key])
+
+
+class KnowledgeBaseArtifact:
+    """A memory-mapped artifact file with lazy rule and clarification views."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+
+        magic, version, header_length = _PREAMBLE.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"not a format {FORMAT_VERSION} knowledge-base artifact")
+        header_start = _PREAMBLE.size
+        self.header = json.loads(bytes(buffer[header_start:header_start + header_length]))
+        data_start = header_start + header_length
+
+        def column(name):
+            table = self.header["tables"][name]
+            return StringColumn(buffer, data_start + table["offset"], table["count"])
+
+        self.path = path
+        self.content_hash = self.header["content_hash"]
+        self.rules = LazyRecordList(column("rules.id"), column("rules.record"))
+        self.clarifications = LazyRecordMap(column("clarifications.key"), column("clarifications.group"))
+
+
+def load_artifact(path: str = None) -> Optional[KnowledgeBaseArtifact]:
+    """The artifact at path if it exists and matches the shipped source files, else None."""
+    path = DEFAULT_ARTIFACT_PATH if path is None else path
+    if not path or not os.path.exists(path):
+        return None
+
+    try:
+        artifact = KnowledgeBaseArtifact(path)
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        logger.warning(f" Knowledge-base artifact {path} unreadable ({e}) - using the Python modules")
+        return None
+
+    current = source_hashes(os.path.dirname(os.path.abspath(path)))
+    built_from = artifact.header.get("sources", {})
+    stale = [name for name, digest in current.items() if digest is not None and built_from.get(name) != digest]
+    if stale:
+        logger.warning(f" Knowledge-base artifact {path} is older than {', '.join(stale)} - "
+                       f"using the Python modules (re-run build_kb_artifact.py)")
+        return None
+
+    return artifact
+
+
+def load_knowledge_base(path: str = None) -> Tuple[Sequence, Mapping]:
+    """(RULES_DATABASE, USGA_CLARIFICATIONS): from the artifact when current, else the modules."""
+    artifact = load_artifact(path)
+    if artifact is not None:
+        logger.info(f" Knowledge base: {len(artifact.rules)} rules and {len(artifact.clarifications)} "
+                    f"clarification groups mapped from {artifact.path} ({artifact.content_hash[:12]})")
+        return artifact.rules, artifact.clarifications
+
+    from golf_rules_data import RULES_DATABASE
+    from golf_clarifications_db import USGA_CLARIFICATIONS
+    return RULES_DATABASE, USGA_CLARIFICATIONS
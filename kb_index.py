@@ -0,0 +1,103 @@
+"""
+Knowledge-base index: O(1) rule lookup by id and the rule hierarchy tree.
+
+Built once when the system loads. Local rules are indexed ahead of the official
+rules (an id found in both resolves to the local rule, as the old scan did).
+
+The tree follows the rule numbering: 15 -> 15.2 -> 15.2a -> 15.2a(2). Ids the
+database skips (e.g. "6" or "6.1" when only 6.1a exists) become grouping nodes,
+so "everything under Rule 6" is still one traversal. Suffixed entries such as
+"12.2 Penalty" or "11.1b1" hang under their base rule; ids that do not follow the
+numbering (local rules like CCC-4) are roots.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Last component of a rule id: " Penalty"/".penalty", "(2)", the "1" of "11.1b1", a letter, or ".2"
+_LAST_COMPONENT = re.compile(r'(?:[ .][A-Za-z]+|\(\d+\)|(?<=[a-z])\d+|[a-z]|\.\d+)$')
+
+
+def parent_rule_id(rule_id: str) -> Optional[str]:
+    """Id one level up in the numbering ("15.2a(2)" -> "15.2a" -> "15.2" -> "15"), or None."""
+    match = _LAST_COMPONENT.search(rule_id)
+    if not match or match.start() == 0:
+        return None
+    return rule_id[:match.start()]
+
+
+def _rule_items(rules) -> Iterable[Tuple[str, Dict]]:
+    """(id, rule) pairs from either a list of rule dicts or an id -> rule dict."""
+    if isinstance(rules, dict):
+        return list(rules.items())
+    return [(rule.get('id'), rule) for rule in rules or [] if isinstance(rule, dict)]
+
+
+class KnowledgeBaseIndex:
+    """Id lookup and parent/child navigation over local and official rules."""
+
+    def __init__(self, rules_database, local_rules=None):
+        if isinstance(local_rules, dict):
+            local_rules = local_rules.get('local_rules', [])
+
+        self.rules: Dict[str, Dict] = {}
+        for rule_id, rule in list(_rule_items(local_rules)) + list(_rule_items(rules_database)):
+            if rule_id is not None:
+                self.rules.setdefault(rule_id, rule)
+
+        self.parents: Dict[str, Optional[str]] = {}
+        self._children: Dict[str, List[str]] = {}
+        self.roots: List[str] = []
+        for rule_id in self.rules:
+            self._attach(rule_id)
+
+    def _attach(self, rule_id: str):
+        """Add rule_id to the tree, creating any missing grouping ancestors."""
+        while rule_id not in self.parents:
+            parent_id = parent_rule_id(rule_id)
+            self.parents[rule_id] = parent_id
+            if parent_id is None:
+                self.roots.append(rule_id)
+                return
+            self._children.setdefault(parent_id, []).append(rule_id)
+            rule_id = parent_id
+
+    def __contains__(self, rule_id: str) -> bool:
+        return rule_id in self.rules
+
+    def __len__(self):
+        return len(self.rules)
+
+    def get(self, rule_id: str) -> Optional[Dict]:
+        return self.rules.get(rule_id)
+
+    def parent(self, rule_id: str) -> Optional[str]:
+        return self.parents.get(rule_id)
+
+    def children(self, rule_id: str) -> List[str]:
+        """Direct child ids in database order (may include grouping nodes with no rule of their own)."""
+        return list(self._children.get(rule_id, ()))
+
+    def descendant_ids(self, rule_id: str) -> List[str]:
+        """Ids of every rule below rule_id, depth-first in database order (grouping nodes skipped)."""
+        found = []
+        stack = list(reversed(self._children.get(rule_id, ())))
+        while stack:
+            current = stack.pop()
+            if current in self.rules:
+                found.append(current)
+            stack.extend(reversed(self._children.get(current, ())))
+        return found
+
+    def descendants(self, rule_id: str) -> List[Dict]:
+        """Every rule below rule_id ("all sub-rules of 15.2")."""
+        return [self.rules[child_id] for child_id in self.descendant_ids(rule_id)]
+
+    def ancestors(self, rule_id: str) -> List[str]:
+        """Ids from the direct parent up to the root."""
+        chain = []
+        parent_id = self.parents.get(rule_id)
+        while parent_id is not None:
+            chain.append(parent_id)
+            parent_id = self.parents.get(parent_id)
+        return chain
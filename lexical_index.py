@@ -0,0 +1,137 @@
+"""
+In-process BM25 index over the search engine's chunks, plus reciprocal-rank fusion.
+
+The lexical index holds the same chunks as the embedding matrix: one main document
+per rule (its id, title, text and keywords - local rule keywords included) and one
+per condition. Postings are flat numpy arrays of (chunk, BM25 weight), with the
+query-independent part of the BM25 formula precomputed, so scoring a query is one
+bincount over the postings of its terms. Chunk scores max-pool to rule scores the
+same way dense similarities do.
+
+Used by ProductionHybridVectorSearch for:
+    hybrid    dense and lexical rankings fused by reciprocal rank (RRF)
+    lexical   fully local search, no embeddings (SEARCH_MODE=lexical, or when the
+              embeddings call fails)
+    decisive  exact-term queries ("Rule 19.2", "purple line") whose lexical winner is
+              clear skip the embeddings round-trip
+
+A rule named in the query ("Rule 19.2", "16.1c", "CCC-6") gets RULE_REFERENCE_BONUS on
+top of its BM25 score, so a direct reference always wins the lexical ranking.
+
+Configuration (environment):
+    LEXICAL_DECISIVE_RATIO   top lexical score must be this many times the runner-up
+                             to skip embedding (default 2.5; 0 disables)
+    LEXICAL_DECISIVE_MIN     ... and at least this BM25 score (default 8.0)
+"""
+
+import logging
+import math
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from query_analysis import CONCEPT_STOP_WORDS
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+RULE_REFERENCE_BONUS = 25.0
+
+DECISIVE_RATIO = float(os.getenv("LEXICAL_DECISIVE_RATIO", "2.5"))
+DECISIVE_MIN_SCORE = float(os.getenv("LEXICAL_DECISIVE_MIN", "8.0"))
+
+# Rule ids ("19.2", "16.1c", "ccc-6") stay single tokens
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+LEXICAL_STOP_WORDS = CONCEPT_STOP_WORDS | {'and', 'or', 'are', 'be', 'it', 'was', 'this', 'that', 'by', 'as'}
+
+# Explicit rule references: dotted ids, local rule ids, or "rule N" (a bare number is usually a hole)
+_RULE_REFERENCE = re.compile(r"\b(ccc-\d+|\d+\.\d+[a-z]?(?:\(\d+\))?)|\brule\s+(\d+)(?![.\w])")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in LEXICAL_STOP_WORDS]
+
+
+def reciprocal_rank_fusion(*rankings: np.ndarray, k: int = RRF_K) -> np.ndarray:
+    """
+    Fused score per item from several score vectors: sum of 1 / (k + rank) over the
+    vectors in which the item scores above zero (rank 1 = best).
+    """
+    fused = np.zeros(len(rankings[0]), dtype=np.float64)
+    for scores in rankings:
+        order = np.argsort(-scores, kind='stable')
+        ranks = np.empty(len(scores), dtype=np.float64)
+        ranks[order] = np.arange(1, len(scores) + 1)
+        fused += np.where(scores > 0, 1.0 / (k + ranks), 0.0)
+    return fused
+
+
+class LexicalIndex:
+    """BM25 over chunk texts, with rule_chunk_start grouping chunks into rules."""
+
+    def __init__(self, documents: List[str], rule_chunk_start: np.ndarray, rule_ids: List[str]):
+        self.n_chunks = len(documents)
+        self.rule_chunk_start = rule_chunk_start
+        self._rule_rows: Dict[str, List[int]] = {}
+        for row, rule_id in enumerate(rule_ids):
+            self._rule_rows.setdefault(rule_id.lower(), []).append(row)
+
+        doc_tokens = [tokenize(document) for document in documents]
+        lengths = np.array([len(tokens) for tokens in doc_tokens], dtype=np.float64)
+        avg_length = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+
+        # term -> {chunk: term frequency}
+        frequencies: Dict[str, Dict[int, int]] = {}
+        for chunk, tokens in enumerate(doc_tokens):
+            for token in tokens:
+                counts = frequencies.setdefault(token, {})
+                counts[chunk] = counts.get(chunk, 0) + 1
+
+        # Per-posting BM25 weight: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len))
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length)
+        self._postings: Dict[str, tuple] = {}
+        for term, counts in frequencies.items():
+            chunks = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+            tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+            idf = math.log(1 + (self.n_chunks - len(counts) + 0.5) / (len(counts) + 0.5))
+            self._postings[term] = (chunks, idf * tf * (BM25_K1 + 1) / (tf + norms[chunks]))
+
+        logger.info(f" Lexical index: {self.n_chunks} chunks, {len(self._postings)} terms")
+
+    def chunk_scores(self, text: str) -> np.ndarray:
+        """BM25 score of every chunk for a query text."""
+        postings = [self._postings[term] for term in set(tokenize(text)) if term in self._postings]
+        if not postings:
+            return np.zeros(self.n_chunks, dtype=np.float64)
+        chunks = np.concatenate([chunk_ids for chunk_ids, _ in postings])
+        weights = np.concatenate([term_weights for _, term_weights in postings])
+        return np.bincount(chunks, weights=weights, minlength=self.n_chunks)
+
+    def referenced_rows(self, text: str) -> List[int]:
+        """Rows of the rules the text names explicitly."""
+        rows = []
+        for dotted, numbered in _RULE_REFERENCE.findall(text.lower()):
+            rows.extend(self._rule_rows.get(dotted or numbered, ()))
+        return rows
+
+    def rule_scores(self, chunk_scores: np.ndarray, text: str) -> np.ndarray:
+        """Best chunk score per rule, plus the bonus for rules the text names."""
+        scores = np.maximum.reduceat(chunk_scores, self.rule_chunk_start)
+        referenced = self.referenced_rows(text)
+        if referenced:
+            scores[referenced] += RULE_REFERENCE_BONUS
+        return scores
+
+    @staticmethod
+    def is_decisive(rule_scores: np.ndarray, ratio: Optional[float] = None, min_score: Optional[float] = None) -> bool:
+        """True if one rule wins the lexical ranking clearly enough to skip dense scoring."""
+        ratio = DECISIVE_RATIO if ratio is None else ratio
+        min_score = DECISIVE_MIN_SCORE if min_score is None else min_score
+        if not ratio or len(rule_scores) < 2:
+            return False
+        runner_up, top = np.partition(rule_scores, len(rule_scores) - 2)[-2:]
+        return top >= min_score and top >= ratio * runner_up
@@ -0,0 +1,139 @@
+"""
+Per-stage latency histograms and request counters, exposed in Prometheus text format.
+
+Stages are timed with a context manager:
+
+    with timed('search'):
+        results = engine.search_with_precedence(question)
+
+and served by GET /metrics. Values are per process; under several gunicorn
+workers each scrape sees the worker that answered it, so scrape per instance
+or aggregate with sum()/histogram_quantile() across workers.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+# Latency buckets (seconds): sub-millisecond search up to multi-second chat calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, Tuple], list] = {}   # (name, labels) -> [bucket counts..., sum, count]
+_counters: Dict[Tuple[str, Tuple], float] = {}    # (name, labels) -> value
+
+HELP = {
+    'golf_stage_duration_seconds': ('histogram', 'Time spent in each request stage'),
+    'golf_request_duration_seconds': ('histogram', 'End-to-end /api/ask latency by route'),
+    'golf_requests_total': ('counter', 'Answered questions by route (template/definition/ai/...)'),
+    'golf_tokens_total': ('counter', 'OpenAI tokens used for answers'),
+    'golf_prompt_tokens_total': ('counter', 'Unified-prompt input tokens by provider prompt cache (cached/uncached)'),
+    'golf_cache_hits_total': ('counter', 'Cache hits by cache'),
+    'golf_cache_misses_total': ('counter', 'Cache misses by cache'),
+    'golf_search_mode_total': ('counter', 'Engine searches by scoring mode (hybrid/dense/lexical/decisive/fallback/degraded)'),
+}
+
+
+def _key(name: str, labels: Dict) -> Tuple[str, Tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name: str, value: float, **labels):
+    """Record one observation in a histogram."""
+    key = _key(name, labels)
+    with _lock:
+        buckets = _histograms.get(key)
+        if buckets is None:
+            buckets = _histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                buckets[i] += 1
+        buckets[-2] += value
+        buckets[-1] += 1
+
+
+def inc(name: str, amount: float = 1, **labels):
+    """Increment a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+@contextmanager
+def timed(stage: str, path: str = 'simplified'):
+    """Time a block into golf_stage_duration_seconds{stage, path}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('golf_stage_duration_seconds', time.perf_counter() - start, stage=stage, path=path)
+
+
+def reset():
+    """Clear every series (e.g. after startup warm-up, before serving traffic)."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def route_for_source(source: str) -> str:
+    """Collapse response sources into the route taken."""
+    if source.startswith('template'):
+        return 'template'
+    if source.startswith('definition'):
+        return 'definition'
+    if source.startswith('ai'):
+        return 'ai'
+    return source or 'unknown'
+
+
+def record_request(result: Dict, response_time: float):
+    """Count one answered question: route, tokens, prompt/answer-cache outcome and latency."""
+    route = route_for_source(result.get('source', ''))
+    inc('golf_requests_total', route=route)
+    inc('golf_tokens_total', result.get('tokens_used', 0) or 0)
+    observe('golf_request_duration_seconds', response_time, route=route)
+    if result.get('cached_tokens') is not None:
+        inc('golf_prompt_tokens_total', result['cached_tokens'], cache='cached')
+        inc('golf_prompt_tokens_total', result['prompt_tokens'] - result['cached_tokens'], cache='uncached')
+    if route == 'ai' and 'cache_hit' in result:
+        inc('golf_cache_hits_total' if result['cache_hit'] else 'golf_cache_misses_total', cache='answer')
+
+
+def _format_labels(labels: Tuple, extra: Tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render_prometheus() -> str:
+    """All metrics in Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        histograms = {key: list(values) for key, values in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for name, (kind, help_text) in HELP.items():
+        if kind == 'histogram':
+            series = sorted((k, v) for k, v in histograms.items() if k[0] == name)
+        else:
+            series = sorted((k, v) for k, v in counters.items() if k[0] == name)
+        if not series:
+            continue
+
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for (_, labels), values in series:
+            if kind == 'counter':
+                lines.append(f'{name}{_format_labels(labels)} {values}')
+                continue
+            for bound, count in zip(LATENCY_BUCKETS, values):
+                lines.append(f'{name}_bucket{_format_labels(labels, (("le", bound),))} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels, (("le", "+Inf"),))} {values[-1]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {values[-2]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {values[-1]}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,95 @@
+"""
+Single-pass multi-pattern substring matching (Aho-Corasick) for template routing.
+
+Template routing checks dozens of phrases per template with `phrase in question`.
+Compiling every phrase into one automaton at startup turns that into a single scan
+of the question that reports every phrase it contains, so matching stays linear
+in the question length no matter how many templates or phrases are added.
+
+Matching is plain substring matching, exactly like `phrase in text` - callers
+keep any word-boundary checks they already do.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+
+class PhraseAutomaton:
+    """Aho-Corasick automaton over a fixed set of phrases."""
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases = sorted({phrase for phrase in phrases if phrase})
+
+        # Trie: goto[state] maps a character to the next state
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+
+        for phrase in self.phrases:
+            state = 0
+            for char in phrase:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(phrase)
+
+        # Breadth-first failure links; each state also reports its fail state's outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def scan(self, text: str) -> Dict[str, int]:
+        """Every phrase contained in text, mapped to the start index of its first occurrence."""
+        found: Dict[str, int] = {}
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for phrase in output[state]:
+                if phrase not in found:
+                    found[phrase] = index - len(phrase) + 1
+        return found
+
+
+class PhraseHits:
+    """Result of one scan, answering the `phrase in text` questions routing code asks."""
+
+    __slots__ = ('text', 'positions')
+
+    def __init__(self, text: str, positions: Dict[str, int]):
+        self.text = text
+        self.positions = positions
+
+    def __contains__(self, phrase: str) -> bool:
+        return phrase in self.positions
+
+    def any(self, phrases: Iterable[str]) -> bool:
+        return any(phrase in self.positions for phrase in phrases)
+
+    def count(self, phrases: Iterable[str]) -> int:
+        return sum(1 for phrase in phrases if phrase in self.positions)
+
+    def within(self, phrase: str, limit: int) -> bool:
+        """True if phrase occurs entirely inside text[:limit]."""
+        start = self.positions.get(phrase)
+        return start is not None and start + len(phrase) <= limit
+
+    def first(self, phrases: Iterable[str]) -> Optional[str]:
+        return next((phrase for phrase in phrases if phrase in self.positions), None)
@@ -0,0 +1,152 @@
+"""
+QueryAnalysis: everything the pipeline derives from the question text, computed once.
+
+Template routing, definition detection, search/boosting, context building and
+enrichment all used to lowercase, split, stop-word filter and scan the same
+question separately. A QueryAnalysis is built once per request and passed through
+every stage so they share one view of the question.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from golf_definitions_db import COMMON_DEFINITION_LOOKUPS
+from hole_extractor import extract_hole_reference
+from pattern_matcher import PhraseAutomaton, PhraseHits
+
+# Punctuation stripped from question words before term matching
+TERM_PUNCTUATION = '.,;:!?()[]"\''
+
+# Words ignored when matching question terms against rule conditions
+CONDITION_STOP_WORDS = {'the', 'and', 'for', 'what', 'are', 'how', 'does', 'can', 'get', 'from',
+                        'ball', 'my', 'is', 'on', 'in', 'do', 'this', ''}
+
+# Words ignored when matching question terms against USGA clarifications
+CLARIFICATION_STOP_WORDS = CONDITION_STOP_WORDS | {'its', 'that', 'but', 'not', 'there', 'even',
+                                                   'though', 'when', 'with', 'have'}
+
+# Stop words for template concept matching
+CONCEPT_STOP_WORDS = {'the', 'a', 'an', 'is', 'my', 'in', 'on', 'at', 'to', 'for',
+                      'of', 'with', 'what', 'if', 'do', 'i', 'how', 'can', 'get',
+                      'from', 'when', 'where', 'rule', 'rules', 'happens'}
+
+# Compound concepts kept as one token for template concept matching
+COMPOUND_CONCEPTS = ['out of bounds', 'lost ball', 'cart path', 'green stakes',
+                     'maintenance facility', 'purple line', 'water hazard']
+
+# Golf terms answered from the definitions database, in priority order
+DEFINITION_TERMS = [
+    'penalty area', 'bunker', 'putting green', 'teeing area',
+    'general area', 'obstruction', 'loose impediment', 'ground under repair',
+    'abnormal course condition', 'temporary water', 'provisional ball',
+    'lost ball', 'out of bounds', 'water hazard', 'lateral water hazard',
+    'casual water', 'stance', 'stroke', 'ball marker', 'wrong ball',
+    'four-ball', 'match play', 'stroke play', 'handicap', 'net score',
+    'gross score', 'through the green', 'hazard', 'relief area'
+]
+
+_DEFINITION_AUTOMATON = PhraseAutomaton(DEFINITION_TERMS)
+
+_ORDINAL_SUFFIX = re.compile(r'\b(\d{1,2})(?:th|st|nd|rd)\b')
+
+
+def prepare_search_text(query: str) -> str:
+    """Query normalization shared by embedding and search ("17th" -> "17")."""
+    return _ORDINAL_SUFFIX.sub(r'\1', query)
+
+
+def extract_key_concepts(text):
+    """
+    Extract important concepts from text for matching.
+    Returns a set of key terms.
+    """
+    # Special handling for compound concepts
+    for compound in COMPOUND_CONCEPTS:
+        text = text.replace(compound, compound.replace(' ', '_'))
+
+    # Extract words
+    words = text.lower().split()
+
+    # Keep important words and numbers
+    concepts = set()
+    for word in words:
+        # Keep numbers (hole numbers)
+        if any(char.isdigit() for char in word):
+            # Extract just the number
+            concepts.update(re.findall(r'\d+', word))
+        # Keep non-stop words
+        elif word not in CONCEPT_STOP_WORDS and len(word) > 2:
+            concepts.add(word)
+
+    return concepts
+
+
+def _filtered_terms(words: List[str], min_length: int, stop_words) -> List[str]:
+    """Question words longer than min_length (before stripping punctuation), minus stop words."""
+    terms = []
+    for word in words:
+        if len(word) > min_length:
+            term = word.strip(TERM_PUNCTUATION)
+            if term not in stop_words:
+                terms.append(term)
+    return terms
+
+
+class QueryAnalysis:
+    """
+    One request's view of the question.
+
+    Attributes:
+        question           original question text
+        lower              lowercased question
+        normalized         lowercased and stripped
+        tokens / token_set whitespace tokens of the lowercased question
+        condition_terms    filtered terms matched against rule conditions
+        clarification_terms filtered terms matched against USGA clarifications
+        key_concepts       template concepts (compounds joined, numbers kept)
+        search_text        text used for embedding/search ("17th" -> "17")
+        search_lower       lowercased search_text (what boosting scans)
+        hole_number        hole referenced in the search text, or None
+        hole_feature       course feature tied to that hole reference
+        definition_terms   DEFINITION_TERMS present, in priority order
+        definition_words   tokens with a COMMON_DEFINITION_LOOKUPS entry
+    """
+
+    def __init__(self, question: str):
+        self.question = question
+        self.lower = question.lower()
+        self.normalized = self.lower.strip()
+        self.tokens = self.lower.split()
+        self.token_set = set(self.tokens)
+
+        self.condition_terms = _filtered_terms(self.tokens, 2, CONDITION_STOP_WORDS)
+        self.clarification_terms = _filtered_terms(self.tokens, 3, CLARIFICATION_STOP_WORDS)
+        self.key_concepts = extract_key_concepts(self.normalized)
+
+        self.search_text = prepare_search_text(question)
+        self.search_lower = self.search_text.lower()
+        hole = extract_hole_reference(self.search_text)
+        self.hole_number = hole.number
+        self.hole_feature = hole.feature
+
+        definition_hits = _DEFINITION_AUTOMATON.scan(self.lower)
+        self.definition_terms = [term for term in DEFINITION_TERMS if term in definition_hits]
+        self.definition_words = [word for word in self.tokens if word in COMMON_DEFINITION_LOOKUPS]
+
+        self._phrase_hits: Dict[Tuple[int, str], PhraseHits] = {}
+
+    def phrase_hits(self, automaton: PhraseAutomaton, text: Optional[str] = None) -> PhraseHits:
+        """Scan the normalized question (or text) with an automaton once and reuse the hits."""
+        text = self.normalized if text is None else text
+        key = (id(automaton), text)
+        hits = self._phrase_hits.get(key)
+        if hits is None:
+            hits = self._phrase_hits[key] = PhraseHits(text, automaton.scan(text))
+        return hits
+
+    @staticmethod
+    def of(question: str, analysis: Optional['QueryAnalysis'] = None) -> 'QueryAnalysis':
+        """The analysis passed down by the caller, or a fresh one for direct calls."""
+        if analysis is not None and analysis.question == question:
+            return analysis
+        return QueryAnalysis(question)
@@ -0,0 +1,198 @@
+"""
+Bounded query embedding cache with stable keys.
+
+Keys are SHA-256 digests of the embedding model name plus the normalized query
+(lowercased, whitespace collapsed), so they are identical across workers and
+restarts - unlike Python's salted hash(). The in-process tier is an LRU bounded
+by entry count and TTL. An optional SQLite tier lets every worker on an instance
+share embeddings; a local miss that hits SQLite is promoted into the LRU.
+
+Configuration (environment):
+    QUERY_CACHE_MAX_ENTRIES   in-process LRU size (default 2048)
+    QUERY_CACHE_TTL_SECONDS   entry lifetime in both tiers (default 86400)
+    QUERY_CACHE_SQLITE_PATH   path of the shared SQLite tier (default: disabled)
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2048"))
+DEFAULT_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "86400"))
+DEFAULT_SQLITE_PATH = os.getenv("QUERY_CACHE_SQLITE_PATH", "")
+
+# Rows kept in the shared tier, and how often (in writes) it is pruned
+SHARED_MAX_ENTRIES_FACTOR = 4
+SHARED_PRUNE_EVERY = 100
+
+
+def normalize_query(text: str) -> str:
+    """Normalization applied before keying: lowercase and collapse whitespace."""
+    return " ".join(text.lower().split())
+
+
+class QueryEmbeddingCache:
+    """Size- and TTL-bounded LRU of query embeddings with an optional shared SQLite tier."""
+
+    def __init__(self, model: str, max_entries: int = None, ttl_seconds: float = None, sqlite_path: str = None):
+        self.model = model
+        self.max_entries = DEFAULT_MAX_ENTRIES if max_entries is None else max_entries
+        self.ttl_seconds = DEFAULT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.sqlite_path = DEFAULT_SQLITE_PATH if sqlite_path is None else sqlite_path
+
+        self._entries = OrderedDict()  # key -> (created_at, vector)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+
+        self.counters = {
+            "hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "shared_errors": 0,
+        }
+
+        if self.sqlite_path:
+            self._init_shared_tier()
+
+    def key(self, text: str) -> str:
+        """Stable digest of model + normalized query."""
+        return hashlib.sha256(f"{self.model}\n{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for a query, or None on a miss."""
+        key = self.key(text)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, vector = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return vector
+                del self._entries[key]
+                self.counters["expirations"] += 1
+
+        vector, created_at = self._shared_get(key, now)
+        if vector is not None:
+            with self._lock:
+                self.counters["shared_hits"] += 1
+                self._insert(key, created_at, vector)
+            return vector
+
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, text: str, vector) -> np.ndarray:
+        """Cache an embedding for a query in both tiers and return it as float32."""
+        key = self.key(text)
+        vector = np.asarray(vector, dtype=np.float32)
+        now = time.time()
+
+        with self._lock:
+            self._insert(key, now, vector)
+        self._shared_put(key, now, vector)
+        return vector
+
+    def _insert(self, key: str, created_at: float, vector: np.ndarray):
+        """Insert into the LRU and evict past max_entries. Caller holds the lock."""
+        self._entries[key] = (created_at, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def stats(self) -> Dict:
+        """Counters and sizes for /api/health."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["shared_hits"]) / lookups, 3) if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["shared_tier"] = bool(self.sqlite_path)
+        return stats
+
+    def after_fork(self):
+        """Drop SQLite connections inherited from the parent process (call in a forked worker)."""
+        self._local = threading.local()
+
+    # --- Shared SQLite tier ---
+
+    def _connection(self):
+        """One SQLite connection per thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.sqlite_path, timeout=2.0)
+            self._local.conn = conn
+        return conn
+
+    def _init_shared_tier(self):
+        try:
+            conn = self._connection()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "key TEXT PRIMARY KEY, created_at REAL NOT NULL, vector BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_query_embeddings_created ON query_embeddings(created_at)")
+            conn.commit()
+            logger.info(f" Query embedding cache: shared SQLite tier at {self.sqlite_path}")
+        except Exception as e:
+            logger.warning(f" Query embedding cache: shared tier disabled ({e})")
+            self.sqlite_path = ""
+
+    def _shared_get(self, key: str, now: float):
+        if not self.sqlite_path:
+            return None, None
+        try:
+            row = self._connection().execute(
+                "SELECT created_at, vector FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[0] <= self.ttl_seconds:
+                return np.frombuffer(row[1], dtype=np.float32).copy(), row[0]
+        except Exception as e:
+            self.counters["shared_errors"] += 1
+            logger.warning(f" Query embedding cache: shared read failed ({e})")
+        return None, None
+
+    def _shared_put(self, key: str, created_at: float, vector: np.ndarray):
+        if not self.sqlite_path:
+            return
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, created_at, vector) VALUES (?, ?, ?)",
+                (key, created_at, vector.tobytes())
+            )
+            self._writes += 1
+            if self._writes % SHARED_PRUNE_EVERY == 0:
+                self._shared_prune(conn, created_at)
+            conn.commit()
+        except Exception as e:
+            self.counters["shared_errors"] += 1
+            logger.warning(f" Query embedding cache: shared write failed ({e})")
+
+    def _shared_prune(self, conn, now: float):
+        """Drop expired rows and keep the shared tier bounded."""
+        conn.execute("DELETE FROM query_embeddings WHERE created_at < ?", (now - self.ttl_seconds,))
+        conn.execute(
+            "DELETE FROM query_embeddings WHERE key IN ("
+            "SELECT key FROM query_embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries * SHARED_MAX_ENTRIES_FACTOR,)
+        )
@@ -0,0 +1,107 @@
+"""
+Precompiled, immutable context fragments for every rule in the knowledge base.
+
+Context building used to re-format each rule's header, text, exception blocks and
+condition lines from the raw dicts on every request, type-checking as it went.
+Each rule is now rendered and validated once at load; per-query context building
+is a relevance filter over the condition fragments plus a join.
+"""
+
+import logging
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Example lines shown under each exception
+EXCEPTION_EXAMPLES = 2
+
+
+class ConditionFragment(NamedTuple):
+    """One rendered condition of a rule."""
+    index: int              # position in the rule's raw conditions list
+    is_exception: bool
+    match_text: str         # lowercased situation + explanation + examples, for term matching
+    exception_text: str     # "  - explanation" plus example lines (EXCEPTIONS block)
+    line: str               # "- situation: explanation" (conditions block)
+
+
+class RuleFragment(NamedTuple):
+    """A rule's static context pieces."""
+    rule_id: str
+    header: str             # "Rule 16.1: title"
+    local_header: str       # "COLUMBIA CC LOCAL RULE CCC-4: title"
+    body: str               # full rule text
+    related_header: str     # header + body as shown under RELATED EXCEPTION RULES
+    conditions: Tuple[ConditionFragment, ...]
+
+
+def _compile_condition(index: int, condition: Dict) -> ConditionFragment:
+    situation = condition.get('situation', '')
+    explanation = condition.get('explanation', '')
+    examples = condition.get('examples', [])
+    examples = examples if isinstance(examples, list) else []
+
+    exception_text = f"  - {explanation}\n"
+    if 'examples' in condition and isinstance(condition.get('examples'), list):
+        for example in condition['examples'][:EXCEPTION_EXAMPLES]:
+            exception_text += f"    Example: {example}\n"
+
+    return ConditionFragment(
+        index=index,
+        is_exception='exception' in situation.lower(),
+        match_text=(situation + ' ' + explanation + ' ' + ' '.join(examples)).lower(),
+        exception_text=exception_text,
+        line=f"- {situation}: {explanation}\n",
+    )
+
+
+def compile_rule_fragment(rule: Dict) -> RuleFragment:
+    """Render one rule; malformed conditions are logged here once and left out."""
+    rule_id = rule['id']
+    title = rule.get('title', '')
+    text = rule.get('text', '')
+
+    conditions = []
+    conditions_list = rule.get('conditions', [])
+    if not isinstance(conditions_list, list):
+        logger.error(f" Conditions for {rule_id} is not a list: {type(conditions_list)}")
+    else:
+        try:
+            for index, condition in enumerate(conditions_list):
+                if not isinstance(condition, dict):
+                    logger.error(f" Condition in {rule_id} is {type(condition)}, not dict")
+                    continue
+                conditions.append(_compile_condition(index, condition))
+        except Exception as e:
+            logger.error(f" Error formatting conditions for rule {rule_id}: {e}")
+            conditions = []
+
+    return RuleFragment(
+        rule_id=rule_id,
+        header=f"Rule {rule_id}: {title}\n",
+        local_header=f"COLUMBIA CC LOCAL RULE {rule_id}: {title}\n",
+        body=f"{text}\n",
+        related_header=f"\nRule {rule_id}: {title}\n{text}\n",
+        conditions=tuple(conditions),
+    )
+
+
+class RuleFragmentCache:
+    """Fragments for the knowledge-base rules, compiled once at load."""
+
+    def __init__(self, rules: Iterable[Dict]):
+        self._fragments: Dict[str, Tuple[Dict, RuleFragment]] = {}
+        for rule in rules:
+            if isinstance(rule, dict) and rule.get('id') is not None:
+                self._fragments[rule['id']] = (rule, compile_rule_fragment(rule))
+        logger.info(f" Compiled context fragments for {len(self._fragments)} rules")
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def get(self, rule: Dict) -> RuleFragment:
+        """Fragment for a rule dict; rules not loaded at startup are compiled on the spot."""
+        cached = self._fragments.get(rule.get('id'))
+        if cached is not None and cached[0] is rule:
+            return cached[1]
+        return compile_rule_fragment(rule)
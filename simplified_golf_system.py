@@ -14,11 +14,264 @@ import time
 import logging
 import re
 import json
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Tuple, Any
 from datetime import datetime
 
+import metrics
+from clarification_index import ClarificationIndex
+from context_packer import (ContextFragment, ContextPacker, clarification_priority,
+                            related_rule_priority, rule_priority)
+from kb_index import KnowledgeBaseIndex
+from metrics import timed
+from pattern_matcher import PhraseAutomaton
+from query_analysis import QueryAnalysis
+from rule_fragments import RuleFragmentCache
+
 logger = logging.getLogger(__name__)
 
+# Strict patterns for each template (see SimplifiedGolfRulesSystem._check_template_strict)
+# FIX 1 (revised): 'exclude' = if ANY of these words appear, skip the template
+#         and let the AI handle the complex query. This prevents hole-number-only
+#         matches when the query is really about something else (e.g., flagstick on 16).
+#         The AI enrichment step will append local rule details if relevant.
+# FIX 7: Expanded lost ball patterns.
+TEMPLATE_PATTERNS = {
+    'clear_lost_ball': {
+        # FIX 7: Relaxed -- only 'ball' required; 'lost' moved to any_of with synonyms
+        'required': ['ball'],
+        'any_of': ['lost', "can't find", 'cannot find', 'missing', 'disappeared',
+                   'in the rough', 'in the fescue', 'in the woods', 'in the trees',
+                   'went into the woods', 'never found'],
+        'min_matches': 2
+    },
+    'clear_out_of_bounds': {
+        'required': ['out of bounds', 'ob'],
+        'any_of': ['fence', 'boundary', 'over the'],
+        'min_matches': 2  
+    },
+    'water_hazard_16': {
+        'required': ['16'],
+        'any_of': ['water', 'penalty area', 'hazard', 'pond', 'sixteenth'],
+        # FIX 1: Exclude -- if query is about a non-water topic, let AI handle it
+        'exclude': ['flagstick', 'flag stick', 'flag', 'pin', 'putt', 'green',
+                    'bunker', 'sand', 'tree', 'fence', 'cart path', 'obstruction',
+                    'unplayable', 'embedded', 'lost', 'out of bounds', 'tee',
+                    'fairway', 'rough', 'stance', 'swing', '15', 'fifteen'],
+        'min_matches': 2
+    },
+    'water_hazard_17': {
+        'required': ['17'],
+        'any_of': ['water', 'penalty area', 'hazard', 'pond', 'seventeenth'],
+        # FIX 1: Exclude
+        'exclude': ['flagstick', 'flag stick', 'flag', 'pin', 'putt', 'green',
+                    'bunker', 'sand', 'tree', 'fence', 'cart path', 'obstruction',
+                    'unplayable', 'embedded', 'lost', 'out of bounds', 'tee',
+                    'fairway', 'rough', 'stance', 'swing'],
+        'min_matches': 2
+    },
+    'turf_nursery': {
+        'required': ['turf', 'nursery'],
+        'any_of': ['farm', 'grass', 'sod', 'maintenance'],
+        'min_matches': 2
+    },
+    'maintenance_facility': {
+        'required': ['maintenance'],
+        'any_of': ['facility', 'building', 'shed', 'equipment', 'area'],
+        'min_matches': 2
+    },
+    'aeration_holes': {
+        'required': ['aeration'],
+        'any_of': ['hole', 'holes', 'punch', 'punched', 'aerify'],
+        'min_matches': 2
+    },
+    'construction_fence_relief': {
+        'required': ['fence'],
+        'any_of': ['purple line', 'construction', 'mesh'],
+        'exclude': ['bounced back', 'bounce back', 'back onto', 'back on the course',
+                    'back in play', 'back in bounds', 'came back', 'ricocheted back'],
+        'min_matches': 2
+    },
+    'purple_line_boundary': {
+        'required': ['purple'],
+        'any_of': ['line', 'boundary', 'train', 'tracks', 'wall', 'fence'],
+        'min_matches': 1,
+        'min_confidence': 0.2
+    },
+    'green_stakes_cart_path': {
+        'required': ['path', 'green'],
+        'any_of': ['14', '17', 'behind', 'stakes', 'cart path', 'cart', 'marked'],
+        'min_matches': 2
+    },
+    'OB_lines': {
+        'required': ['line'],
+        'any_of': ['white', 'boundary', 'touching', 'on the', 'painted', 'ob'],
+        'min_matches': 2
+    },
+    'the_shack': {
+        'required': ['shack'],
+        'any_of': ['relief', 'drop', 'gravel', 'pebbles', 'rocks', 'paved', 'building', 'snack', 'snackbar'],
+        'min_matches': 1,
+        'min_confidence': 0.2
+    },
+    'wrong_green_practice': {
+        'required': ['practice green'],
+        'any_of': ['relief', 'drop', 'ball', 'lies', 'play', 'hit', 'landed', 'resting', 'stance', 'swing'],
+        'min_matches': 1,
+        'min_confidence': 0.2
+    }
+}
+
+# Every required / any_of / exclude phrase of every template, compiled once into a
+# single automaton: one scan of the question answers all of the `phrase in question`
+# checks for all templates together.
+TEMPLATE_AUTOMATON = PhraseAutomaton(
+    phrase
+    for patterns in TEMPLATE_PATTERNS.values()
+    for key in ('required', 'any_of', 'exclude')
+    for phrase in patterns.get(key, [])
+)
+
+# FIX 4: Negative patterns -- these are procedural, not definitional
+PROCEDURAL_INDICATORS = [
+    'what do i do', 'what should i do', 'what happens',
+    'what are my options', 'what is the ruling', 'what is the rule',
+    'what is the penalty', 'what is the procedure',
+    'what are the steps', 'what is a player supposed to',
+    'what are the options', 'what is the correct',
+    'what are the rules', 'what is the best',
+    'how do i', 'how should i', 'can i', 'am i allowed',
+    'do i get', 'is there a penalty'
+]
+
+DEFINITION_INDICATORS = [
+    'what is a', 'what is an', 'what are',
+    'what does',
+    'define', 'definition of',
+    'meaning of', 'means',
+    'what constitutes', 'explain what'
+]
+
+DEFINITION_INDICATOR_AUTOMATON = PhraseAutomaton(PROCEDURAL_INDICATORS + DEFINITION_INDICATORS)
+
+# Static instructions for the unified prompt, sent as the system message. Kept byte-stable
+# (nothing per-request is interpolated) so the provider can cache the prompt prefix;
+# the rules context and question follow in the user message.
+UNIFIED_SYSTEM_PROMPT = """You are an expert golf rules official at Columbia Country Club with complete knowledge of both USGA Rules and Columbia's local rules.
+
+CRITICAL INSTRUCTIONS FOR ACCURATE RULINGS:
+
+0. DEFAULT CLASSIFICATION OF COMMON COURSE OBJECTS (unless a local rule explicitly says otherwise):
+   IMMOVABLE OBSTRUCTIONS (free relief under Rule 16.1):
+   - Bridges, footbridges, and pedestrian crossings
+   - Cart paths and paved surfaces
+   - Sprinkler heads, drain covers, and irrigation boxes
+   - Permanent benches, trash cans, and ball washers
+   - Retaining walls (unless defining a boundary)
+   - Permanent shelters and rain shelters
+   
+   BOUNDARY OBJECTS (NO relief - not obstructions):
+   - Boundary fences, walls, and posts (white stakes or lines)
+   - Perimeter fencing defining property lines
+   - Any fence or wall that defines out of bounds
+   
+   INTEGRAL OBJECTS (NO relief - only when designated by local rule):
+   - Objects are ONLY integral if a local rule explicitly designates them
+   - Do NOT assume any object is integral unless the context states it
+   - "No free relief" from an integral object means you cannot drop AWAY from it under Rule 16.1
+   - HOWEVER, you CAN always remove loose impediments (rocks, leaves, sticks, etc.) anywhere on the course under Rule 15.1, even when your ball is on or near an integral object, a boundary object, or in a penalty area - as long as doing so does not cause your ball to move
+   
+   IMPORTANT: A ball on a bridge over a penalty area is treated as being in the penalty area (Rule 17.1a), BUT the bridge itself is still an immovable obstruction. If the ball is NOT over a penalty area, normal Rule 16.1 relief applies.
+
+1. IDENTIFY THE PRIMARY RULE that applies to this situation
+
+2. CHECK FOR EXCEPTIONS - This is absolutely critical! Consider:
+   - WHO caused the condition:
+     * If another player/person caused it -- Check Rule 8.1d (may restore conditions)
+     * If animal/natural forces caused it -- Check Rules 9.3, 9.6
+     * If player accidentally caused it -- Check Rule 9.4
+   
+   - WHEN it happened:
+     * After ball came to rest -- Different rules may apply (8.1d, 9.3)
+     * During the stroke -- Rule 9.1b
+     * While ball in motion -- Rules 11.1-11.3
+     * After marking and lifting -- Rule 14.2d
+     * IMPORTANT: If ball was lifted and replaced BEFORE natural forces moved it -- Rule 9.3 Exception applies (replace ball, not play as it lies)
+   
+   - WHERE on the course:
+     * Putting green -- Special rules under Rule 13
+     * Penalty area -- Rule 17 procedures
+     * Bunker -- Rule 12 specific rules
+     * Teeing area -- Rule 6 applies (including Rule 6.2b(5): no penalty for accidentally moving ball on tee)
+   
+   - INTENT (accidental vs. deliberate):
+     * Accidental movement -- Often no penalty or different procedure
+     * Deliberate actions -- Usually penalties apply
+     * IMPORTANT: Accidental contact during backswing or practice swing is NOT a stroke -- a stroke requires intent to hit the ball forward. If the ball was accidentally knocked off the tee during a backswing, it is NOT a stroke and Rule 6.2b(5) applies.
+
+   - EXCEPTIONS WITHIN RULES:
+     * Many rules have exceptions listed within them - check carefully!
+     * Look for conditions labeled "Exception:", "Allowed:", or "Does not apply when:" clauses
+     * Read ALL conditions carefully before concluding something is not allowed
+
+3. CHECK COLUMBIA CC LOCAL RULES:
+   - If a Columbia local rule applies to this specific situation, it takes precedence
+   - Columbia rules are marked as "CCC-" in the context, but NEVER cite the local rule number in your response
+   
+   CRITICAL - DO NOT FABRICATE LOCAL RULES:
+   - ONLY apply a Columbia CC local rule if the context EXPLICITLY covers the EXACT situation in the question
+   - A local rule about a bridge on hole 16 does NOT apply to a bridge on hole 13
+   - A local rule about a fence near the Purple Line does NOT apply to other fences on the course
+   - If no Columbia CC local rule EXPLICITLY addresses the specific location, object, or hole mentioned in the question, treat it as a standard Rules of Golf question
+   - When no local rule applies, give ONLY the official USGA ruling - do NOT say "According to Columbia's local rules"
+   - NEVER invent, assume, or extrapolate local rules for situations not explicitly covered in the context
+   - If a course feature (bridge, fence, path, etc.) is not specifically mentioned in a local rule, apply the standard Rules of Golf treatment for that type of object
+
+4. CHECK USGA CLARIFICATIONS:
+   - If the context includes "USGA Clarification" entries, these are OFFICIAL interpretive guidance from the USGA
+   - Clarifications provide authoritative detail on HOW to apply rules in specific situations
+   - When a clarification is relevant, you MUST incorporate its specific guidance into your answer
+   - For example, if a clarification explains that the nearest point of relief is on the ground beneath an elevated obstruction, your answer must include this detail
+   - Clarifications are as authoritative as the rules themselves
+
+5. PROVIDE YOUR ANSWER:
+   - State the applicable rule(s) clearly; include rule numbers for Official Rules of Golf but do NOT state the applicable rule number when referencing CCC local rules
+   - Mention ANY exceptions or special cases that apply
+   - Specify the correct procedure step by step
+   - State any penalties (or explicitly note if there's no penalty)
+   - If an exception changes the ruling, explain why
+
+RESPONSE FORMAT:
+  - Start with the direct answer/ruling first (1-2 sentences)
+  - Then provide the explanation with rule citations, but do not cite specific local rule numbers
+  - Keep total response concise: 150-250 words
+  - Don't explore rules that don't apply to this situation
+  - Set max_tokens to 400 in the API call
+
+Start your response appropriately:
+  - "According to Columbia's local rules..." ONLY if a local rule in the context EXPLICITLY covers this exact situation. Do NOT state specific rule number for local rules.
+  - "According to the Rules of Golf, Rule X.X..." for all other questions
+        
+Example of complete answer:
+"According to The Rules of Golf, Rule 13.1c, you generally cannot repair damage on the fringe. However, Rule 8.1d provides an exception: since another player caused the damage after your ball came to rest, you ARE allowed to restore the conditions to what they were. You may repair the pitch mark without penalty.\""""
+
+
+def prompt_cache_usage(usage: Any) -> Dict:
+    """
+    Prompt tokens and the part served from the provider's prompt cache, when reported.
+    
+    Returns {} when the response carries no usage, and cached_tokens None when the
+    API/SDK does not report prompt_tokens_details.
+    """
+    if not usage or getattr(usage, 'prompt_tokens', None) is None:
+        return {}
+    details = getattr(usage, 'prompt_tokens_details', None)
+    if isinstance(details, dict):
+        cached_tokens = details.get('cached_tokens')
+    else:
+        cached_tokens = getattr(details, 'cached_tokens', None)
+    return {'prompt_tokens': usage.prompt_tokens, 'cached_tokens': cached_tokens}
+
+
 class SimplifiedGolfRulesSystem:
     """
     Simplified three-stage routing system with enhanced logging:
@@ -34,7 +287,9 @@ class SimplifiedGolfRulesSystem:
                  openai_client: Any,
                  rules_database: Dict,
                  local_rules: List,
-                 clarifications_db: Dict = None):
+                 clarifications_db: Dict = None,
+                 answer_cache: Any = None,
+                 kb_version: str = ""):
         """
         Initialize with existing components from web_api.py
         """
@@ -44,7 +299,15 @@ class SimplifiedGolfRulesSystem:
         self.client = openai_client
         self.rules_database = rules_database
         self.local_rules = local_rules
+        self.kb_index = KnowledgeBaseIndex(rules_database, local_rules)
+        self.rule_fragments = RuleFragmentCache(self.kb_index.rules.values())
         self.clarifications_db = clarifications_db or {}
+        self.clarification_index = ClarificationIndex(self.clarifications_db)
+        self.context_packer = ContextPacker()
+        
+        # Semantic answer cache: near-duplicate questions reuse a stored AI answer
+        self.answer_cache = answer_cache
+        self.kb_version = kb_version
         
         # Model selection - UPDATE THIS based on check_openai_models.py results
         self.model = "gpt-4o"
@@ -78,7 +341,7 @@ class SimplifiedGolfRulesSystem:
             'error': 'error_fallback'
         }
         
-    def process_query(self, question: str, verbose: bool = False) -> Dict:
+    def process_query(self, question: str, verbose: bool = False, analysis: Optional[QueryAnalysis] = None) -> Dict:
         """
         Main entry point - simplified three-stage routing with comprehensive logging
         """
@@ -88,34 +351,52 @@ class SimplifiedGolfRulesSystem:
         # Log query start
         self._log_query_start(query_id, question)
         
+        # Analyze the question once; every stage shares this view of it
+        analysis = QueryAnalysis.of(question, analysis)
+        
+        # STAGE 1 + 2: templates, then definitions
+        instant_result = self._check_fast_paths(question, verbose, query_id, analysis)
+        if instant_result:
+            result = self._format_response(instant_result, start_time, query_id)
+            self._log_query_complete(query_id, question, result)
+            return result
+        
+        # STAGE 3: Unified AI with exception handling
+        if verbose:
+            logger.info(f" [{query_id}] Using unified AI with exception checking")
+        ai_result = self._get_unified_ai_response(question, verbose, query_id, analysis)
+        result = self._format_response(ai_result, start_time, query_id)
+        self._log_query_complete(query_id, question, result)
+        return result
+    
+    def _check_fast_paths(self, question: str, verbose: bool = False, query_id: str = "",
+                          analysis: Optional[QueryAnalysis] = None) -> Optional[Dict]:
+        """
+        Stages 1 and 2: a template or definitions answer, or None if the question needs the AI.
+        """
+        analysis = QueryAnalysis.of(question, analysis)
+        
         # STAGE 1: Check templates (strict matching for Columbia CC rules)
-        template_result = self._check_template_strict(question, verbose)
+        with timed('template'):
+            template_result = self._check_template_strict(question, verbose, analysis)
         if template_result:
             if verbose:
                 logger.info(f" [{query_id}] Using template with confidence {template_result['confidence']:.2f}")
-            result = self._format_response(template_result, start_time, query_id)
-            self._log_query_complete(query_id, question, result)
-            return result
+            return template_result
         
         # STAGE 2: Check definitions
-        if self._is_definition_query(question):
-            definition_result = self._get_definition_response(question)
+        if self._is_definition_query(question, analysis):
+            with timed('definition'):
+                definition_result = self._get_definition_response(question, analysis)
             if definition_result:
                 if verbose:
                     logger.info(f" [{query_id}] Using definitions database")
-                result = self._format_response(definition_result, start_time, query_id)
-                self._log_query_complete(query_id, question, result)
-                return result
+                return definition_result
         
-        # STAGE 3: Unified AI with exception handling
-        if verbose:
-            logger.info(f" [{query_id}] Using unified AI with exception checking")
-        ai_result = self._get_unified_ai_response(question, verbose, query_id)
-        result = self._format_response(ai_result, start_time, query_id)
-        self._log_query_complete(query_id, question, result)
-        return result
+        return None
     
-    def _check_template_strict(self, question: str, verbose: bool = False) -> Optional[Dict]:
+    def _check_template_strict(self, question: str, verbose: bool = False,
+                               analysis: Optional[QueryAnalysis] = None) -> Optional[Dict]:
         """
         Stricter template matching - only return if we're very confident.
         
@@ -126,115 +407,24 @@ class SimplifiedGolfRulesSystem:
         
         FIX 7: Expanded clear_lost_ball patterns to catch more natural phrasings.
         """
-        question_lower = question.lower().strip()
-        
-        # Define strict patterns for each template
-        # FIX 1 (revised): 'exclude' = if ANY of these words appear, skip the template
-        #         and let the AI handle the complex query. This prevents hole-number-only
-        #         matches when the query is really about something else (e.g., flagstick on 16).
-        #         The AI enrichment step will append local rule details if relevant.
-        # FIX 7: Expanded lost ball patterns.
-        template_patterns = {
-            'clear_lost_ball': {
-                # FIX 7: Relaxed -- only 'ball' required; 'lost' moved to any_of with synonyms
-                'required': ['ball'],
-                'any_of': ['lost', "can't find", 'cannot find', 'missing', 'disappeared',
-                           'in the rough', 'in the fescue', 'in the woods', 'in the trees',
-                           'went into the woods', 'never found'],
-                'min_matches': 2
-            },
-            'clear_out_of_bounds': {
-                'required': ['out of bounds', 'ob'],
-                'any_of': ['fence', 'boundary', 'over the'],
-                'min_matches': 2  
-            },
-            'water_hazard_16': {
-                'required': ['16'],
-                'any_of': ['water', 'penalty area', 'hazard', 'pond', 'sixteenth'],
-                # FIX 1: Exclude -- if query is about a non-water topic, let AI handle it
-                'exclude': ['flagstick', 'flag stick', 'flag', 'pin', 'putt', 'green',
-                            'bunker', 'sand', 'tree', 'fence', 'cart path', 'obstruction',
-                            'unplayable', 'embedded', 'lost', 'out of bounds', 'tee',
-                            'fairway', 'rough', 'stance', 'swing', '15', 'fifteen'],
-                'min_matches': 2
-            },
-            'water_hazard_17': {
-                'required': ['17'],
-                'any_of': ['water', 'penalty area', 'hazard', 'pond', 'seventeenth'],
-                # FIX 1: Exclude
-                'exclude': ['flagstick', 'flag stick', 'flag', 'pin', 'putt', 'green',
-                            'bunker', 'sand', 'tree', 'fence', 'cart path', 'obstruction',
-                            'unplayable', 'embedded', 'lost', 'out of bounds', 'tee',
-                            'fairway', 'rough', 'stance', 'swing'],
-                'min_matches': 2
-            },
-            'turf_nursery': {
-                'required': ['turf', 'nursery'],
-                'any_of': ['farm', 'grass', 'sod', 'maintenance'],
-                'min_matches': 2
-            },
-            'maintenance_facility': {
-                'required': ['maintenance'],
-                'any_of': ['facility', 'building', 'shed', 'equipment', 'area'],
-                'min_matches': 2
-            },
-            'aeration_holes': {
-                'required': ['aeration'],
-                'any_of': ['hole', 'holes', 'punch', 'punched', 'aerify'],
-                'min_matches': 2
-            },
-            'construction_fence_relief': {
-                'required': ['fence'],
-                'any_of': ['purple line', 'construction', 'mesh'],
-                'exclude': ['bounced back', 'bounce back', 'back onto', 'back on the course',
-                            'back in play', 'back in bounds', 'came back', 'ricocheted back'],
-                'min_matches': 2
-            },
-            'purple_line_boundary': {
-                'required': ['purple'],
-                'any_of': ['line', 'boundary', 'train', 'tracks', 'wall', 'fence'],
-                'min_matches': 1,
-                'min_confidence': 0.2
-            },
-            'green_stakes_cart_path': {
-                'required': ['path', 'green'],
-                'any_of': ['14', '17', 'behind', 'stakes', 'cart path', 'cart', 'marked'],
-                'min_matches': 2
-            },
-            'OB_lines': {
-                'required': ['line'],
-                'any_of': ['white', 'boundary', 'touching', 'on the', 'painted', 'ob'],
-                'min_matches': 2
-            },
-            'the_shack': {
-                'required': ['shack'],
-                'any_of': ['relief', 'drop', 'gravel', 'pebbles', 'rocks', 'paved', 'building', 'snack', 'snackbar'],
-                'min_matches': 1,
-                'min_confidence': 0.2
-            },
-            'wrong_green_practice': {
-                'required': ['practice green'],
-                'any_of': ['relief', 'drop', 'ball', 'lies', 'play', 'hit', 'landed', 'resting', 'stance', 'swing'],
-                'min_matches': 1,
-                'min_confidence': 0.2
-            }
-        }
+        analysis = QueryAnalysis.of(question, analysis)
         
         best_match = None
         best_confidence = 0.0
         
-        for template_name, patterns in template_patterns.items():
+        # Single pass over the question finds every template phrase it contains
+        hits = analysis.phrase_hits(TEMPLATE_AUTOMATON)
+        
+        for template_name, patterns in TEMPLATE_PATTERNS.items():
             matches = 0
             confidence = 0.0
             
             # Check required patterns
-            required_found = 0
-            for required in patterns.get('required', []):
-                if required in question_lower:
-                    required_found += 1
+            required = patterns.get('required', [])
+            required_found = sum(1 for phrase in required if phrase in hits)
             
             # If not all required patterns found, skip
-            if required_found < len(patterns.get('required', [])):
+            if required_found < len(required):
                 continue
                 
             matches += required_found
@@ -244,21 +434,18 @@ class SimplifiedGolfRulesSystem:
             # The enrichment step will append local rule details if the AI's answer warrants it.
             exclude_words = patterns.get('exclude')
             if exclude_words:
-                excluded = any(ew in question_lower for ew in exclude_words)
+                excluded = any(ew in hits for ew in exclude_words)
                 if excluded:
                     if verbose:
                         logger.info(f" Template '{template_name}' skipped: exclude word found, routing to AI + enrichment")
                     continue
             
             # Check any_of patterns
-            any_of_found = 0
-            for pattern in patterns.get('any_of', []):
-                if pattern in question_lower:
-                    any_of_found += 1
-                    matches += 1
+            any_of = patterns.get('any_of', [])
+            matches += sum(1 for phrase in any_of if phrase in hits)
             
             # Calculate confidence
-            total_patterns = len(patterns.get('required', [])) + len(patterns.get('any_of', []))
+            total_patterns = len(required) + len(any_of)
             if total_patterns > 0:
                 confidence = matches / total_patterns
             
@@ -272,7 +459,7 @@ class SimplifiedGolfRulesSystem:
         
         if best_match:
             # Use per-template min_confidence if set, otherwise default 0.3
-            best_patterns = template_patterns.get(best_match, {})
+            best_patterns = TEMPLATE_PATTERNS.get(best_match, {})
             min_conf = best_patterns.get('min_confidence', 0.3)
             if best_confidence >= min_conf:
                 template = self.templates.get(best_match)
@@ -289,7 +476,7 @@ class SimplifiedGolfRulesSystem:
         
         return None
     
-    def _is_definition_query(self, question: str) -> bool:
+    def _is_definition_query(self, question: str, analysis: Optional[QueryAnalysis] = None) -> bool:
         """
         Check if this is asking for a definition.
         
@@ -297,167 +484,342 @@ class SimplifiedGolfRulesSystem:
         routed to the definitions stage. "What is the ruling if my ball is in a bunker?"
         is procedural, not definitional, even though it contains "what is" and "bunker."
         """
-        question_lower = question.lower()
+        analysis = QueryAnalysis.of(question, analysis)
+        hits = analysis.phrase_hits(DEFINITION_INDICATOR_AUTOMATON, analysis.lower)
         
         # FIX 4: Negative patterns -- these are procedural, not definitional
-        procedural_indicators = [
-            'what do i do', 'what should i do', 'what happens',
-            'what are my options', 'what is the ruling', 'what is the rule',
-            'what is the penalty', 'what is the procedure',
-            'what are the steps', 'what is a player supposed to',
-            'what are the options', 'what is the correct',
-            'what are the rules', 'what is the best',
-            'how do i', 'how should i', 'can i', 'am i allowed',
-            'do i get', 'is there a penalty'
-        ]
-        if any(indicator in question_lower for indicator in procedural_indicators):
+        if hits.any(PROCEDURAL_INDICATORS):
             return False
         
-        definition_indicators = [
-            'what is a', 'what is an', 'what are',
-            'what does',
-            'define', 'definition of',
-            'meaning of', 'means',
-            'what constitutes', 'explain what'
-        ]
-        return any(indicator in question_lower for indicator in definition_indicators)
+        return hits.any(DEFINITION_INDICATORS)
     
-    def _get_definition_response(self, question: str) -> Optional[Dict]:
+    def _get_definition_response(self, question: str, analysis: Optional[QueryAnalysis] = None) -> Optional[Dict]:
         """
         Get definition from the definitions database
         """
         from golf_definitions_db import search_definitions_by_keyword
         
-        # Extract key terms from the question
-        question_lower = question.lower()
-        
-        # Extended list of golf terms to check
-        golf_terms = [
-            'penalty area', 'bunker', 'putting green', 'teeing area', 
-            'general area', 'obstruction', 'loose impediment', 'ground under repair',
-            'abnormal course condition', 'temporary water', 'provisional ball',
-            'lost ball', 'out of bounds', 'water hazard', 'lateral water hazard',
-            'casual water', 'stance', 'stroke', 'ball marker', 'wrong ball',
-            'four-ball', 'match play', 'stroke play', 'handicap', 'net score',
-            'gross score', 'through the green', 'hazard', 'relief area'
-        ]
+        # Golf terms in the question (extended list in query_analysis.DEFINITION_TERMS)
+        analysis = QueryAnalysis.of(question, analysis)
         
-        for term in golf_terms:
-            if term in question_lower:
-                definitions = search_definitions_by_keyword([term])  # Note: expects list
-                if definitions:
-                    definition = definitions[0]['definition']  # Extract the actual definition object
-                    answer = f"**{definition['term']}**: {definition['definition']}"
-                    if definition.get('examples'):
-                        answer += f"\n\n**Examples**: {', '.join(definition['examples'][:3])}"
-                    if definition.get('related_rules'):
-                        answer += f"\n\n**Related Rules**: {', '.join(definition['related_rules'][:3])}"
-                    
-                    return {
-                        'answer': answer,
-                        'source': 'definitions',
-                        'confidence': 'high',
-                        'definition_id': definition.get('id'),
-                        'tokens_used': 0
-                    }
+        for term in analysis.definition_terms:
+            definitions = search_definitions_by_keyword([term])  # Note: expects list
+            if definitions:
+                definition = definitions[0]['definition']  # Extract the actual definition object
+                answer = f"**{definition['term']}**: {definition['definition']}"
+                if definition.get('examples'):
+                    answer += f"\n\n**Examples**: {', '.join(definition['examples'][:3])}"
+                if definition.get('related_rules'):
+                    answer += f"\n\n**Related Rules**: {', '.join(definition['related_rules'][:3])}"
+                
+                return {
+                    'answer': answer,
+                    'source': 'definitions',
+                    'confidence': 'high',
+                    'definition_id': definition.get('id'),
+                    'tokens_used': 0
+                }
         return None
     
-    def _get_unified_ai_response(self, question: str, verbose: bool = False, query_id: str = "") -> Dict:
+    def _get_unified_ai_response(self, question: str, verbose: bool = False, query_id: str = "",
+                                 analysis: Optional[QueryAnalysis] = None) -> Dict:
         """
         Unified AI response with explicit exception checking and comprehensive logging.
         
         FIX 11: Removed duplicate _create_unified_prompt() call and debug logging.
         """
         try:
-            # Get relevant rules from vector search
+            request = self._prepare_ai_request(question, verbose, query_id, analysis)
+            if 'cached_result' in request:
+                return request['cached_result']
+            
+            # Get AI response
+            with timed('llm'):
+                response = self.client.chat.completions.create(
+                    model=self.model,  # Uses the model set in __init__
+                    messages=self._unified_messages(request['prompt']),
+                    temperature=0.1,
+                    max_tokens=400
+                )
+            
+            # Enrich AI response with local rule templates where relevant
+            answer = response.choices[0].message.content
+            with timed('enrichment'):
+                answer = self._enrich_ai_response(answer, question, request['analysis'])
+            
+            tokens_used = response.usage.total_tokens if response.usage else 0
+            return self._finish_ai_response(request, answer, tokens_used, response.usage)
+            
+        except Exception as e:
+            import traceback
+            logger.error(f" [{query_id}] Unified AI error: {e}\n{traceback.format_exc()}") 
+            return self._ai_error_result(e)
+    
+    @staticmethod
+    def _ai_error_result(error: Exception) -> Dict:
+        """Result returned when the AI stage fails."""
+        return {
+            'answer': "I encountered an error processing your question. Please try rephrasing it.",
+            'source': 'error',
+            'confidence': 'none',
+            'tokens_used': 0,
+            'error': str(error)
+        }
+    
+    def _prepare_ai_request(self, question: str, verbose: bool = False, query_id: str = "",
+                            analysis: Optional[QueryAnalysis] = None, query_vector=None) -> Dict:
+        """
+        Everything before the chat call: answer cache lookup, search, filtering and prompt.
+        
+        Returns {'cached_result': ...} on an answer cache hit, otherwise the prompt and
+        the search state _finish_ai_response needs. A query_vector already computed by
+        the caller (e.g. the async pipeline's speculative embedding) is used as is.
+        """
+        analysis = QueryAnalysis.of(question, analysis)
+        
+        # Embed once up front: the vector drives the answer cache and the search. Queries
+        # the search answers without an embedding (decisive exact-term matches) skip both.
+        cache_guard = self._answer_cache_guard(question)
+        if self.answer_cache is not None and (query_vector is not None or
+                                              self.search_engine.needs_query_embedding(question, analysis)):
+            if query_vector is None:
+                with timed('embedding'):
+                    query_vector = self.search_engine.embed_query(question)
+            if query_vector is not None:
+                with timed('answer_cache'):
+                    cached = self.answer_cache.lookup(query_vector, self.kb_version, guard=cache_guard)
+                if cached:
+                    if verbose:
+                        logger.info(f" [{query_id}] Answer cache hit (similarity {cached['cache_similarity']:.3f}) "
+                                    f"for: {cached['cached_question'][:80]}")
+                    cached['cache_hit'] = True
+                    cached['tokens_used'] = 0
+                    return {'cached_result': cached}
+        
+        # Get relevant rules from vector search
+        with timed('search'):
             search_results = self.search_engine.search_with_precedence(
                 question, 
                 top_n=12,  # Get more rules for better context
-                verbose=verbose
+                verbose=verbose,
+                query_vector=query_vector,
+                analysis=analysis
             )
 
-            local_rules = [r for r in search_results if r.get('is_local')]
-            official_rules = [r for r in search_results if not r.get('is_local')]
-            search_results = local_rules[:3] + official_rules[:9]
+        local_rules = [r for r in search_results if r.get('is_local')]
+        official_rules = [r for r in search_results if not r.get('is_local')]
+        search_results = local_rules[:3] + official_rules[:9]
 
-            for result in search_results:
-                rule_id = result['rule']['id']
-                full_rule = self._get_rule_by_id(rule_id)
-                if full_rule:
-                    result['rule'] = full_rule
-
-            filtered_results = [r for r in search_results if r.get('best_similarity', 0) >= 0.5]
+        for result in search_results:
+            rule_id = result['rule']['id']
+            full_rule = self._get_rule_by_id(rule_id)
+            if full_rule:
+                result['rule'] = full_rule
 
-            # Fallback: if nothing scores >0.5, keep top 3-5 anyway
-            if not filtered_results:
-                filtered_results = search_results[:5]  # At least give AI something to work with
-                if verbose:
-                    logger.info(f" No rules scored >0.5, using top {len(filtered_results)} as fallback")
+        filtered_results = [r for r in search_results if r.get('best_similarity', 0) >= 0.5]
 
-            search_results = filtered_results
-            
+        # Fallback: if nothing scores >0.5, keep top 3-5 anyway
+        if not filtered_results:
+            filtered_results = search_results[:5]  # At least give AI something to work with
             if verbose:
-                logger.info(f" [{query_id}] Balanced results: {len(local_rules[:3])} local + {len(official_rules[:9])} official")
-                logger.info(f" After 0.5 threshold filter: {len(search_results)} rules")
-            
-            # Check if we found exception-related rules
-            has_exception_rules = self._check_for_exception_rules(search_results)
-            
-            # Build enhanced context with related rules
-            context = self._build_enhanced_context(search_results, question)
-            
-            # Log context stats
-            if verbose:
-                context_rules = re.findall(r'Rule [\d\.]+[a-z]?', context)
-                logger.info(f" [{query_id}] Context includes {len(context_rules)} rules")
-                logger.info(f" [{query_id}] Full context being sent:\n{context[:2000]}")
-                if has_exception_rules:
-                    logger.info(f" [{query_id}] Exception rules detected in context")
-            
-            # Create the unified prompt with explicit exception handling
-            # FIX 11: Single call (was duplicated before)
-            prompt = self._create_unified_prompt(question, context)
-            
-            # Get AI response
-            response = self.client.chat.completions.create(
-                model=self.model,  # Uses the model set in __init__
-                messages=[{"role": "user", "content": prompt}],
+                logger.info(f" No rules scored >0.5, using top {len(filtered_results)} as fallback")
+
+        search_results = filtered_results
+        
+        if verbose:
+            logger.info(f" [{query_id}] Balanced results: {len(local_rules[:3])} local + {len(official_rules[:9])} official")
+            logger.info(f" After 0.5 threshold filter: {len(search_results)} rules")
+        
+        # Check if we found exception-related rules
+        has_exception_rules = self._check_for_exception_rules(search_results)
+        
+        # Build enhanced context with related rules
+        with timed('context'):
+            context = self._build_enhanced_context(search_results, question, analysis)
+        
+        # Log context stats
+        if verbose:
+            context_rules = re.findall(r'Rule [\d\.]+[a-z]?', context)
+            logger.info(f" [{query_id}] Context includes {len(context_rules)} rules")
+            logger.info(f" [{query_id}] Full context being sent:\n{context[:2000]}")
+            if has_exception_rules:
+                logger.info(f" [{query_id}] Exception rules detected in context")
+        
+        # Create the unified prompt with explicit exception handling
+        # FIX 11: Single call (was duplicated before)
+        prompt = self._create_unified_prompt(question, context)
+        
+        return {
+            'question': question,
+            'prompt': prompt,
+            'search_results': search_results,
+            'has_exception_rules': has_exception_rules,
+            'query_vector': query_vector,
+            'cache_guard': cache_guard,
+            'analysis': analysis
+        }
+    
+    def _finish_ai_response(self, request: Dict, answer: str, tokens_used: int, usage: Any = None) -> Dict:
+        """Build the result for a completed (already enriched) AI answer and cache it."""
+        search_results = request['search_results']
+        
+        # Determine specific source based on what we found
+        if request['has_exception_rules']:
+            source = 'ai_exception'
+        else:
+            source = 'ai_unified'
+        
+        result = {
+            'answer': answer,
+            'source': source,
+            'confidence': self._assess_confidence(search_results),
+            'tokens_used': tokens_used,
+            'rules_used': [r['rule']['id'] for r in search_results],
+            'has_exceptions': request['has_exception_rules'],
+            'model_used': self.model,
+            'cache_hit': False
+        }
+        result.update(prompt_cache_usage(usage))
+        
+        if self.answer_cache is not None and request['query_vector'] is not None:
+            self.answer_cache.store(
+                request['query_vector'], request['question'],
+                {k: result[k] for k in ('answer', 'source', 'confidence', 'rules_used', 'has_exceptions', 'model_used')},
+                self.kb_version, guard=request['cache_guard']
+            )
+        
+        return result
+    
+    def stream_query(self, question: str, verbose: bool = False,
+                     analysis: Optional[QueryAnalysis] = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        Streaming variant of process_query, yielding (event, data) pairs.
+        
+        Template, definition and cached answers arrive as a single 'answer' event.
+        AI answers arrive as 'token' events while the chat model generates, then an
+        'enrichment' event if a Columbia CC local rule is appended. Every stream ends
+        with a 'done' event carrying the same metadata process_query returns (the
+        full answer, rules_used, tokens_used, response_time) plus time_to_first_token.
+        """
+        start_time = time.time()
+        query_id = f"q_{int(time.time()*1000)}"
+        self._log_query_start(query_id, question)
+        analysis = QueryAnalysis.of(question, analysis)
+        
+        # STAGE 1 + 2: templates and definitions are answered in one event
+        instant_result = self._check_fast_paths(question, verbose, query_id, analysis)
+        
+        request = None
+        if not instant_result:
+            try:
+                request = self._prepare_ai_request(question, verbose, query_id, analysis)
+                instant_result = request.get('cached_result')
+            except Exception as e:
+                logger.error(f" [{query_id}] Unified AI error: {e}")
+                instant_result = self._ai_error_result(e)
+        
+        if instant_result:
+            yield 'answer', {'answer': instant_result['answer']}
+            result = self._format_response(instant_result, start_time, query_id)
+            result['time_to_first_token'] = result['response_time']
+            self._log_query_complete(query_id, question, result)
+            yield 'done', result
+            return
+        
+        # STAGE 3: stream the chat completion
+        time_to_first_token = None
+        parts = []
+        tokens_used = 0
+        usage = None
+        llm_start = time.time()
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._unified_messages(request['prompt']),
                 temperature=0.1,
-                max_tokens=400
+                max_tokens=400,
+                stream=True
             )
-            
-            # Determine specific source based on what we found
-            if has_exception_rules:
-                source = 'ai_exception'
-            else:
-                source = 'ai_unified'
-            
-            # Enrich AI response with local rule templates where relevant
-            answer = response.choices[0].message.content
-            answer = self._enrich_ai_response(answer, question)
-            
-            return {
-                'answer': answer,
-                'source': source,
-                'confidence': self._assess_confidence(search_results),
-                'tokens_used': response.usage.total_tokens if response.usage else 0,
-                'rules_used': [r['rule']['id'] for r in search_results],
-                'has_exceptions': has_exception_rules,
-                'model_used': self.model
-            }
-            
+            for chunk in stream:
+                # Newer SDKs report usage on a final chunk; older ones never do
+                if getattr(chunk, 'usage', None):
+                    usage = chunk.usage
+                    tokens_used = usage.total_tokens
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    if time_to_first_token is None:
+                        time_to_first_token = round(time.time() - start_time, 2)
+                        metrics.observe('golf_stage_duration_seconds', time.time() - llm_start,
+                                        stage='llm_first_token', path='simplified')
+                    parts.append(text)
+                    yield 'token', {'text': text}
         except Exception as e:
-            import traceback
-            logger.error(f" [{query_id}] Unified AI error: {e}\n{traceback.format_exc()}") 
-            return {
-                'answer': "I encountered an error processing your question. Please try rephrasing it.",
+            logger.error(f" [{query_id}] Streaming AI error: {e}")
+            result = self._format_response({
+                'answer': ''.join(parts),
                 'source': 'error',
                 'confidence': 'none',
                 'tokens_used': 0,
                 'error': str(e)
-            }
+            }, start_time, query_id)
+            self._log_query_complete(query_id, question, result)
+            yield 'error', {'error': "I encountered an error processing your question. Please try rephrasing it."}
+            yield 'done', result
+            return
+        
+        metrics.observe('golf_stage_duration_seconds', time.time() - llm_start, stage='llm', path='simplified')
+        
+        answer = ''.join(parts)
+        if not tokens_used:
+            # Estimate (~4 chars per token) when the stream carries no usage
+            tokens_used = (len(UNIFIED_SYSTEM_PROMPT) + len(request['prompt']) + len(answer)) // 4
+        
+        with timed('enrichment'):
+            enriched = self._enrich_ai_response(answer, question, analysis)
+        if len(enriched) > len(answer):
+            yield 'enrichment', {'text': enriched[len(answer):]}
+        
+        result = self._format_response(self._finish_ai_response(request, enriched, tokens_used, usage), start_time, query_id)
+        result['time_to_first_token'] = time_to_first_token
+        self._log_query_complete(query_id, question, result)
+        yield 'done', result
+    
+    # Number words that identify holes/rules; they must match for a cached answer to be reused
+    NUMBER_WORDS = {
+        'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5', 'six': '6',
+        'seven': '7', 'eight': '8', 'nine': '9', 'ten': '10', 'eleven': '11', 'twelve': '12',
+        'thirteen': '13', 'fourteen': '14', 'fifteen': '15', 'sixteen': '16',
+        'seventeen': '17', 'eighteen': '18', 'first': '1', 'second': '2', 'third': '3',
+        'fourth': '4', 'fifth': '5', 'sixth': '6', 'seventh': '7', 'eighth': '8',
+        'ninth': '9', 'tenth': '10', 'eleventh': '11', 'twelfth': '12', 'thirteenth': '13',
+        'fourteenth': '14', 'fifteenth': '15', 'sixteenth': '16', 'seventeenth': '17',
+        'eighteenth': '18'
+    }
+    
+    def _answer_cache_guard(self, question: str) -> frozenset:
+        """
+        Numbers mentioned in the question (hole or rule numbers, digits or words).
+        
+        "Water on 16" and "water on 17" embed almost identically but have different
+        answers, so a cached answer is only reused when these numbers match exactly.
+        """
+        question_lower = question.lower()
+        numbers = set(re.findall(r'\d+(?:\.\d+[a-z]?)?', question_lower))
+        for word in re.findall(r'[a-z]+', question_lower):
+            if word in self.NUMBER_WORDS:
+                numbers.add(self.NUMBER_WORDS[word])
+        return frozenset(numbers)
     
-    def _enrich_ai_response(self, ai_answer: str, question: str) -> str:
+    def invalidate_answer_cache(self, kb_version: Optional[str] = None):
+        """Hook for knowledge-base changes: drop cached answers and adopt the new version."""
+        if kb_version is not None:
+            self.kb_version = kb_version
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(self.kb_version)
+    
+    def _enrich_ai_response(self, ai_answer: str, question: str, analysis: Optional[QueryAnalysis] = None) -> str:
         """
         After AI generates its ruling, check if the answer references a situation
         where a Columbia CC local rule template would add value. If so, append the 
@@ -468,7 +830,7 @@ class SimplifiedGolfRulesSystem:
         2. AI answers that mention penalty areas, lost balls, or OB get Columbia-specific options
         """
         answer_lower = ai_answer.lower()
-        question_lower = question.lower()
+        question_lower = QueryAnalysis.of(question, analysis).lower
         combined = question_lower + ' ' + answer_lower
         
         # Define triggers: conditions under which a template should be appended
@@ -523,99 +885,58 @@ class SimplifiedGolfRulesSystem:
                     return True
         return False
     
-    def _build_enhanced_context(self, search_results: List[Dict], question: str) -> str:
+    def _build_enhanced_context(self, search_results: List[Dict], question: str,
+                                analysis: Optional[QueryAnalysis] = None) -> str:
         """
         Build context with primary rules and related exception rules.
         
         FIX 11: Removed Rule 11.3 debug logging.
+        Rules and clarifications are packed into the context token budget by priority.
         """
-        context_parts = []
+        analysis = QueryAnalysis.of(question, analysis)
+        
+        fragments = []
         included_rules = set()
         
+        # Filter conditions by relevance to the question
+        question_terms = analysis.condition_terms
+        
         # First, add primary search results
-        for i, result in enumerate(search_results):
-            rule = result['rule']
-            rule_id = rule['id']
+        for result in search_results:
+            fragment = self.rule_fragments.get(result['rule'])
             
             is_local = result.get('is_local', False)
             
-            if is_local:
-                context_part = f"COLUMBIA CC LOCAL RULE {rule_id}: {rule['title']}\n"
-            else:
-                context_part = f"Rule {rule_id}: {rule['title']}\n"
-            
             # Include full rule text (no truncation for better accuracy)
-            context_part += f"{rule.get('text', '')}\n"
+            context_part = (fragment.local_header if is_local else fragment.header) + fragment.body
             
-            # Add conditions if available - EXCEPTIONS FIRST
-            if 'conditions' in rule:
-                try:
-                    conditions_list = rule.get('conditions', [])
-                    
-                    # Safety check - ensure conditions is a list
-                    if not isinstance(conditions_list, list):
-                        logger.error(f" Conditions for {rule_id} is not a list: {type(conditions_list)}")
-                        context_parts.append(context_part)
-                        continue
-                    
-                    # Separate exceptions from other conditions
-                    exceptions = []
-                    other_conditions = []
-                    
-                    # Filter conditions by relevance to the question
-                    question_lower_words = question.lower()
-                    
-                    for condition in conditions_list:
-                        # Safety check - ensure condition is a dict
-                        if not isinstance(condition, dict):
-                            logger.error(f" Condition in {rule_id} is {type(condition)}, not dict")
-                            continue
-                        
-                        situation = condition.get('situation', '')
-                        explanation = condition.get('explanation', '')
-                        examples = condition.get('examples', [])
-                        condition_text = (situation + ' ' + explanation + ' ' + ' '.join(examples if isinstance(examples, list) else [])).lower()
-                        
-                        # Include condition if it's relevant to the question
-                        # Check for key terms match or exception
-                        is_relevant = False
-                        
-                        if 'exception' in situation.lower():
-                            is_relevant = True
-                        else:
-                            # Check if any significant words from the question appear in the condition
-                            question_terms = [w.strip('.,;:!?()[]"\'') for w in question_lower_words.split() if len(w) > 2 and w.strip('.,;:!?()[]"\'') not in ('the', 'and', 'for', 'what', 'are', 'how', 'does', 'can', 'get', 'from', 'ball', 'my', 'is', 'on', 'in', 'do', 'this', '')]
-                            for term in question_terms:
-                                if term in condition_text:
-                                    is_relevant = True
-                                    break
-                        
-                        if is_relevant:
-                            if 'exception' in situation.lower():
-                                exceptions.append(condition)
-                            else:
-                                other_conditions.append(condition)
-                    
-                    # Show exceptions FIRST and prominently
-                    if exceptions:
-                        context_part += "\nEXCEPTIONS:\n"
-                        for exc in exceptions:
-                            context_part += f"  - {exc.get('explanation', '')}\n"
-                            # Add examples if available
-                            if 'examples' in exc and isinstance(exc.get('examples'), list):
-                                for ex in exc['examples'][:2]:
-                                    context_part += f"    Example: {ex}\n"
-                    
-                    # Then show other conditions
-                    if other_conditions:
-                        context_part += "\nConditions and Applications:\n"
-                        for condition in other_conditions:
-                            context_part += f"- {condition.get('situation', '')}: {condition.get('explanation', '')}\n"
-                            
-                except Exception as e:
-                    logger.error(f" Error formatting conditions for rule {rule_id}: {e}")
+            # The condition chunk that won retrieval for this rule is always kept
+            best_condition = result.get('best_condition') or {}
+            best_condition_index = best_condition.get('index')
+            
+            # Add relevant conditions - EXCEPTIONS FIRST
+            exceptions = []
+            other_conditions = []
+            for condition in fragment.conditions:
+                if condition.is_exception:
+                    exceptions.append(condition)
+                elif (condition.index == best_condition_index
+                      or any(term in condition.match_text for term in question_terms)):
+                    other_conditions.append(condition)
+            
+            # Show exceptions FIRST and prominently
+            if exceptions:
+                context_part += "\nEXCEPTIONS:\n" + "".join(exc.exception_text for exc in exceptions)
+            
+            # Then show other conditions
+            if other_conditions:
+                context_part += "\nConditions and Applications:\n" + "".join(c.line for c in other_conditions)
             
-            context_parts.append(context_part)
+            fragments.append(ContextFragment(
+                None, context_part,
+                rule_priority(result.get('best_similarity', 0), bool(exceptions)),
+                fragment.rule_id
+            ))
         
         # Now add related exception rules
         related_rules_to_add = set()
@@ -633,55 +954,28 @@ class SimplifiedGolfRulesSystem:
         
         # Fetch and add related rules
         if related_rules_to_add:
-            context_parts.append("\n--- RELATED EXCEPTION RULES ---")
             for rule_id in list(related_rules_to_add)[:3]:  # Include up to 3 related rules
                 rule = self._get_rule_by_id(rule_id)
                 if rule:
-                    try:
-                        # Build context part for related rule
-                        related_part = f"\nRule {rule_id}: {rule.get('title', '')}\n{rule.get('text', '')}\n"
-                        
-                        # Add conditions/exceptions for related rules too
-                        if 'conditions' in rule:
-                            conditions_list = rule.get('conditions', [])
-                            
-                            if isinstance(conditions_list, list):
-                                # Separate exceptions from other conditions
-                                exceptions = []
-                                other_conditions = []
-                                
-                                for condition in conditions_list[:5]:
-                                    if not isinstance(condition, dict):
-                                        continue
-                                    
-                                    situation = condition.get('situation', '')
-                                    if 'exception' in situation.lower():
-                                        exceptions.append(condition)
-                                    else:
-                                        other_conditions.append(condition)
-                                
-                                # Show exceptions FIRST
-                                if exceptions:
-                                    related_part += "\nEXCEPTIONS:\n"
-                                    for exc in exceptions:
-                                        related_part += f"  - {exc.get('explanation', '')}\n"
-                                        if 'examples' in exc and isinstance(exc.get('examples'), list):
-                                            for ex in exc['examples'][:2]:
-                                                related_part += f"    Example: {ex}\n"
-                                
-                                # Then other conditions
-                                if other_conditions:
-                                    related_part += "\nConditions:\n"
-                                    for condition in other_conditions:
-                                        related_part += f"- {condition.get('situation', '')}: {condition.get('explanation', '')}\n"
-                        
-                        context_parts.append(related_part)
-                    except Exception as e:
-                        logger.error(f" Error formatting related rule {rule_id}: {e}")
+                    fragment = self.rule_fragments.get(rule)
+                    related_part = fragment.related_header
+                    
+                    # Conditions/exceptions from the first 5, exceptions FIRST
+                    leading = [c for c in fragment.conditions if c.index < 5]
+                    exceptions = [c for c in leading if c.is_exception]
+                    other_conditions = [c for c in leading if not c.is_exception]
+                    if exceptions:
+                        related_part += "\nEXCEPTIONS:\n" + "".join(exc.exception_text for exc in exceptions)
+                    if other_conditions:
+                        related_part += "\nConditions:\n" + "".join(c.line for c in other_conditions)
+                    
+                    fragments.append(ContextFragment(
+                        "\n--- RELATED EXCEPTION RULES ---", related_part,
+                        related_rule_priority(bool(exceptions)), rule_id
+                    ))
         
         # Inject relevant USGA Clarifications
         if self.clarifications_db:
-            clarification_parts = []
             included_rule_ids = set()
             
             # Collect all rule IDs from search results
@@ -696,189 +990,57 @@ class SimplifiedGolfRulesSystem:
             logger.info(f" Clarifications: checking against rule IDs: {sorted(included_rule_ids)}")
             
             # Find matching clarifications, scored by relevance
-            question_lower = question.lower()
-            question_terms = [w.strip('.,;:!?()[]"\'') for w in question_lower.split() if len(w) > 3 and w.strip('.,;:!?()[]"\'') not in ('the', 'and', 'for', 'what', 'are', 'how', 'does', 'can', 'get', 'from', 'ball', 'my', 'is', 'on', 'in', 'do', 'this', 'its', 'that', 'but', 'not', 'there', 'even', 'though', 'when', 'with', 'have', '')]
+            question_terms = analysis.clarification_terms
             
             logger.info(f" Clarifications: question terms: {question_terms}")
             
-            scored_clarifications = []
-            seen_ids = set()
-            
-            for rule_id in included_rule_ids:
-                for clar_key, clar_list in self.clarifications_db.items():
-                    if clar_key == rule_id or clar_key.startswith(rule_id):
-                        for clar in clar_list:
-                            if clar['id'] in seen_ids:
-                                continue
-                            
-                            clar_text_lower = (clar['title'] + ' ' + clar['text'][:800]).lower()
-                            matching_terms = [t for t in question_terms if t in clar_text_lower]
-                            
-                            if len(matching_terms) >= 2:
-                                seen_ids.add(clar['id'])
-                                scored_clarifications.append({
-                                    'id': clar['id'],
-                                    'score': len(matching_terms),
-                                    'terms': matching_terms,
-                                    'text': f"USGA Clarification {clar['id']}: {clar['title']}\n{clar['text'][:1000]}"
-                                })
-            
-            # Sort by score descending, take top 3
-            scored_clarifications.sort(key=lambda x: x['score'], reverse=True)
+            scored_clarifications = self.clarification_index.score(included_rule_ids, question_terms)
             
             for sc in scored_clarifications[:5]:
                 logger.info(f" Clarification scored: {sc['id']} (score={sc['score']}, terms={sc['terms']})")
             
             if scored_clarifications:
                 logger.info(f" Injecting top {min(3, len(scored_clarifications))} of {len(scored_clarifications)} clarifications")
-                context_parts.append("\n--- USGA OFFICIAL CLARIFICATIONS ---")
                 for sc in scored_clarifications[:3]:
-                    clarification_parts.append(sc['text'])
-                    context_parts.append(sc['text'])
+                    fragments.append(ContextFragment(
+                        "\n--- USGA OFFICIAL CLARIFICATIONS ---", sc['text'],
+                        clarification_priority(sc['score']), sc['id']
+                    ))
             else:
                 logger.info(f" No clarifications matched for this query (need 2+ term matches)")
         
-        return "\n".join(context_parts)
+        return self.context_packer.pack(fragments).text
     
     def _get_rule_by_id(self, rule_id: str) -> Optional[Dict]:
         """
-        Get a rule by its ID from the database
+        Get a rule by its ID (local rules take precedence over official rules)
         """
-        # Check local rules first
-        # Handle both dict and list structures
-        local_rules_list = self.local_rules
-        if isinstance(self.local_rules, dict):
-            local_rules_list = self.local_rules.get('local_rules', [])
-        
-        for rule in local_rules_list:
-            if isinstance(rule, dict) and rule.get('id') == rule_id:
-                return rule
-        
-        # Check official rules
-        if isinstance(self.rules_database, dict):
-            if rule_id in self.rules_database:
-                return self.rules_database[rule_id]
-        elif isinstance(self.rules_database, list):
-            for rule in self.rules_database:
-                if isinstance(rule, dict) and rule.get('id') == rule_id:
-                    return rule
-        
-        return None
+        return self.kb_index.get(rule_id)
     
     def _create_unified_prompt(self, question: str, context: str) -> str:
         """
-        Create the unified prompt with explicit exception handling instructions.
+        Create the per-question part of the unified prompt (the user message).
         
-        FIX 8: Added clarification about accidental contact vs intentional stroke,
-        and an additional example about teeing area exceptions.
+        The exception handling instructions live in UNIFIED_SYSTEM_PROMPT; the
+        variable rules context and question go last so the prefix stays cacheable.
         """
-        prompt = f"""You are an expert golf rules official at Columbia Country Club with complete knowledge of both USGA Rules and Columbia's local rules.
-
-QUESTION: {question}
-
-RELEVANT RULES CONTEXT:
+        prompt = f"""RELEVANT RULES CONTEXT:
 {context}
 
-CRITICAL INSTRUCTIONS FOR ACCURATE RULINGS:
-
-0. DEFAULT CLASSIFICATION OF COMMON COURSE OBJECTS (unless a local rule explicitly says otherwise):
-   IMMOVABLE OBSTRUCTIONS (free relief under Rule 16.1):
-   - Bridges, footbridges, and pedestrian crossings
-   - Cart paths and paved surfaces
-   - Sprinkler heads, drain covers, and irrigation boxes
-   - Permanent benches, trash cans, and ball washers
-   - Retaining walls (unless defining a boundary)
-   - Permanent shelters and rain shelters
-   
-   BOUNDARY OBJECTS (NO relief - not obstructions):
-   - Boundary fences, walls, and posts (white stakes or lines)
-   - Perimeter fencing defining property lines
-   - Any fence or wall that defines out of bounds
-   
-   INTEGRAL OBJECTS (NO relief - only when designated by local rule):
-   - Objects are ONLY integral if a local rule explicitly designates them
-   - Do NOT assume any object is integral unless the context states it
-   - "No free relief" from an integral object means you cannot drop AWAY from it under Rule 16.1
-   - HOWEVER, you CAN always remove loose impediments (rocks, leaves, sticks, etc.) anywhere on the course under Rule 15.1, even when your ball is on or near an integral object, a boundary object, or in a penalty area - as long as doing so does not cause your ball to move
-   
-   IMPORTANT: A ball on a bridge over a penalty area is treated as being in the penalty area (Rule 17.1a), BUT the bridge itself is still an immovable obstruction. If the ball is NOT over a penalty area, normal Rule 16.1 relief applies.
-
-1. IDENTIFY THE PRIMARY RULE that applies to this situation
-
-2. CHECK FOR EXCEPTIONS - This is absolutely critical! Consider:
-   - WHO caused the condition:
-     * If another player/person caused it -- Check Rule 8.1d (may restore conditions)
-     * If animal/natural forces caused it -- Check Rules 9.3, 9.6
-     * If player accidentally caused it -- Check Rule 9.4
-   
-   - WHEN it happened:
-     * After ball came to rest -- Different rules may apply (8.1d, 9.3)
-     * During the stroke -- Rule 9.1b
-     * While ball in motion -- Rules 11.1-11.3
-     * After marking and lifting -- Rule 14.2d
-     * IMPORTANT: If ball was lifted and replaced BEFORE natural forces moved it -- Rule 9.3 Exception applies (replace ball, not play as it lies)
-   
-   - WHERE on the course:
-     * Putting green -- Special rules under Rule 13
-     * Penalty area -- Rule 17 procedures
-     * Bunker -- Rule 12 specific rules
-     * Teeing area -- Rule 6 applies (including Rule 6.2b(5): no penalty for accidentally moving ball on tee)
-   
-   - INTENT (accidental vs. deliberate):
-     * Accidental movement -- Often no penalty or different procedure
-     * Deliberate actions -- Usually penalties apply
-     * IMPORTANT: Accidental contact during backswing or practice swing is NOT a stroke -- a stroke requires intent to hit the ball forward. If the ball was accidentally knocked off the tee during a backswing, it is NOT a stroke and Rule 6.2b(5) applies.
-
-   - EXCEPTIONS WITHIN RULES:
-     * Many rules have exceptions listed within them - check carefully!
-     * Look for conditions labeled "Exception:", "Allowed:", or "Does not apply when:" clauses
-     * Read ALL conditions carefully before concluding something is not allowed
-
-3. CHECK COLUMBIA CC LOCAL RULES:
-   - If a Columbia local rule applies to this specific situation, it takes precedence
-   - Columbia rules are marked as "CCC-" in the context, but NEVER cite the local rule number in your response
-   
-   CRITICAL - DO NOT FABRICATE LOCAL RULES:
-   - ONLY apply a Columbia CC local rule if the context EXPLICITLY covers the EXACT situation in the question
-   - A local rule about a bridge on hole 16 does NOT apply to a bridge on hole 13
-   - A local rule about a fence near the Purple Line does NOT apply to other fences on the course
-   - If no Columbia CC local rule EXPLICITLY addresses the specific location, object, or hole mentioned in the question, treat it as a standard Rules of Golf question
-   - When no local rule applies, give ONLY the official USGA ruling - do NOT say "According to Columbia's local rules"
-   - NEVER invent, assume, or extrapolate local rules for situations not explicitly covered in the context
-   - If a course feature (bridge, fence, path, etc.) is not specifically mentioned in a local rule, apply the standard Rules of Golf treatment for that type of object
-
-4. CHECK USGA CLARIFICATIONS:
-   - If the context includes "USGA Clarification" entries, these are OFFICIAL interpretive guidance from the USGA
-   - Clarifications provide authoritative detail on HOW to apply rules in specific situations
-   - When a clarification is relevant, you MUST incorporate its specific guidance into your answer
-   - For example, if a clarification explains that the nearest point of relief is on the ground beneath an elevated obstruction, your answer must include this detail
-   - Clarifications are as authoritative as the rules themselves
-
-5. PROVIDE YOUR ANSWER:
-   - State the applicable rule(s) clearly; include rule numbers for Official Rules of Golf but do NOT state the applicable rule number when referencing CCC local rules
-   - Mention ANY exceptions or special cases that apply
-   - Specify the correct procedure step by step
-   - State any penalties (or explicitly note if there's no penalty)
-   - If an exception changes the ruling, explain why
-
-RESPONSE FORMAT:
-  - Start with the direct answer/ruling first (1-2 sentences)
-  - Then provide the explanation with rule citations, but do not cite specific local rule numbers
-  - Keep total response concise: 150-250 words
-  - Don't explore rules that don't apply to this situation
-  - Set max_tokens to 400 in the API call
-
-Start your response appropriately:
-  - "According to Columbia's local rules..." ONLY if a local rule in the context EXPLICITLY covers this exact situation. Do NOT state specific rule number for local rules.
-  - "According to the Rules of Golf, Rule X.X..." for all other questions
-        
-Example of complete answer:
-"According to The Rules of Golf, Rule 13.1c, you generally cannot repair damage on the fringe. However, Rule 8.1d provides an exception: since another player caused the damage after your ball came to rest, you ARE allowed to restore the conditions to what they were. You may repair the pitch mark without penalty."
+QUESTION: {question}
 
 Now provide your complete ruling:"""
         
         return prompt
     
+    @staticmethod
+    def _unified_messages(prompt: str) -> List[Dict]:
+        """Chat messages for a unified prompt: static system message first, then the question."""
+        return [
+            {"role": "system", "content": UNIFIED_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    
     def _assess_confidence(self, search_results: List[Dict]) -> str:
         """
         Assess confidence based on search result quality
@@ -942,7 +1104,10 @@ Now provide your complete ruling:"""
                 "has_exceptions": result.get('has_exceptions', False),
                 "model_used": result.get('model_used', ''),
                 "definition_id": result.get('definition_id', ''),
-                "rule_id": result.get('rule_id', '')
+                "rule_id": result.get('rule_id', ''),
+                "cache_hit": result.get('cache_hit', False),
+                "prompt_tokens": result.get('prompt_tokens'),
+                "cached_tokens": result.get('cached_tokens')
             }
             
             # Additional detailed logging for debugging
@@ -989,7 +1154,8 @@ Now provide your complete ruling:"""
 
 
 # Integration function for web_api.py
-def create_simplified_system(templates, definitions_db, search_engine, client, rules_db, local_rules, clarifications_db=None):
+def create_simplified_system(templates, definitions_db, search_engine, client, rules_db, local_rules, clarifications_db=None,
+                             answer_cache=None, kb_version=""):
     """
     Factory function to create the simplified system with existing components
     """
@@ -1000,5 +1166,7 @@ def create_simplified_system(templates, definitions_db, search_engine, client, r
         openai_client=client,
         rules_database=rules_db,
         local_rules=local_rules,
-        clarifications_db=clarifications_db
+        clarifications_db=clarifications_db,
+        answer_cache=answer_cache,
+        kb_version=kb_version
     )
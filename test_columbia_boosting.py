@@ -0,0 +1,55 @@
+"""
+Tests for the compiled Columbia CC boosts: rows a boost lifts must be promoted into
+the search's candidate pool, demoted rows must not.
+
+Run with: python -m pytest test_columbia_boosting.py
+"""
+
+import numpy as np
+
+from columbia_boosting import ColumbiaBooster
+from query_analysis import QueryAnalysis
+
+RULES = [
+    {'id': 'CCC-15', 'title': 'Cart Bridges', 'text': 'Bridges are obstructions.', 'is_local': True},
+    {'id': '16.1a', 'title': 'When Relief Is Allowed', 'text': 'Abnormal course condition relief.', 'is_local': False},
+    {'id': '13.1', 'title': 'Actions Allowed on Putting Green', 'text': 'Repair damage on the green.', 'is_local': False},
+    {'id': '17.1', 'title': 'Options for Ball in Penalty Area', 'text': 'Relief from a penalty area.', 'is_local': False},
+]
+
+BOOST_RULES = [
+    {
+        'name': 'bridge',
+        'any': ['bridge'],
+        'targets': [('CCC-15', 4.0), ({'text_contains': 'penalty area', 'official': True}, 2.0),
+                    ({'id_contains': '16.1'}, 0.4)],
+    },
+    {
+        'name': 'green',
+        'any': ['green'],
+        'targets': [('13.1', 3.0)],
+    },
+]
+
+
+def test_promoted_rows_cover_lifted_targets_of_active_boosts():
+    booster = ColumbiaBooster(RULES, BOOST_RULES)
+    boosts = booster.active_boosts(QueryAnalysis("my ball is on the bridge"))
+
+    assert [boost.name for boost in boosts] == ['bridge']
+    assert list(booster.promoted_rows(boosts)) == [0, 3]
+
+
+def test_no_active_boost_promotes_nothing():
+    booster = ColumbiaBooster(RULES, BOOST_RULES)
+    assert len(booster.promoted_rows(booster.active_boosts(QueryAnalysis("where do I drop?")))) == 0
+
+
+def test_apply_with_precomputed_boosts_matches_apply():
+    booster = ColumbiaBooster(RULES, BOOST_RULES)
+    analysis = QueryAnalysis("bridge near the green")
+    scores = np.array([0.5, 0.6, 0.4, 0.3], dtype=np.float32)
+
+    expected = booster.apply(scores, analysis)
+    np.testing.assert_array_equal(booster.apply(scores, analysis, boosts=booster.active_boosts(analysis)), expected)
+    np.testing.assert_allclose(expected, [2.0, 0.24, 1.2, 0.6], rtol=1e-6)
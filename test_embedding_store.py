@@ -0,0 +1,106 @@
+"""
+Tests for the persistent embedding store: reuse across restarts, stale-key drop and
+rejection of an index that does not match its matrix.
+
+Run with: python -m pytest test_embedding_store.py
+"""
+
+import json
+import os
+
+import numpy as np
+
+import embedding_store
+from embedding_store import EmbeddingStore
+
+
+class CountingEmbedder:
+    """embed_fn that records every text it is asked to embed."""
+
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), float(sum(map(ord, text))), 1.0] for text in texts]
+
+
+def open_store(store_dir, **kwargs):
+    return EmbeddingStore(model="test-model", name="rules", store_dir=str(store_dir), **kwargs)
+
+
+def test_reuses_stored_vectors_across_restarts(tmp_path):
+    first = CountingEmbedder()
+    matrix = open_store(tmp_path).embed(["a", "bb", "ccc"], first)
+    assert first.texts == ["a", "bb", "ccc"]
+
+    second = CountingEmbedder()
+    store = open_store(tmp_path)
+    reloaded = store.embed(["a", "bb", "ccc"], second)
+    assert second.texts == []
+    assert isinstance(reloaded, np.memmap)
+    np.testing.assert_array_equal(reloaded, matrix)
+
+    # Only the new text is embedded; order follows the request
+    third = CountingEmbedder()
+    mixed = open_store(tmp_path).embed(["ccc", "dddd", "a"], third)
+    assert third.texts == ["dddd"]
+    np.testing.assert_array_equal(mixed[0], matrix[2])
+    np.testing.assert_array_equal(mixed[2], matrix[0])
+
+
+def test_drops_stale_keys_and_replaced_matrix(tmp_path):
+    store = open_store(tmp_path)
+    store.embed(["a", "bb"], CountingEmbedder())
+    old_matrix = store.matrix_path
+
+    store.embed(["a", "changed"], CountingEmbedder())
+    assert len(store) == 2
+    assert not os.path.exists(old_matrix)
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".npy")] == [os.path.basename(store.matrix_path)]
+
+    embedder = CountingEmbedder()
+    open_store(tmp_path).embed(["bb"], embedder)
+    assert embedder.texts == ["bb"]
+
+
+def test_rejects_index_that_does_not_match_its_matrix(tmp_path):
+    store = open_store(tmp_path)
+    store.embed(["a", "bb"], CountingEmbedder())
+    np.save(store.matrix_path, np.zeros((3, 3), dtype=np.float32))
+
+    assert len(open_store(tmp_path)) == 0
+
+
+def test_rejects_other_model_or_backend(tmp_path):
+    open_store(tmp_path).embed(["a"], CountingEmbedder())
+    assert len(open_store(tmp_path, backend="hash")) == 0
+
+    with open(tmp_path / "rules_test-model.json") as f:
+        index = json.load(f)
+    index["model"] = "other-model"
+    with open(tmp_path / "rules_test-model.json", "w") as f:
+        json.dump(index, f)
+    assert len(open_store(tmp_path)) == 0
+
+
+def test_interrupted_save_keeps_previous_store(tmp_path, monkeypatch):
+    store = open_store(tmp_path)
+    matrix = np.array(store.embed(["a", "bb"], CountingEmbedder()))
+
+    # Crash after the new matrix is written but before the index names it
+    real_replace = os.replace
+
+    def replace(src, dst):
+        if dst.endswith(".json"):
+            raise OSError("disk full")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(embedding_store.os, "replace", replace)
+    store.embed(["a", "xx"], CountingEmbedder())
+    monkeypatch.undo()
+
+    embedder = CountingEmbedder()
+    reloaded = open_store(tmp_path).embed(["a", "bb"], embedder)
+    assert embedder.texts == []
+    np.testing.assert_array_equal(reloaded, matrix)
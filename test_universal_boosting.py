@@ -0,0 +1,60 @@
+"""
+Regression tests for universal scenario detection: scenario terms must match whole
+words, so ordinary questions don't pick up wrong-ball or bounced-back boosts.
+
+Run with: python -m pytest test_universal_boosting.py
+"""
+
+import pytest
+
+from query_analysis import QueryAnalysis
+from universal_boosting import UniversalBooster
+
+RULES = [
+    {'id': '2.1', 'title': 'Course Boundaries and Out of Bounds', 'is_local': False, 'conditions': [],
+     'text': 'Out of bounds is defined by the boundary edge; a ball is out of bounds only when all of it is outside.'},
+    {'id': '18.2', 'title': 'Ball Lost or Out of Bounds: Stroke-and-Distance Relief Must Be Taken', 'is_local': False,
+     'conditions': [], 'text': 'If a ball is out of bounds, the player must take stroke-and-distance relief.'},
+    {'id': '6.3c', 'title': 'Wrong Ball', 'is_local': False, 'conditions': [],
+     'text': 'A player must not make a stroke at a wrong ball.'},
+    {'id': 'CCC-1', 'title': 'Ball Lost or Out of Bounds (Alternative Relief)', 'is_local': True, 'conditions': [],
+     'text': 'Out of bounds: the player may drop in the fairway for two penalty strokes as relief.'},
+]
+
+
+def scenario_names(question):
+    return [scenario.name for scenario in UniversalBooster(RULES).active_scenarios(QueryAnalysis(question))]
+
+
+@pytest.mark.parametrize('question', [
+    "I hit my ball into the bunker, can I rake the sand?",          # 'he' inside "the"
+    "My ball hit the cart path and went out of bounds, can I drop?",
+    "There's an obstruction near the green and my ball rolled back into the fringe",  # 'ob', 'back in'
+    "What's the problem with grounding my club?",
+])
+def test_ordinary_questions_detect_no_scenario(question):
+    assert scenario_names(question) == []
+
+
+@pytest.mark.parametrize('question', [
+    "My opponent hit my ball by mistake",
+    "someone played my ball, what now?",
+    "I played the wrong ball in the rough",
+    "he hit my ball from the fairway",
+])
+def test_wrong_ball_detected(question):
+    assert scenario_names(question) == ['wrong ball']
+
+
+@pytest.mark.parametrize('question', [
+    "my ball went out of bounds but bounced back in off a tree",
+    "ball hit the fence by the OB stakes and came back in",
+])
+def test_bounced_back_in_bounds_detected(question):
+    assert scenario_names(question) == ['bounced back in bounds']
+
+
+def test_every_scenario_boost_matches_a_rule():
+    booster = UniversalBooster(RULES)
+    assert list(booster.masks['boundary_definition'].nonzero()[0]) == [0, 1]
+    assert list(booster.masks['local_ob_relief'].nonzero()[0]) == [3]
@@ -0,0 +1,220 @@
+"""
+Universal golf boosting for scenarios that apply to every course, as precomputed rule masks.
+
+Ported from RulesVectorSearch.apply_universal_golf_boosting (vector_search.py, dev only),
+which lowercased and scanned every rule's text and conditions on each call. Here each
+rule's relevant properties ("addresses provisional ball identification", "is about a
+ball in motion", ...) are computed once into boolean masks over the engine's rule rows.
+A query is scanned once for the scenarios it describes, and each active scenario is a
+masked multiply on the score vector.
+
+Scenario terms match whole words only (a trailing plural 's' allowed): the phrase
+automaton finds candidate terms in one pass and each candidate is confirmed with a
+word-boundary check, so 'he' does not fire on "the", 'ob' on "obstruction" or
+'back in' on "back into".
+
+Scenarios:
+    provisional identification   provisional ball + can't tell the balls apart
+    wrong ball                   someone played the wrong ball
+    bounced back in bounds       ball went toward out of bounds but came back in
+"""
+
+import logging
+import re
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from pattern_matcher import PhraseAutomaton, PhraseHits
+from query_analysis import QueryAnalysis
+
+logger = logging.getLogger(__name__)
+
+PROVISIONAL_KEYWORDS = ['provisional', 'provisional ball']
+IDENTIFICATION_KEYWORDS = [
+    'cannot distinguish', 'cannot tell which', 'cannot identify which',
+    'which is which', 'both balls', 'found both', 'same area',
+    'look identical', 'both found', 'distinguish between'
+]
+# Rule topics that are the wrong context for a provisional identification question
+PROVISIONAL_ID_IRRELEVANT = ['lost ball', 'out of bounds', 'penalty area', 'unplayable']
+
+WRONG_BALL_PATTERNS = [
+    # Direct wrong ball references
+    'wrong ball', 'played wrong ball', 'hit wrong ball',
+    # Someone else played my ball
+    'opponent hit my ball', 'opponent played my ball',
+    'someone hit my ball', 'someone played my ball', 'someone else hit my ball',
+    'another player hit my ball', 'another player played my ball',
+    'other player hit my ball', 'other player played my ball',
+    # My ball was played by others
+    'my ball was hit', 'my ball was played', 'my ball got hit',
+    'they hit my ball', 'they played my ball',
+    # Playing someone else's ball
+    'hit someone else ball', 'played someone else ball',
+    'hit another player ball', 'played another player ball',
+    'hit opponent ball', 'played opponent ball',
+    # Confusion scenarios
+    'hit their ball by mistake', 'played their ball by mistake',
+    'accidentally hit their ball', 'accidentally played their ball',
+    'mixed up balls', 'confused balls', 'switched balls'
+]
+# Otherwise: an action + a possessive ball + another person
+WRONG_BALL_ACTIONS = ['hit', 'played', 'struck', 'took']
+WRONG_BALL_POSSESSIVES = ['my ball', 'his ball', 'her ball', 'their ball', 'opponent ball']
+WRONG_BALL_OTHER_PERSON = ['opponent', 'someone', 'another player', 'other player', 'they', 'he', 'she']
+
+WRONG_BALL_RULE_INDICATORS = ['wrong ball', 'playing wrong ball', '6.3c', 'rule 6.3', 'substitute ball', 'correct ball']
+BALL_IN_MOTION_INDICATORS = [
+    'ball in motion', 'moving ball', 'accidentally deflects',
+    'accidentally moves', 'deflected', 'stopped'
+]
+
+OUT_OF_BOUNDS_KEYWORDS = ['out of bounds', 'ob', 'out-of-bounds']
+BOUNCE_BACK_KEYWORDS = [
+    'bounced back', 'bounce back', 'bounced back in', 'hit tree and bounced',
+    'hit and bounced', 'deflected back', 'came back in', 'ricocheted back',
+    'caromed back', 'rebounded', 'kicked back'
+]
+IN_BOUNDS_KEYWORDS = ['in bounds', 'back in bounds', 'back in', 'back onto course']
+OB_RELIEF_WORDS = ['relief', 'drop', 'penalty stroke', 'options']
+
+
+def _contains_any(text: str, terms: List[str]) -> bool:
+    return any(term in text for term in terms)
+
+
+# --- Per-rule features (computed once per rule) ---
+
+def _addresses_provisional_identification(rule: Dict, text: str, title: str) -> bool:
+    if '18.3' in rule['id'] and 'provisional' in text:
+        return True
+    if 'provisional' in text and _contains_any(text, IDENTIFICATION_KEYWORDS):
+        return True
+    for condition in rule['conditions']:
+        if not isinstance(condition, dict):
+            continue
+        explanation = str(condition.get('explanation', '')).lower()
+        if 'provisional' in explanation and _contains_any(explanation, IDENTIFICATION_KEYWORDS):
+            return True
+        examples = condition.get('examples', [])
+        if isinstance(examples, list):
+            examples_text = ' '.join(str(example).lower() for example in examples)
+            if 'provisional' in examples_text and _contains_any(examples_text, IDENTIFICATION_KEYWORDS):
+                return True
+    return False
+
+
+RULE_FEATURES: Dict[str, Callable[[Dict, str, str], bool]] = {
+    'provisional_identification': _addresses_provisional_identification,
+    'provisional_id_irrelevant': lambda rule, text, title: (
+        any(topic in text or topic in title for topic in PROVISIONAL_ID_IRRELEVANT) and 'provisional' not in text),
+    'wrong_ball_rule': lambda rule, text, title: (
+        any(indicator in text or indicator in title for indicator in WRONG_BALL_RULE_INDICATORS)),
+    'ball_in_motion': lambda rule, text, title: (
+        any(indicator in text or indicator in title for indicator in BALL_IN_MOTION_INDICATORS)),
+    # Where the boundary is and when a ball is out: Rule 2.1 ("Course Boundaries and
+    # Out of Bounds") and Rule 18.2 itself
+    'boundary_definition': lambda rule, text, title: (
+        'boundar' in title or (rule['id'].startswith('18.2') and 'out of bounds' in text)),
+    'local_ob_relief': lambda rule, text, title: (
+        rule['is_local'] and 'out of bounds' in text and _contains_any(text, OB_RELIEF_WORDS)),
+}
+
+
+# --- Query scenarios (one phrase scan per query) ---
+
+def _is_wrong_ball(hits: PhraseHits) -> bool:
+    if hits.any(WRONG_BALL_PATTERNS):
+        return True
+    return (hits.any(WRONG_BALL_ACTIONS) and hits.any(WRONG_BALL_POSSESSIVES)
+            and hits.any(WRONG_BALL_OTHER_PERSON))
+
+
+class Scenario(NamedTuple):
+    name: str
+    detect: Callable[[PhraseHits], bool]
+    boosts: Tuple[Tuple[str, float], ...]  # (rule feature, multiplier), applied in order
+
+
+SCENARIOS = [
+    Scenario(
+        'provisional identification',
+        lambda hits: hits.any(PROVISIONAL_KEYWORDS) and hits.any(IDENTIFICATION_KEYWORDS),
+        (('provisional_identification', 8.0), ('provisional_id_irrelevant', 0.3)),
+    ),
+    Scenario(
+        'wrong ball',
+        _is_wrong_ball,
+        (('wrong_ball_rule', 5.0), ('ball_in_motion', 0.3)),
+    ),
+    Scenario(
+        'bounced back in bounds',
+        lambda hits: hits.any(OUT_OF_BOUNDS_KEYWORDS) and (hits.any(BOUNCE_BACK_KEYWORDS) or hits.any(IN_BOUNDS_KEYWORDS)),
+        (('boundary_definition', 6.0), ('local_ob_relief', 0.2)),
+    ),
+]
+
+_QUERY_TERMS = (PROVISIONAL_KEYWORDS + IDENTIFICATION_KEYWORDS + WRONG_BALL_PATTERNS + WRONG_BALL_ACTIONS
+                + WRONG_BALL_POSSESSIVES + WRONG_BALL_OTHER_PERSON + OUT_OF_BOUNDS_KEYWORDS
+                + BOUNCE_BACK_KEYWORDS + IN_BOUNDS_KEYWORDS)
+_QUERY_AUTOMATON = PhraseAutomaton(_QUERY_TERMS)
+_WHOLE_WORD = {term: re.compile(r"\b" + re.escape(term) + r"s?\b") for term in _QUERY_TERMS}
+
+
+def scenario_hits(analysis: QueryAnalysis) -> PhraseHits:
+    """Scenario terms the search text contains as whole words."""
+    text = analysis.search_lower
+    candidates = analysis.phrase_hits(_QUERY_AUTOMATON, text)
+    positions = {}
+    for term in candidates.positions:
+        match = _WHOLE_WORD[term].search(text)
+        if match:
+            positions[term] = match.start()
+    return PhraseHits(text, positions)
+
+
+class UniversalBooster:
+    """Universal scenario boosts as boolean rule masks over the search engine's rows."""
+
+    def __init__(self, rules: List[Dict]):
+        self.n_rules = len(rules)
+        self.masks: Dict[str, np.ndarray] = {name: np.zeros(len(rules), dtype=bool) for name in RULE_FEATURES}
+        for row, rule in enumerate(rules):
+            text = rule['text'].lower()
+            title = rule['title'].lower()
+            for name, feature in RULE_FEATURES.items():
+                self.masks[name][row] = feature(rule, text, title)
+
+        logger.info(" Universal boosting features: " +
+                    ", ".join(f"{name}={int(mask.sum())}" for name, mask in self.masks.items()))
+        for scenario in SCENARIOS:
+            for feature, multiplier in scenario.boosts:
+                if not self.masks[feature].any():
+                    logger.warning(f" Universal scenario '{scenario.name}': {feature} ({multiplier}x) matches no rule")
+
+    def active_scenarios(self, analysis: QueryAnalysis) -> List[Scenario]:
+        hits = scenario_hits(analysis)
+        return [scenario for scenario in SCENARIOS if scenario.detect(hits)]
+
+    def promoted_rows(self, scenarios: List[Scenario]) -> np.ndarray:
+        """Rows a scenario boosts up; they join the candidate pool like local rules do."""
+        promoted = np.zeros(self.n_rules, dtype=bool)
+        for scenario in scenarios:
+            for feature, multiplier in scenario.boosts:
+                if multiplier > 1.0:
+                    promoted |= self.masks[feature]
+        return np.flatnonzero(promoted)
+
+    def apply(self, scores: np.ndarray, scenarios: List[Scenario], verbose: bool = False) -> np.ndarray:
+        """Boosted float64 copy of a per-rule score vector."""
+        boosted = scores.astype(np.float64)
+        for scenario in scenarios:
+            if verbose:
+                logger.info(f" Universal Golf: Detected {scenario.name} scenario")
+            for feature, multiplier in scenario.boosts:
+                mask = self.masks[feature]
+                if verbose:
+                    logger.info(f"   - {feature}: {int(mask.sum())} rules ({multiplier}x)")
+                boosted *= np.where(mask, multiplier, 1.0)
+        return boosted
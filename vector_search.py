@@ -12,9 +12,10 @@ NOTE: This module requires sentence-transformers and sklearn, which are NOT in t
 production container. It is used only by golf_rules_hybrid.py for local development/testing.
 Production uses ProductionHybridVectorSearch in web_api.py (OpenAI embeddings API).
 
-If you need Columbia CC-specific boosting in production, use apply_columbia_boosting() in web_api.py.
-If you need universal golf boosting (wrong ball, provisional ball, bounce-back) in production,
-port apply_universal_golf_boosting() from RulesVectorSearch to web_api.py.
+Columbia CC-specific boosting in production is ColumbiaBooster in columbia_boosting.py
+(boosts declared in columbia_cc_local_rules_db.COLUMBIA_CC_BOOST_RULES).
+Universal golf boosting (wrong ball, provisional ball, bounce-back) in production is
+UniversalBooster in universal_boosting.py, ported from apply_universal_golf_boosting().
 """
 import numpy as np
 from sentence_transformers import SentenceTransformer
@@ -103,8 +104,8 @@ def detect_wrong_ball_scenario(query_lower):
 
 
 # NOTE: Standalone apply_columbia_boosting() was removed in refactor (Feb 2026).
-# The production version lives in web_api.py -> apply_columbia_boosting()
-# and is called from ProductionHybridVectorSearch.search_with_precedence().
+# The production version is ColumbiaBooster in columbia_boosting.py, applied
+# from ProductionHybridVectorSearch.search_with_precedence().
 
 class RulesVectorSearch:
     """Original search class - keep all existing functionality"""
@@ -771,7 +772,7 @@ class RulesVectorSearch:
 # It was dead code — never instantiated in production (web_api.py uses
 # ProductionHybridVectorSearch with OpenAI embeddings instead).
 # Its Columbia CC boosting logic was stale; the production version is
-# apply_columbia_boosting() in web_api.py.
+# ColumbiaBooster in columbia_boosting.py.
 #
 # If you need local development search with sentence-transformers,
 # use RulesVectorSearch directly with apply_universal_golf_boosting().
@@ -1,22 +1,35 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import json
 import time
 import os
 import re
-import math
 from datetime import datetime
 from datetime import timedelta
 import logging
+import threading
+import numpy as np
 from openai import OpenAI
 from dotenv import load_dotenv
 from simplified_golf_system import SimplifiedGolfRulesSystem, create_simplified_system
-from golf_clarifications_db import USGA_CLARIFICATIONS
+from embedding_store import EmbeddingStore
+from embedders import create_embedder
+from query_cache import QueryEmbeddingCache
+from answer_cache import SemanticAnswerCache, compute_kb_version, ANSWER_CACHE_ENABLED
+from intent_classifier import IntentClassifier
+import metrics
+from pattern_matcher import PhraseAutomaton
+from hole_extractor import extract_hole_number
+from query_analysis import QueryAnalysis, prepare_search_text
 
 
 # Import your existing comprehensive databases
-from golf_rules_data import RULES_DATABASE
+# (rules and clarifications come from the compiled artifact when one is built, see kb_artifact.py)
+from kb_artifact import load_knowledge_base
 from columbia_cc_local_rules_db import COLUMBIA_CC_LOCAL_RULES
+from columbia_boosting import ColumbiaBooster
+from universal_boosting import UniversalBooster
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
 from golf_definitions_db import (
     GOLF_DEFINITIONS_DATABASE, 
     search_definitions_by_keyword,
@@ -31,6 +44,8 @@ from simplified_golf_system import SimplifiedGolfRulesSystem, create_simplified_
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+RULES_DATABASE, USGA_CLARIFICATIONS = load_knowledge_base()
+
 app = Flask(__name__)
 CORS(app)
 
@@ -46,6 +61,51 @@ ai_error_message = ""
 USE_SIMPLIFIED_SYSTEM = True  # Set to True to test
 simplified_system = None
 
+# Extra candidates kept past top_n before Columbia boosting re-ranks them.
+# Boosts/de-boosts can reorder results, so selecting exactly top_n first would
+# drop rules that a de-boost should have promoted.
+BOOST_CANDIDATE_MARGIN = 20
+
+# Per-document embedding length policy: search text longer than this is cut at a word
+# boundary before embedding (0 disables truncation). text-embedding-3-small accepts
+# ~8k tokens, so the default keeps every rule in the current rulebook whole. The
+# embedding backend itself is chosen by EMBEDDING_BACKEND (see embedders.py).
+RULE_EMBED_MAX_CHARS = int(os.getenv('RULE_EMBED_MAX_CHARS', '6000'))
+
+# Index each rule's conditions as separate chunks alongside the main rule document.
+# A rule scores as the max over its chunks, and the winning condition is returned.
+CONDITION_CHUNKS = os.getenv('CONDITION_CHUNKS', 'true').lower() in ('1', 'true', 'yes')
+
+# Retrieval scoring: 'hybrid' fuses dense and BM25 rankings by reciprocal rank, 'dense' is
+# embeddings only, 'lexical' is BM25 only (no embeddings at all). Every mode falls back to
+# BM25 when the query embedding is unavailable, and an engine whose rule embeddings could
+# not be loaded serves BM25 only (degraded) until a retry, at most every
+# EMBEDDING_RETRY_SECONDS, loads them. See lexical_index.py.
+EMBEDDING_RETRY_SECONDS = 60
+SEARCH_MODE = os.getenv('SEARCH_MODE', 'hybrid').lower()
+if SEARCH_MODE not in ('hybrid', 'dense', 'lexical'):
+    logging.getLogger(__name__).warning(f" Unknown SEARCH_MODE {SEARCH_MODE!r} - using hybrid")
+    SEARCH_MODE = 'hybrid'
+
+# Universal golf boosting (wrong ball, provisional identification, bounce-back), see universal_boosting.py
+UNIVERSAL_BOOSTING = os.getenv('UNIVERSAL_BOOSTING', 'true').lower() in ('1', 'true', 'yes')
+
+# Hybrid path intent routing: the local classifier decides; gpt-4 is only asked when it is unsure
+INTENT_LLM_FALLBACK = os.getenv('INTENT_LLM_FALLBACK', 'true').lower() in ('1', 'true', 'yes')
+_intent_classifier_lock = threading.Lock()
+
+# Guards construction of the shared search engine (see get_search_engine)
+_search_engine_lock = threading.Lock()
+
+# Readiness (/api/ready): a process is ready once startup warm-up has run and, unless
+# READY_REQUIRES_AI is off, the AI system is available. A process (each gunicorn worker
+# on its own) without the AI system retries initialization from /api/ready and from
+# question requests, at most every READY_RETRY_SECONDS.
+READY_REQUIRES_AI = os.getenv('READY_REQUIRES_AI', 'true').lower() in ('1', 'true', 'yes')
+READY_RETRY_SECONDS = 30
+_ready_lock = threading.Lock()
+_last_init_attempt = 0.0
+
 # RESTORED: Your Complete Template System (from your original system)
 COMMON_QUERY_TEMPLATES = {
     "clear_lost_ball": {
@@ -277,208 +337,81 @@ This is MANDATORY relief - you are not allowed to play from the practice green e
 }
 
 def extract_hole_number_from_query(query: str):
-    """Simple hole number extraction."""
-    import re
-    query_lower = query.lower()
-    
-    # Convert ordinal words to numbers ONLY when near course context words
-    ordinal_to_num = {
-        'first': '1', 'second': '2', 'third': '3', 'fourth': '4',
-        'fifth': '5', 'sixth': '6', 'seventh': '7', 'eighth': '8',
-        'ninth': '9', 'tenth': '10', 'eleventh': '11', 'twelfth': '12',
-        'thirteenth': '13', 'fourteenth': '14', 'fifteenth': '15',
-        'sixteenth': '16', 'seventeenth': '17', 'eighteenth': '18',
-    }
-    
-    course_context = ['hole', 'fairway', 'green', 'tee', 'rough', 'bunker',
-                      'bridge', 'pond', 'creek', 'water']
-    
-    for ordinal, num in ordinal_to_num.items():
-        # Check if ordinal appears near a course term (within ~3 words)
-        pattern = rf'(?:{ordinal})\s+(?:\w+\s+){{0,2}}(?:{"|".join(course_context)})'
-        if re.search(pattern, query_lower):
-            return int(num)
-        # Also check course term BEFORE ordinal: "fairway on the third"
-        pattern2 = rf'(?:{"|".join(course_context)})\s+(?:\w+\s+){{0,3}}(?:{ordinal})'
-        if re.search(pattern2, query_lower):
-            return int(num)
-
-    patterns = [
-        r'\b(\d{1,2})(?:th|st|nd|rd)?\s+(?:hole|green)\b',
-        r'\bhole\s+(\d{1,2})\b',
-        r'#(\d{1,2})\b',
-        r'\b(\d{1,2})(?:th|st|nd|rd)\b',
-        r'\b(\d{1,2})\s+(?:bridge|fairway|tee|rough|bunker|pond|creek|water)\b',
-        r'(?:hole|number)\s*#?\s*(\d{1,2})\b',
-        r'(?:bridge|fairway|tee|green|rough|bunker|pond|creek|water)\s+(?:on|over|at|near)\s+(\d{1,2})\b',
-        r'\bon\s+(\d{1,2})\b',
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, query.lower())
-        if match:
-            hole_num = int(match.group(1))
-            if 1 <= hole_num <= 18:
-                return hole_num
-    return None
+    """Simple hole number extraction (precompiled and memoized, see hole_extractor)."""
+    return extract_hole_number(query)
 
-def apply_columbia_boosting(results, query, verbose=False):
-    """
-    Columbia CC boosting for known problem scenarios.
-    Works with list-of-dicts format from ProductionHybridVectorSearch.
-    """
-    if not results:
-        return results
-    
-    query_lower = query.lower()
-    hole_number = extract_hole_number_from_query(query)
-    
-    def get_result_by_id(rule_id):
-        for r in results:
-            if r.get('rule', {}).get('id') == rule_id:
-                return r
-        return None
-    
-    # --- PURPLE LINE ---
-    if 'purple line' in query_lower:
-        r = get_result_by_id('CCC-6')
-        if r:
-            if verbose:
-                logger.info(f" CCC-6: {r['best_similarity']:.3f}  ->  {r['best_similarity']*3.0:.3f} (3.0x purple line boost)")
-            r['best_similarity'] *= 3.0
-    
-    # --- BRIDGE (must come before cart path) ---
-    bridge_terms = ['bridge', 'cart bridge', 'footbridge']
-    is_bridge_query = any(term in query_lower for term in bridge_terms)
-    
-    # CCC-15 (bridge rules) applies to ALL bridge queries regardless of hole
-    if is_bridge_query:
-        r = get_result_by_id('CCC-15')
-        if r:
-            if verbose:
-                logger.info(f"   - CCC-15: {r['best_similarity']:.3f}  ->  {r['best_similarity']*4.0:.3f} (4.0x bridge boost)")
-            r['best_similarity'] *= 4.0
-    
-    # CCC-2 (penalty area dropping zones) only for specific holes
-    bridge_holes = [13, 16, 17, 18]
-    bridge_hole_strs = ['13', '16', '17', '18']
-    if is_bridge_query and (hole_number in bridge_holes or any(h in query_lower for h in bridge_hole_strs)):
-        if verbose:
-            logger.info(f" Columbia CC: Detected bridge query on hole {hole_number or 'unknown'}")
-        
-        r = get_result_by_id('CCC-2')
-        if r:
-            if verbose:
-                logger.info(f"   - CCC-2: {r['best_similarity']:.3f}  ->  {r['best_similarity']*4.0:.3f} (4.0x bridge boost)")
-            r['best_similarity'] *= 4.0
-        
-        r = get_result_by_id('CCC-4')
-        if r:
-            if verbose:
-                logger.info(f"   - CCC-4: {r['best_similarity']:.3f}  ->  {r['best_similarity']*0.3:.3f} (0.3x de-boost)")
-            r['best_similarity'] *= 0.3
-        
-        for r in results:
-            rid = r.get('rule', {}).get('id', '')
-            if '16.1' in rid and not r.get('is_local'):
-                if verbose:
-                    logger.info(f"   - {rid}: {r['best_similarity']:.3f}  ->  {r['best_similarity']*0.4:.3f} (0.4x de-boost)")
-                r['best_similarity'] *= 0.4
-    
-    # --- CART PATH behind holes 12, 14, 17 ---
-    if hole_number in [12, 14, 17] and not is_bridge_query:
-        cart_path_terms = ['cart path', 'path', 'road', 'unpaved road']
-        has_cart_path = any(term in query_lower for term in cart_path_terms)
-        behind_green = 'behind' in query_lower and 'green' in query_lower
-        
-        if has_cart_path and behind_green:
-            if verbose:
-                logger.info(f" Columbia CC: Detected cart path behind hole {hole_number} green")
-            
-            r = get_result_by_id('CCC-4')
-            if r:
-                boost = 5.0 if hole_number == 12 else 3.0
-                if verbose:
-                    logger.info(f"   - CCC-4: {r['best_similarity']:.3f}  ->  {r['best_similarity']*boost:.3f} ({boost}x boost)")
-                r['best_similarity'] *= boost
-            
-            r = get_result_by_id('CCC-10')
-            if r:
-                if verbose:
-                    logger.info(f"   - CCC-10: {r['best_similarity']:.3f}  ->  {r['best_similarity']*0.3:.3f} (0.3x de-boost)")
-                r['best_similarity'] *= 0.3
-    
-    # --- WATER HAZARD on holes 15-18 ---
-    if hole_number in [15, 16, 17, 18]:
-        water_terms = ['water', 'penalty area', 'pond', 'creek', 'hazard']
-        has_water = any(term in query_lower for term in water_terms)
-        
-        if has_water:
-            if verbose:
-                logger.info(f" Columbia CC: Detected water question on hole {hole_number}")
-            
-            r = get_result_by_id('CCC-2')
-            if r:
-                if verbose:
-                    logger.info(f"   - CCC-2: {r['best_similarity']:.3f}  ->  {r['best_similarity']*4.0:.3f} (4.0x boost)")
-                r['best_similarity'] *= 4.0
-            
-            r = get_result_by_id('CCC-1')
-            if r:
-                if verbose:
-                    logger.info(f"   - CCC-1: {r['best_similarity']:.3f}  ->  {r['best_similarity']*0.4:.3f} (0.4x de-boost)")
-                r['best_similarity'] *= 0.4
+class ProductionHybridVectorSearch:
+    """FIXED: Production hybrid search with proper caching to prevent API loops.
     
-    # --- CONSTRUCTION FENCE ---
-    if 'fence' in query_lower and any(term in query_lower for term in ['construction', 'purple line', 'boundary']):
-        if verbose:
-            logger.info(" Columbia CC: Detected construction fence question")
-        
-        r = get_result_by_id('CCC-6')
-        if r:
-            if verbose:
-                logger.info(f"   - CCC-6: {r['best_similarity']:.3f}  ->  {r['best_similarity']*4.0:.3f} (4.0x boost)")
-            r['best_similarity'] *= 4.0
-        
-        for r in results:
-            title = r.get('rule', {}).get('title', '').lower()
-            text = r.get('rule', {}).get('text', '').lower()
-            if 'obstruction' in title and 'free relief' in text:
-                if verbose:
-                    logger.info(f"   - {r['rule']['id']}: {r['best_similarity']:.3f}  ->  {r['best_similarity']*0.4:.3f} (0.4x de-boost)")
-                r['best_similarity'] *= 0.4
+    Use get_search_engine() rather than constructing this directly. As a guard, a
+    second construction in the same process reuses the first instance's index
+    (rules, embedding matrix, query cache) instead of re-embedding the rulebook.
+    Pass force_rebuild=True to deliberately build a fresh index.
+    """
     
-    # --- HOLES 2-4 LEFT SIDE PENALTY AREA ---
-    if hole_number in [2, 3, 4]:
-        left_terms = ['left', 'left side', 'left of', 'tall grass', 'unmaintained', 'fescue']
-        has_left = any(term in query_lower for term in left_terms)
-        
-        if has_left:
-            if verbose:
-                logger.info(f"Columbia CC: Detected left side query on hole {hole_number}")
+    _shared_state = None
+    _shared_state_lock = threading.Lock()
+    
+    def __init__(self, force_rebuild=False, max_doc_chars=None):
+        self.max_doc_chars = RULE_EMBED_MAX_CHARS if max_doc_chars is None else max_doc_chars
+        cls = ProductionHybridVectorSearch
+        with cls._shared_state_lock:
+            if cls._shared_state is not None and not force_rebuild:
+                logger.warning(" ProductionHybridVectorSearch constructed again - reusing the "
+                               "existing index (use get_search_engine() instead)")
+                self.__dict__.update(cls._shared_state)
+                return
             
-            r = get_result_by_id('CCC-3')
-            if r:
-                if verbose:
-                    logger.info(f"   CCC-3: {r['best_similarity']:.3f} -> {r['best_similarity']*4.0:.3f} (4.0x boost)")
-                r['best_similarity'] *= 4.0
+            self._build_index()
             
-            r = get_result_by_id('CCC-1')
-            if r:
-                if verbose:
-                    logger.info(f"   CCC-1: {r['best_similarity']:.3f} -> {r['best_similarity']*0.3:.3f} (0.3x de-boost)")
-                r['best_similarity'] *= 0.3
-    
-    return results
-
-class ProductionHybridVectorSearch:
-    """FIXED: Production hybrid search with proper caching to prevent API loops."""
-    
-    def __init__(self):
-        self.embeddings_cache = {}
-        self.rule_embeddings_cache = {}  # Separate cache for rule embeddings
+            # Only share a complete index so a failed start can retry on next construction
+            if self.is_ready() and not self.is_degraded():
+                cls._shared_state = dict(self.__dict__)
+    
+    def _build_index(self):
+        """Process rules and load their embeddings (store first, API for the rest)."""
+        # OpenAI (default), local CPU model or deterministic hash - see embedders.py.
+        # Its name keys the query cache and the embedding stores, so backends never mix.
+        self.embedder = create_embedder(get_client=lambda: client)
+        logger.info(f" Embedding backend: {self.embedder.backend} ({self.embedder.name})")
+        
+        # Bounded LRU keyed on a stable digest of model + normalized query
+        self.query_cache = QueryEmbeddingCache(model=self.embedder.name)
         self.local_rules = self._process_local_rules()
         self.official_rules = self._process_official_rules()
-        self._precompute_rule_embeddings()  # Pre-compute on startup
+        self.all_rules = self.local_rules + self.official_rules
+        
+        # Every searchable chunk (main rule document + each condition) is one row of a
+        # (n_chunks, dim) float32 matrix with L2-normalized rows, so a query is scored
+        # with a single matrix-vector product. A rule's chunks are contiguous, starting
+        # at rule_chunk_start[row], which makes the per-rule max a single reduceat.
+        self.chunk_matrix = None
+        self.chunk_texts, self.chunk_condition, self.rule_chunk_start, lexical_texts = self._build_chunks()
+        self.rule_weights = np.array(
+            [1.5 if rule['is_local'] else 1.0 for rule in self.all_rules],  # 50% boost for local rules
+            dtype=np.float32
+        )
+        self.local_rule_rows = np.array(
+            [i for i, rule in enumerate(self.all_rules) if rule['is_local']], dtype=np.intp
+        )
+        # Columbia CC boosts (bridge, cart path, water, purple line, etc.) compiled to row updates
+        self.columbia_booster = ColumbiaBooster(self.all_rules)
+        self.universal_booster = UniversalBooster(self.all_rules) if UNIVERSAL_BOOSTING else None
+        
+        # BM25 over the same chunks (full text, no length policy): fused with dense scores
+        # in hybrid mode, and the local fallback whenever there is no query embedding
+        self.search_mode = SEARCH_MODE
+        self.lexical_index = LexicalIndex(lexical_texts, self.rule_chunk_start, [rule['id'] for rule in self.all_rules])
+        
+        # Content-hashed on-disk store: only new or changed rule texts hit the API
+        self.embedding_store = EmbeddingStore(model=self.embedder.name, name="rule_embeddings",
+                                              backend=self.embedder.backend)
+        self._embedding_retry_lock = threading.Lock()
+        self._last_embedding_attempt = time.time()
+        if self.search_mode == 'lexical':
+            logger.info(" SEARCH_MODE=lexical - rule embeddings not loaded")
+        else:
+            self._precompute_rule_embeddings()  # Pre-compute on startup
         
     def _process_local_rules(self):
         """Process Columbia CC local rules for search."""
@@ -490,6 +423,7 @@ class ProductionHybridVectorSearch:
                 'title': rule['title'],
                 'text': rule['text'],
                 'keywords': rule.get('keywords', []),
+                'conditions': rule.get('conditions', []) if isinstance(rule.get('conditions'), list) else [],
                 'is_local': True,
                 'priority': 1,
                 'search_text': f"{rule['title']} {rule['text']} {' '.join(rule.get('keywords', []))}"
@@ -498,72 +432,114 @@ class ProductionHybridVectorSearch:
         return processed_rules
     
     def _process_official_rules(self):
-        """Process official rules from your comprehensive database."""
+        """Process every official rule in the database - no cap, the matrix scorer keeps queries cheap."""
         processed_rules = []
     
-        # CRITICAL FIX: Include ALL rules or at least the most important ones
-        # Priority rules that should definitely be included
-        priority_rule_ids = [
-            "15.2", "15.2a", "15.2a(2)", "15.2a(3)", "15.2b",  # Movable obstructions
-            "16.1", "16.1a", "16.1b",  # Abnormal course conditions
-            "8.1a", "8.1b", "8.1c", "8.1d",  # Playing course as found
-            "17.1", "17.1a", "17.1b", "17.1c", "17.1d",  # Penalty areas
-            "9.4", "9.4a", "9.4b",  # Ball moved
-            "7.4",  # Ball moved during search
-            "14.2", "14.2b", "14.2e",  # Replacing ball procedures
-        ]
-    
-        # First, add priority rules
-        added_ids = set()
         for rule in RULES_DATABASE:
-            if rule['id'] in priority_rule_ids:
-                processed_rules.append({
-                    'id': rule['id'],
-                    'title': rule['title'],
-                    'text': rule['text'],
-                    'keywords': rule.get('keywords', []),
-                    'is_local': False,
-                    'priority': 2,
-                    'search_text': f"{rule['title']} {rule['text']} {' '.join(rule.get('keywords', []))}"
-                })
-                added_ids.add(rule['id'])
-    
-        # Then add remaining rules up to a reasonable limit (e.g., 100 total)
-        remaining_count = 0
-        max_additional = 100 - len(processed_rules)
-    
-        for rule in RULES_DATABASE:
-            if rule['id'] not in added_ids and remaining_count < max_additional:
-                processed_rules.append({
-                    'id': rule['id'],
-                    'title': rule['title'],
-                    'text': rule['text'],
-                    'keywords': rule.get('keywords', []),
-                    'is_local': False,
-                    'priority': 2,
-                    'search_text': f"{rule['title']} {rule['text']} {' '.join(rule.get('keywords', []))}"
-                })
-                remaining_count += 1
+            processed_rules.append({
+                'id': rule['id'],
+                'title': rule['title'],
+                'text': rule['text'],
+                'keywords': rule.get('keywords', []),
+                'conditions': rule.get('conditions', []) if isinstance(rule.get('conditions'), list) else [],
+                'is_local': False,
+                'priority': 2,
+                'search_text': f"{rule['title']} {rule['text']} {' '.join(rule.get('keywords', []))}"
+            })
     
         logger.info(f" Processed {len(processed_rules)} official rules for embedding")
         return processed_rules
     
+    @staticmethod
+    def _embedding_text(text, max_chars):
+        """Apply the per-document length policy, cutting at a word boundary."""
+        if not max_chars or len(text) <= max_chars:
+            return text
+        cut = text[:max_chars]
+        return cut.rsplit(' ', 1)[0] if ' ' in cut else cut
+    
+    @staticmethod
+    def _condition_text(rule, condition):
+        """Chunk text for one condition, with its parent rule title for context."""
+        text = (f"{rule['title']} - Situation: {condition.get('situation', '')}. "
+                f"Rule: {condition.get('explanation', '')}")
+        examples = condition.get('examples')
+        if isinstance(examples, list) and examples:
+            text += f" Examples: {', '.join(str(ex) for ex in examples)}"
+        return text
+    
+    def _build_chunks(self):
+        """
+        Build chunk texts plus per-chunk condition index (-1 = main document) and rule
+        offsets, and the matching lexical texts (full length, main documents led by the rule id).
+        """
+        chunk_texts = []
+        lexical_texts = []
+        chunk_condition = []
+        rule_chunk_start = []
+        
+        for rule in self.all_rules:
+            rule_chunk_start.append(len(chunk_texts))
+            chunk_texts.append(self._embedding_text(rule['search_text'], self.max_doc_chars))
+            lexical_texts.append(f"{rule['id']} {rule['search_text']}")
+            chunk_condition.append(-1)
+            
+            if CONDITION_CHUNKS:
+                for idx, condition in enumerate(rule['conditions']):
+                    if not isinstance(condition, dict):
+                        continue
+                    condition_text = self._condition_text(rule, condition)
+                    chunk_texts.append(self._embedding_text(condition_text, self.max_doc_chars))
+                    lexical_texts.append(condition_text)
+                    chunk_condition.append(idx)
+        
+        return (chunk_texts, np.array(chunk_condition, dtype=np.intp), np.array(rule_chunk_start, dtype=np.intp),
+                lexical_texts)
+    
+    def is_ready(self):
+        """True once searches can run: the BM25 index is built (embeddings may still be missing)."""
+        return self.lexical_index is not None
+    
+    def is_degraded(self):
+        """True while rule embeddings are missing outside SEARCH_MODE=lexical: searches are BM25 only."""
+        return self.chunk_matrix is None and self.search_mode != 'lexical'
+    
+    def _retry_embeddings(self):
+        """While degraded, reload rule embeddings in the background at most every EMBEDDING_RETRY_SECONDS."""
+        if time.time() - self._last_embedding_attempt < EMBEDDING_RETRY_SECONDS:
+            return
+        if not self._embedding_retry_lock.acquire(blocking=False):
+            return
+        self._last_embedding_attempt = time.time()
+        
+        def retry():
+            try:
+                self._precompute_rule_embeddings()
+                if self.chunk_matrix is not None:
+                    logger.info(" Rule embeddings loaded - leaving degraded lexical mode")
+            finally:
+                self._embedding_retry_lock.release()
+        
+        threading.Thread(target=retry, name='rule-embedding-retry', daemon=True).start()
+    
     def _precompute_rule_embeddings(self):
-        """Pre-compute embeddings for all rules to avoid repeated API calls."""
-        logger.info(" Pre-computing rule embeddings (one-time startup cost)...")
+        """Load chunk embeddings from the store, embedding only new or changed chunks."""
+        logger.info(" Loading rule embeddings (embedding store + API for changed rules)...")
         
-        all_rules = self.local_rules + self.official_rules
-        rule_texts = [rule['search_text'][:500] for rule in all_rules]  # Limit text length
+        all_rules = self.all_rules
+        truncated = sum(1 for rule in all_rules if len(self._embedding_text(rule['search_text'], self.max_doc_chars)) < len(rule['search_text']))
+        if truncated:
+            logger.info(f" Length policy: {truncated} rule documents truncated to {self.max_doc_chars} chars")
         
         try:
-            # Get embeddings for all rules in one API call
-            embeddings = self.get_embeddings_batch(rule_texts)
+            # Store rows are already L2-normalized and come back memory-mapped when unchanged
+            matrix = self.embedding_store.embed(self.chunk_texts, self.get_embeddings_batch)
             
-            if embeddings:
-                for i, rule in enumerate(all_rules):
-                    self.rule_embeddings_cache[rule['id']] = embeddings[i]
-                
-                logger.info(f" Pre-computed embeddings for {len(all_rules)} rules")
+            if matrix is not None:
+                self.chunk_matrix = matrix
+                logger.info(f" Rule embeddings ready for {len(all_rules)} rules in {len(self.chunk_texts)} chunks "
+                            f"({self.embedding_store.last_reused} from store, "
+                            f"{self.embedding_store.last_embedded} embedded via API)")
             else:
                 logger.error(" Failed to pre-compute rule embeddings")
                 
@@ -582,13 +558,7 @@ class ProductionHybridVectorSearch:
             for i in range(0, len(texts), max_batch_size):
                 batch = texts[i:i + max_batch_size]
                 
-                response = client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=batch
-                )
-                
-                batch_embeddings = [d.embedding for d in response.data]
-                all_embeddings.extend(batch_embeddings)
+                all_embeddings.extend(self.embedder.embed(batch))
                 
                 logger.info(f" Processed embedding batch {i//max_batch_size + 1}")
             
@@ -601,97 +571,278 @@ class ProductionHybridVectorSearch:
     def get_embeddings(self, text):
         """Get embeddings for a single text with caching."""
         try:
-            # Check cache first
-            cache_key = str(hash(text))
-            if cache_key in self.embeddings_cache:
-                return [self.embeddings_cache[cache_key]]
+            # Check cache first (in-process LRU, then the shared SQLite tier if enabled)
+            cached = self.query_cache.get(text)
+            if cached is not None:
+                metrics.inc('golf_cache_hits_total', cache='query_embedding')
+                return [cached]
+            metrics.inc('golf_cache_misses_total', cache='query_embedding')
             
-            response = client.embeddings.create(
-                model="text-embedding-3-small",
-                input=[text]
-            )
+            with metrics.timed('embedding', path='engine'):
+                vectors = self.embedder.embed([text])
             
-            embedding = response.data[0].embedding
-            self.embeddings_cache[cache_key] = embedding
+            embedding = self.query_cache.put(text, vectors[0])
             return [embedding]
             
         except Exception as e:
             logger.error(f"Single embedding error: {e}")
             return None
     
-    def cosine_similarity(self, a, b):
-        """Calculate cosine similarity between two vectors."""
-        import math
-        dot_product = sum(x * y for x, y in zip(a, b))
-        magnitude_a = math.sqrt(sum(x * x for x in a))
-        magnitude_b = math.sqrt(sum(x * x for x in b))
-        return dot_product / (magnitude_a * magnitude_b) if magnitude_a * magnitude_b > 0 else 0
+    @staticmethod
+    def _top_k_indices(scores, k):
+        """Indices of the k highest scores, best first, via partial selection."""
+        if k >= len(scores):
+            return np.argsort(-scores, kind='stable')
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind='stable')]
+    
+    def _build_result(self, row, similarity, chunk_scores):
+        """Build the list-of-dicts result format used by boosting and callers."""
+        rule = self.all_rules[row]
+        
+        # Winning chunk for this rule (its chunks are contiguous)
+        start = self.rule_chunk_start[row]
+        end = self.rule_chunk_start[row + 1] if row + 1 < len(self.rule_chunk_start) else len(chunk_scores)
+        best_chunk = start + int(np.argmax(chunk_scores[start:end]))
+        condition_index = int(self.chunk_condition[best_chunk])
+        
+        best_condition = None
+        if condition_index >= 0:
+            condition = rule['conditions'][condition_index]
+            best_condition = {
+                'index': condition_index,
+                'situation': condition.get('situation', ''),
+                'explanation': condition.get('explanation', ''),
+                'similarity': float(chunk_scores[best_chunk])
+            }
+        
+        return {
+            'rule': {
+                'id': rule['id'],
+                'title': rule['title'],
+                'text': rule['text']
+            },
+            'best_similarity': float(similarity),
+            'best_match_type': 'condition' if best_condition else 'main_rule',
+            'best_condition': best_condition,
+            'is_local': rule['is_local'],
+            'priority': rule['priority'],
+            'rule_type': 'local' if rule['is_local'] else 'official'
+        }
+    
+    @staticmethod
+    def _prepare_query(query):
+        """Query normalization shared by embedding and search ("17th" -> "17")."""
+        return prepare_search_text(query)
     
-    def search_with_precedence(self, query, hole_number=None, top_n=3, verbose=False):
-        """FIXED: Search with precedence using pre-computed embeddings."""
+    def embed_query(self, query):
+        """
+        L2-normalized float32 embedding for a query, or None if embedding fails (and
+        always None with SEARCH_MODE=lexical, which makes no embeddings calls).
+        
+        Callers that need the vector before searching (e.g. the answer cache) pass it
+        back via search_with_precedence(query_vector=...) so a query is embedded once.
+        """
+        if self.search_mode == 'lexical' or self.chunk_matrix is None:
+            return None
+        query_embedding = self.get_embeddings(self._prepare_query(query))
+        if not query_embedding:
+            return None
+        return self._unit_vector(query_embedding[0])
+    
+    async def embed_query_async(self, query, async_client):
+        """
+        embed_query for the async pipeline: same cache and normalization, but the
+        embeddings call is awaited on async_client (an AsyncOpenAI) instead of blocking.
+        Non-OpenAI backends ignore async_client and embed off the event loop.
+        """
+        if self.search_mode == 'lexical' or self.chunk_matrix is None:
+            return None
+        text = self._prepare_query(query)
         try:
-            import re
-            query = re.sub(r'\b(\d{1,2})(?:th|st|nd|rd)\b', r'\1', query)
+            cached = self.query_cache.get(text)
+            if cached is not None:
+                metrics.inc('golf_cache_hits_total', cache='query_embedding')
+                return self._unit_vector(cached)
+            metrics.inc('golf_cache_misses_total', cache='query_embedding')
+            
+            with metrics.timed('embedding', path='engine'):
+                vectors = await self.embedder.embed_async([text], async_client)
+            
+            return self._unit_vector(self.query_cache.put(text, vectors[0]))
+            
+        except Exception as e:
+            logger.error(f"Single embedding error: {e}")
+            return None
+    
+    def needs_query_embedding(self, query, analysis=None):
+        """
+        False if search_with_precedence would not use a query embedding: SEARCH_MODE=lexical,
+        degraded, or a hybrid query with a decisive lexical winner. Lets callers that embed
+        ahead of the search (answer cache, async pipeline) skip the embeddings call.
+        """
+        if self.search_mode == 'lexical' or self.is_degraded():
+            return False
+        if self.search_mode != 'hybrid':
+            return True
+        analysis = QueryAnalysis.of(query, analysis)
+        lexical_chunk_scores = self.lexical_index.chunk_scores(analysis.search_lower)
+        lexical_scores = self.lexical_index.rule_scores(lexical_chunk_scores, analysis.search_lower)
+        return not LexicalIndex.is_decisive(lexical_scores)
+    
+    @staticmethod
+    def _unit_vector(embedding):
+        """L2-normalized float32 copy of an embedding, or None for a zero vector."""
+        query_vector = np.asarray(embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query_vector)
+        if query_norm == 0:
+            return None
+        return query_vector / query_norm
+    
+    def _apply_boosts(self, scores, analysis, hole_number, scenarios, columbia_boosts, verbose=False):
+        """Universal, then Columbia CC boosts on a per-rule score vector (returns a float64 copy)."""
+        if scenarios:
+            scores = self.universal_booster.apply(scores, scenarios, verbose=verbose)
+        return self.columbia_booster.apply(scores, analysis, hole_number=hole_number, verbose=verbose,
+                                           boosts=columbia_boosts)
+    
+    def search_with_precedence(self, query, hole_number=None, top_n=3, verbose=False, query_vector=None, analysis=None):
+        """
+        Search with precedence: dense and/or BM25 scoring (see SEARCH_MODE), partial top-k,
+        then universal and Columbia boosting.
+        
+        best_similarity is the cosine similarity whenever the query was embedded. Scored
+        by BM25 alone (lexical mode, a decisive exact-term match, no query embedding, or
+        no rule embeddings), it is the rule's BM25 score relative to the best rule's.
+        """
+        try:
+            analysis = QueryAnalysis.of(query, analysis)
+            query = analysis.search_text
             
             if verbose:
                 logger.info(f" Searching with precedence for: {query}")
-                
-            # Get query embedding (only 1 API call per query now)
-            query_embedding = self.get_embeddings(query)
-            if not query_embedding:
+            
+            if not self.is_ready():
+                logger.error(" Search index unavailable - search skipped")
                 return []
             
-            query_vector = query_embedding[0]
-            results = []
+            with metrics.timed('lexical_search', path='engine'):
+                lexical_chunk_scores = self.lexical_index.chunk_scores(analysis.search_lower)
+                lexical_scores = self.lexical_index.rule_scores(lexical_chunk_scores, analysis.search_lower)
             
-            # Use pre-computed rule embeddings (no API calls in loop)
-            all_rules = self.local_rules + self.official_rules
+            # Get query embedding (only 1 API call per query now) unless the caller has it,
+            # an exact-term query has a decisive lexical winner, or there are no rule embeddings
+            mode = self.search_mode
+            if self.is_degraded():
+                self._retry_embeddings()
+                mode = 'degraded'
+            elif query_vector is None and mode != 'lexical':
+                if mode == 'hybrid' and LexicalIndex.is_decisive(lexical_scores):
+                    mode = 'decisive'
+                else:
+                    query_vector = self.embed_query(query)
+                    if query_vector is None:
+                        logger.warning(" Query embedding unavailable - falling back to lexical search")
+                        mode = 'fallback'
+            if self.chunk_matrix is None:
+                query_vector = None
+            metrics.inc('golf_search_mode_total', mode=mode)
             
-            for rule in all_rules:
-                rule_id = rule['id']
-                
-                # Use pre-computed embedding
-                if rule_id in self.rule_embeddings_cache:
-                    rule_embedding = self.rule_embeddings_cache[rule_id]
-                    similarity = self.cosine_similarity(query_vector, rule_embedding)
+            fused = False
+            with metrics.timed('vector_search', path='engine'):
+                if query_vector is not None:
+                    # Cosine similarity against every chunk at once (rows are pre-normalized),
+                    # then max-pool chunks back to one score per rule
+                    chunk_scores = self.chunk_matrix @ query_vector
+                    similarities = np.maximum.reduceat(chunk_scores, self.rule_chunk_start)
+                    ranking = similarities * self.rule_weights
                     
-                    results.append({
-                        'rule': {
-                            'id': rule['id'],
-                            'title': rule['title'],
-                            'text': rule['text']
-                        },
-                        'best_similarity': similarity,
-                        'is_local': rule['is_local'],
-                        'priority': rule['priority'],
-                        'rule_type': 'local' if rule['is_local'] else 'official'
-                    })
-            
-            # Sort by local rules first, then similarity
-            def sort_key(result):
-                base_score = result['best_similarity']
-                if result['is_local']:
-                    return base_score * 1.5  # 50% boost for local rules
-                return base_score
-            
-            results.sort(key=sort_key, reverse=True)
+                    # Hybrid: fuse the dense and lexical rank positions
+                    if mode == 'hybrid' and lexical_scores.any():
+                        ranking = reciprocal_rank_fusion(ranking, lexical_scores * self.rule_weights)
+                        fused = True
+                else:
+                    best = lexical_scores.max()
+                    if best <= 0:
+                        if verbose:
+                            logger.info(" No lexical match and no query embedding - nothing to return")
+                        return []
+                    chunk_scores = lexical_chunk_scores / best
+                    similarities = lexical_scores / best
+                    ranking = similarities * self.rule_weights
+                
+                # Partial selection of the best candidates. Local rules always stay in the
+                # pool because Columbia boosting can lift them by up to 5x.
+                candidate_rows = self._top_k_indices(ranking, top_n + BOOST_CANDIDATE_MARGIN)
+                candidate_rows = np.union1d(candidate_rows, self.local_rule_rows)
+                
+                # Same for rules an active universal scenario or Columbia CC boost lifts
+                scenarios = self.universal_booster.active_scenarios(analysis) if self.universal_booster else []
+                if scenarios:
+                    candidate_rows = np.union1d(candidate_rows, self.universal_booster.promoted_rows(scenarios))
+                columbia_boosts = self.columbia_booster.active_boosts(analysis, hole_number)
+                if columbia_boosts:
+                    candidate_rows = np.union1d(candidate_rows, self.columbia_booster.promoted_rows(columbia_boosts))
+                candidate_rows = candidate_rows[np.argsort(-ranking[candidate_rows], kind='stable')]
             
             if verbose:
-                logger.info(f" Found {len(results)} total rules, returning top {top_n}")
-                for i, result in enumerate(results[:top_n]):
+                logger.info(f" Scored {len(self.all_rules)} rules ({mode}), {len(candidate_rows)} candidates, returning top {top_n}")
+                for i, row in enumerate(candidate_rows[:top_n]):
+                    result = self._build_result(row, similarities[row], chunk_scores)
                     rule_type = "LOCAL" if result['is_local'] else "OFFICIAL"
-                    logger.info(f"  {i+1}. {rule_type} - {result['rule']['id']}: {result['best_similarity']:.3f}")
+                    matched = f" (condition: {result['best_condition']['situation'][:60]})" if result['best_condition'] else ""
+                    logger.info(f"  {i+1}. {rule_type} - {result['rule']['id']}: {result['best_similarity']:.3f}{matched}")
             
-            # Apply Columbia CC boosting (bridge, cart path, water, purple line, etc.)
-            results = apply_columbia_boosting(results, query, verbose=verbose)
-            results.sort(key=sort_key, reverse=True)
-
-            return results[:top_n]
+            # Apply universal and Columbia CC boosting to the score vector, then rank the
+            # candidates with local rules first (50% boost) and build results for the top rows only.
+            # Fused rankings already weight local rules through their rank positions.
+            with metrics.timed('boosting', path='engine'):
+                boosted = self._apply_boosts(similarities, analysis, hole_number, scenarios, columbia_boosts,
+                                             verbose=verbose)
+                if fused:
+                    final = self._apply_boosts(ranking, analysis, hole_number, scenarios, columbia_boosts)
+                else:
+                    final = boosted * self.rule_weights
+                top_rows = candidate_rows[np.argsort(-final[candidate_rows], kind='stable')][:top_n]
+            
+            return [self._build_result(row, boosted[row], chunk_scores) for row in top_rows]
             
         except Exception as e:
             logger.error(f"Search error: {e}")
             return []
 
+def get_search_engine():
+    """
+    Process-wide search engine registry owned by the app.
+    
+    Built once on first use and shared by the simplified system and every legacy
+    get_*_focused_response handler, so no request path re-embeds the rulebook.
+    """
+    engine = app.extensions.get('golf_search_engine')
+    if engine is None:
+        with _search_engine_lock:
+            engine = app.extensions.get('golf_search_engine')
+            if engine is None:
+                engine = ProductionHybridVectorSearch()
+                # Register only a usable engine so a failed startup retries on next use
+                if engine.is_ready():
+                    app.extensions['golf_search_engine'] = engine
+    return engine
+
+def get_intent_classifier():
+    """Process-wide local intent classifier, built on first use from the shared search engine."""
+    classifier = app.extensions.get('golf_intent_classifier')
+    if classifier is None:
+        with _intent_classifier_lock:
+            classifier = app.extensions.get('golf_intent_classifier')
+            if classifier is None:
+                engine = get_search_engine()
+                classifier = IntentClassifier(embed_fn=engine.get_embeddings_batch, model=engine.embedder.name,
+                                              backend=engine.embedder.backend)
+                if classifier.is_ready():
+                    app.extensions['golf_intent_classifier'] = classifier
+    return classifier
+
 def build_enhanced_rule_context(search_results, max_rules=3):
     """
     Build COMPLETE context including full rule text and ALL conditions.
@@ -735,9 +886,9 @@ def build_enhanced_rule_context(search_results, max_rules=3):
     return "\n" + "="*50 + "\n".join(context_parts)
 
 
-def detect_definition_query(query):
+def detect_definition_query(query, analysis=None):
     """Detect if query is asking for a golf definition."""
-    query_lower = query.lower().strip()
+    query_lower = QueryAnalysis.of(query, analysis).normalized
     
     # Direct definition queries
     definition_patterns = [
@@ -791,7 +942,7 @@ def create_definition_response(definition_id, query):
         'confidence': 'high'
     }
 
-def enhance_ai_prompt_with_definitions(prompt, query):
+def enhance_ai_prompt_with_definitions(prompt, query, analysis=None):
     """
     Option 1: Include potentially relevant definitions and let AI choose.
     For stake queries, includes both movable obstruction and penalty area definitions.
@@ -799,7 +950,8 @@ def enhance_ai_prompt_with_definitions(prompt, query):
     try:
         logger.info(f" DEBUG: enhance_ai_prompt_with_definitions called for query: {query}")
         
-        query_lower = query.lower()
+        analysis = QueryAnalysis.of(query, analysis)
+        query_lower = analysis.lower
         definitions_to_add = []
         
         # Check if stakes are mentioned
@@ -816,9 +968,8 @@ def enhance_ai_prompt_with_definitions(prompt, query):
                 definitions_to_add.append(penalty_def)
         
         # Also check for other specific terms
-        query_words = query_lower.split()
-        for word in query_words:
-            if word in COMMON_DEFINITION_LOOKUPS and word not in ['stake', 'stakes', 'red', 'yellow']:
+        for word in analysis.definition_words:
+            if word not in ['stake', 'stakes', 'red', 'yellow']:
                 def_id = COMMON_DEFINITION_LOOKUPS[word]
                 definition = get_definition_by_id(def_id)
                 if definition and definition not in definitions_to_add:
@@ -854,9 +1005,36 @@ def check_common_query(question):
     
     return None
 
-def classify_intent_enhanced(question):
+def classify_intent_enhanced(question, verbose=False):
     """
     Enhanced intent classification that better identifies complex queries.
+    
+    Uses the local nearest-centroid classifier on the query embedding (which the
+    focused handlers reuse from the query cache for their search). The gpt-4
+    classifier is only called when the local result is low-confidence and
+    INTENT_LLM_FALLBACK is enabled.
+    """
+    try:
+        classifier = get_intent_classifier()
+        query_vector = get_search_engine().embed_query(question)
+        intent, similarity, confident = classifier.classify(query_vector)
+        
+        if verbose:
+            logger.info(f" Local intent: {intent} (similarity {similarity:.3f}, confident={confident})")
+        
+        if confident or not INTENT_LLM_FALLBACK:
+            return intent
+        
+    except Exception as e:
+        logger.error(f"Local intent classification error: {e}")
+        if not INTENT_LLM_FALLBACK:
+            return 'general'
+    
+    return classify_intent_llm(question)
+
+def classify_intent_llm(question):
+    """
+    Low-confidence fallback: one-letter gpt-4 classification.
     """
     try:
         classification_prompt = f"""Classify this golf rules question into the most specific category:
@@ -875,12 +1053,13 @@ H) General/Other - Doesn't fit above categories
 
 Answer with letter only:"""
 
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": classification_prompt}],
-            temperature=0.1,
-            max_tokens=5
-        )
+        with metrics.timed('intent_llm', path='hybrid'):
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": classification_prompt}],
+                temperature=0.1,
+                max_tokens=5
+            )
         
         result = response.choices[0].message.content.strip().upper()
         
@@ -901,12 +1080,12 @@ Answer with letter only:"""
         logger.error(f"Enhanced intent classification error: {e}")
         return 'general'
 
-def get_position_focused_response(question, verbose=False):
+def get_position_focused_response(question, verbose=False, analysis=None):
     """Focused AI for position/boundary questions with local rules context"""
     try:
         # Get local rules context
-        search_engine = ProductionHybridVectorSearch()
-        search_results = search_engine.search_with_precedence(question, top_n=3, verbose=verbose)
+        search_engine = get_search_engine()
+        search_results = search_engine.search_with_precedence(question, top_n=3, verbose=verbose, analysis=analysis)
         
         # TEMPORARY DEBUG LOGGING
         if verbose:
@@ -918,7 +1097,8 @@ def get_position_focused_response(question, verbose=False):
                 score = result.get('best_similarity', 0)
                 logger.info(f"  {i+1}. {'LOCAL' if is_local else 'OFFICIAL'} - {rule_id}: {title} (score: {score:.3f})")
         
-        context = build_enhanced_rule_context(search_results, max_rules=3)
+        with metrics.timed('context', path='hybrid'):
+            context = build_enhanced_rule_context(search_results, max_rules=3)
 
         base_prompt = f"""Golf rules expert: Determine ball position/status at Columbia Country Club. Be aware that many ball position/status situations are not Columbia-specific, and for these the official golf rules are the more suitable source for the response. Do not reference Columbia local rules unless the local rules apply to the user's specific question.
 
@@ -946,14 +1126,15 @@ If COLUMBIA CC LOCAL RULE applies, start with "According to Columbia's local rul
 If an official rule applies, start with "According to the Rules of Golf, Rule X.X..."
 """
 
-        enhanced_prompt = enhance_ai_prompt_with_definitions(base_prompt, question)
+        enhanced_prompt = enhance_ai_prompt_with_definitions(base_prompt, question, analysis)
 
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": enhanced_prompt}],
-            temperature=0.1,
-            max_tokens=300
-        )
+        with metrics.timed('llm', path='hybrid'):
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": enhanced_prompt}],
+                temperature=0.1,
+                max_tokens=300
+            )
         
         result = {
             'answer': response.choices[0].message.content,
@@ -971,11 +1152,11 @@ If an official rule applies, start with "According to the Rules of Golf, Rule X.
         logger.error(f"Position response error: {e}")
         return get_fallback_response()
 
-def get_relief_focused_response(question, verbose=False):
+def get_relief_focused_response(question, verbose=False, analysis=None):
     """Focused AI for relief/procedure questions - COMPLETE ANSWERS"""
     try:
-        search_engine = ProductionHybridVectorSearch()
-        search_results = search_engine.search_with_precedence(question, top_n=4, verbose=verbose)
+        search_engine = get_search_engine()
+        search_results = search_engine.search_with_precedence(question, top_n=4, verbose=verbose, analysis=analysis)
         
         if verbose:
             logger.info(f" Relief search results for '{question}':")
@@ -986,7 +1167,8 @@ def get_relief_focused_response(question, verbose=False):
                 score = result.get('best_similarity', 0)
                 logger.info(f"  {i+1}. {'LOCAL' if is_local else 'OFFICIAL'} - {rule_id}: {title} (score: {score:.3f})")
         
-        context = build_enhanced_rule_context(search_results, max_rules=3)
+        with metrics.timed('context', path='hybrid'):
+            context = build_enhanced_rule_context(search_results, max_rules=3)
         
         # REMOVED word limit - allow complete answers
         base_prompt = f"""You are a golf rules expert at Columbia Country Club. Provide a COMPLETE and ACCURATE answer about relief options. Do not reference Columbia Local Rules unless the local rule applies to the user's specific question.
@@ -1015,14 +1197,15 @@ Provide the complete procedure including:
   • Where and how to take relief
   • Any specific requirements or limitations"""
 
-        enhanced_prompt = enhance_ai_prompt_with_definitions(base_prompt, question)
+        enhanced_prompt = enhance_ai_prompt_with_definitions(base_prompt, question, analysis)
 
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": enhanced_prompt}],
-            temperature=0.1,
-            max_tokens=300  # Increased from 125 to allow complete answers
-        )
+        with metrics.timed('llm', path='hybrid'):
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": enhanced_prompt}],
+                temperature=0.1,
+                max_tokens=300  # Increased from 125 to allow complete answers
+            )
         
         result = {
             'answer': response.choices[0].message.content,
@@ -1040,11 +1223,11 @@ Provide the complete procedure including:
         logger.error(f"Relief response error: {e}")
         return get_fallback_response()
 
-def get_penalty_focused_response(question, verbose=False):
+def get_penalty_focused_response(question, verbose=False, analysis=None):
     """Focused AI for penalty situations - COMPLETE ANSWERS"""
     try:
-        search_engine = ProductionHybridVectorSearch()
-        search_results = search_engine.search_with_precedence(question, top_n=3, verbose=verbose)
+        search_engine = get_search_engine()
+        search_results = search_engine.search_with_precedence(question, top_n=3, verbose=verbose, analysis=analysis)
         
         if verbose:
             logger.info(f" Penalty search results for '{question}':")
@@ -1055,7 +1238,8 @@ def get_penalty_focused_response(question, verbose=False):
                 score = result.get('best_similarity', 0)
                 logger.info(f"  {i+1}. {'LOCAL' if is_local else 'OFFICIAL'} - {rule_id}: {title} (score: {score:.3f})")
         
-        context = build_enhanced_rule_context(search_results, max_rules=3)
+        with metrics.timed('context', path='hybrid'):
+            context = build_enhanced_rule_context(search_results, max_rules=3)
         
         base_prompt = f"""You are a golf rules expert at Columbia Country Club. Provide a COMPLETE answer about penalties and breaches. Do not reference Columbia's local rules unless the local rule applies to the user's specific question.
 
@@ -1077,14 +1261,15 @@ Start your response appropriately:
   • "According to the Rules of Golf, Rule X.X..." (if using official rule)"""
 
         # Apply definition enhancement (Option 1)
-        enhanced_prompt = enhance_ai_prompt_with_definitions(base_prompt, question)
-
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": enhanced_prompt}],
-            temperature=0.1,
-            max_tokens=300  # Increased to allow complete answers
-        )
+        enhanced_prompt = enhance_ai_prompt_with_definitions(base_prompt, question, analysis)
+
+        with metrics.timed('llm', path='hybrid'):
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": enhanced_prompt}],
+                temperature=0.1,
+                max_tokens=300  # Increased to allow complete answers
+            )
         
         result = {
             'answer': response.choices[0].message.content,
@@ -1103,11 +1288,11 @@ Start your response appropriately:
         return get_fallback_response()
 
 
-def get_procedure_focused_response(question, verbose=False):
+def get_procedure_focused_response(question, verbose=False, analysis=None):
     """Focused AI for procedure questions - COMPLETE ANSWERS"""
     try:
-        search_engine = ProductionHybridVectorSearch()
-        search_results = search_engine.search_with_precedence(question, top_n=3, verbose=verbose)
+        search_engine = get_search_engine()
+        search_results = search_engine.search_with_precedence(question, top_n=3, verbose=verbose, analysis=analysis)
         
         if verbose:
             logger.info(f" Procedure search results for '{question}':")
@@ -1118,7 +1303,8 @@ def get_procedure_focused_response(question, verbose=False):
                 score = result.get('best_similarity', 0)
                 logger.info(f"  {i+1}. {'LOCAL' if is_local else 'OFFICIAL'} - {rule_id}: {title} (score: {score:.3f})")
         
-        context = build_enhanced_rule_context(search_results, max_rules=3)
+        with metrics.timed('context', path='hybrid'):
+            context = build_enhanced_rule_context(search_results, max_rules=3)
         
         base_prompt = f"""You are a golf rules expert at Columbia Country Club. Provide a COMPLETE answer about golf procedures. Do not mention Columbia's Local Rules unless a local rule applies to the user's specific question.
 
@@ -1142,14 +1328,15 @@ Start your response appropriately:
 Format the procedure clearly with numbered steps when applicable."""
 
         # Apply definition enhancement (Option 1)
-        enhanced_prompt = enhance_ai_prompt_with_definitions(base_prompt, question)
-
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": enhanced_prompt}],
-            temperature=0.1,
-            max_tokens=300  # Increased to allow complete answers
-        )
+        enhanced_prompt = enhance_ai_prompt_with_definitions(base_prompt, question, analysis)
+
+        with metrics.timed('llm', path='hybrid'):
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": enhanced_prompt}],
+                temperature=0.1,
+                max_tokens=300  # Increased to allow complete answers
+            )
         
         result = {
             'answer': response.choices[0].message.content,
@@ -1167,13 +1354,14 @@ Format the procedure clearly with numbered steps when applicable."""
         logger.error(f"Procedure response error: {e}")
         return get_fallback_response()
 
-def get_general_focused_response(question, verbose=False):
+def get_general_focused_response(question, verbose=False, analysis=None):
     """General AI for unclear intent - COMPLETE ANSWERS"""
     try:
-        search_engine = ProductionHybridVectorSearch()
-        search_results = search_engine.search_with_precedence(question, top_n=3, verbose=verbose)
+        search_engine = get_search_engine()
+        search_results = search_engine.search_with_precedence(question, top_n=3, verbose=verbose, analysis=analysis)
         
-        context = build_enhanced_rule_context(search_results, max_rules=3)
+        with metrics.timed('context', path='hybrid'):
+            context = build_enhanced_rule_context(search_results, max_rules=3)
         
         # REMOVED word limit
         base_prompt = f"""You are a golf rules expert at Columbia Country Club. Provide a COMPLETE answer to this golf rules question. Do not mention Columbia's Local Rules unless a local rule applies to the user's specific question.
@@ -1195,14 +1383,15 @@ Start your response appropriately:
 
 Ensure your answer is complete and would allow a golfer to proceed correctly."""
 
-        enhanced_prompt = enhance_ai_prompt_with_definitions(base_prompt, question)
+        enhanced_prompt = enhance_ai_prompt_with_definitions(base_prompt, question, analysis)
 
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": enhanced_prompt}],
-            temperature=0.1,
-            max_tokens=300  # Increased to allow complete answers
-        )
+        with metrics.timed('llm', path='hybrid'):
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": enhanced_prompt}],
+                temperature=0.1,
+                max_tokens=300  # Increased to allow complete answers
+            )
         
         result = {
             'answer': response.choices[0].message.content,
@@ -1229,24 +1418,95 @@ def get_fallback_response():
         'tokens_used': 0
     }
 
-def calculate_template_confidence(question, template_data):
+# Phrases whose presence calculate_template_confidence checks, by role
+STRONG_SIGNAL_PREFIXES = ['rule for', 'rule about', 'rule if', 'relief from', 'relief for', 'procedure for']
+MODERATE_SIGNAL_PREFIXES = ['hit', 'went', 'into', 'near']
+QUESTION_OPENERS = ['what', 'how', 'where']
+
+# Columbia-specific partial matches (for things like "lost ball")
+COLUMBIA_PARTIAL_MATCHES = {
+    'lost ball': ['lost', 'ball'],
+    'cart path': ['cart', 'path'],
+    'green stakes': ['green', 'stakes'],
+    'purple line': ['purple', 'line'],
+    'maintenance': ['maintenance'],
+    'water': ['water', 'hazard'],
+}
+ASKING_WORDS = ['rule', 'relief', 'procedure', 'what', 'how', 'where']
+
+DISQUALIFIER_PHRASES = [
+    # Multi-step scenarios
+    'and then', 'after that', 'which caused', 'resulted in', 'subsequently',
+    # Ball in motion scenarios
+    'in motion', 'moving ball', 'while it was still', 'accidentally hit', 'accidentally deflected'
+]
+OTHER_PLAYER_PHRASES = ['my opponent', 'another player']
+OTHER_PLAYER_ACTIONS = ['hit', 'played', 'moved', 'touched']
+GOLF_ACTIONS = ['hit', 'chipped', 'putted', 'drove', 'played', 'dropped', 'placed', 'lifted']
+
+PENALTY_AREA_INDICATORS = ['red stake', 'yellow stake', 'penalty area', 'water hazard', 'water', 'pond', 'creek']
+OB_PENALTY_AREA_INDICATORS = ['red stake', 'yellow stake', 'penalty area']
+COLUMBIA_CONTEXT_TERMS = ['columbia', 'cc', 'our course', 'here at']
+GENERAL_CONTEXT_TERMS = ['usga', 'official rule', 'rules of golf']
+
+
+def _compile_template_signals():
+    """
+    Precompute each template keyword's signal phrases and compile every phrase
+    used by calculate_template_confidence into one automaton.
+    """
+    keyword_signals = {}
+    phrases = set(ASKING_WORDS + DISQUALIFIER_PHRASES + OTHER_PLAYER_PHRASES + OTHER_PLAYER_ACTIONS
+                  + GOLF_ACTIONS + PENALTY_AREA_INDICATORS + COLUMBIA_CONTEXT_TERMS
+                  + GENERAL_CONTEXT_TERMS + ['what happens if', 'is it legal', 'then', 'white stake'])
+    
+    for name, template_data in COMMON_QUERY_TEMPLATES.items():
+        signals = []
+        for keyword_phrase in template_data.get("keywords", []):
+            keyword_lower = keyword_phrase.lower()
+            partial_words = [required_words for required_words in COLUMBIA_PARTIAL_MATCHES.values()
+                             if all(word in keyword_lower for word in required_words)]
+            signal = {
+                'keyword': keyword_phrase,
+                'keyword_lower': keyword_lower,
+                # For very short keywords (ob, cc), verify word boundaries
+                'boundary': re.compile(r'\b' + re.escape(keyword_lower) + r'\b') if len(keyword_lower) <= 3 else None,
+                'strong': [f"{prefix} {keyword_lower}" for prefix in STRONG_SIGNAL_PREFIXES],
+                'moderate': [f"{prefix} {keyword_lower}" for prefix in MODERATE_SIGNAL_PREFIXES],
+                'partial_words': partial_words
+            }
+            signals.append(signal)
+            phrases.update([keyword_lower] + signal['strong'] + signal['moderate'])
+            phrases.update(word for required_words in partial_words for word in required_words)
+        keyword_signals[name] = signals
+    
+    return keyword_signals, PhraseAutomaton(phrases)
+
+TEMPLATE_KEYWORD_SIGNALS, TEMPLATE_SIGNAL_AUTOMATON = _compile_template_signals()
+
+def calculate_template_confidence(question, template_data, analysis=None, template_name=None):
     """
     Hybrid approach: Positive signals for base match, with disqualifiers.
     Only matches when clearly asking about a Columbia-specific scenario.
+    
+    The signal scan and key concepts come from the request's QueryAnalysis, so
+    they are computed once and shared across templates.
     """
-    question_lower = question.lower().strip()
+    analysis = QueryAnalysis.of(question, analysis)
+    hits = analysis.phrase_hits(TEMPLATE_SIGNAL_AUTOMATON)
+    question_lower = hits.text
     confidence = 0.0
     matched_keyword = None
     
     # STEP 1: Extract key concepts and check for critical concept matches
-    concepts = extract_key_concepts(question_lower)
+    concepts = analysis.key_concepts
     
     # Get template name for critical concept checking
-    template_name = None
-    for name, data in COMMON_QUERY_TEMPLATES.items():
-        if data == template_data:
-            template_name = name
-            break
+    if template_name is None:
+        for name, data in COMMON_QUERY_TEMPLATES.items():
+            if data == template_data:
+                template_name = name
+                break
     
     # If critical concepts match, start with base confidence
     if template_name and check_critical_concepts(concepts, template_name):
@@ -1254,78 +1514,49 @@ def calculate_template_confidence(question, template_data):
         matched_keyword = "critical_concepts"
 
     # STEP 2: Check each keyword for positive signals
-    for keyword_phrase in template_data.get("keywords", []):
-        keyword_lower = keyword_phrase.lower()
+    for signal in TEMPLATE_KEYWORD_SIGNALS.get(template_name, []):
+        keyword_lower = signal['keyword_lower']
         
         # Skip if keyword not in question at all
-        if keyword_lower not in question_lower:
+        if keyword_lower not in hits:
             continue
             
         # For very short keywords (ob, cc), verify word boundaries
-        if len(keyword_lower) <= 3:
-            import re
-            pattern = r'\b' + re.escape(keyword_lower) + r'\b'
-            if not re.search(pattern, question_lower):
-                continue  # Skip "ob" inside "obstruction"
+        if signal['boundary'] is not None and not signal['boundary'].search(question_lower):
+            continue  # Skip "ob" inside "obstruction"
         
         # STRONG POSITIVE SIGNALS (high confidence)
-        strong_signals = [
-            keyword_lower == question_lower,  # Exact match
-            question_lower.startswith(keyword_lower),  # Starts with keyword
-            question_lower.endswith(keyword_lower),  # Ends with keyword
-            f"rule for {keyword_lower}" in question_lower,  # "what is the rule for X"
-            f"rule about {keyword_lower}" in question_lower,  # "rule about X"
-            f"rule if {keyword_lower}" in question_lower,  # "what's the rule if X"
-            f"relief from {keyword_lower}" in question_lower,  # "relief from X"
-            f"relief for {keyword_lower}" in question_lower,  # "relief for X"
-            f"procedure for {keyword_lower}" in question_lower,  # "procedure for X"
-            len(keyword_lower) / len(question_lower) > 0.7,  # Keyword is 70%+ of question
-        ]
+        strong_signal = (
+            keyword_lower == question_lower  # Exact match
+            or question_lower.startswith(keyword_lower)  # Starts with keyword
+            or question_lower.endswith(keyword_lower)  # Ends with keyword
+            or hits.any(signal['strong'])  # "what is the rule for X", "relief from X", ...
+            or len(keyword_lower) / len(question_lower) > 0.7  # Keyword is 70%+ of question
+        )
         
         # MODERATE POSITIVE SIGNALS (medium confidence)
-        moderate_signals = [
-            len(keyword_lower) / len(question_lower) > 0.4,  # Keyword is 40%+ of question
-            question_lower.startswith("what") and keyword_lower in question_lower[:50],  # What + keyword early
-            question_lower.startswith("how") and keyword_lower in question_lower[:50],  # How + keyword early
-            question_lower.startswith("where") and keyword_lower in question_lower[:50],  # Where + keyword early
-            f"hit {keyword_lower}" in question_lower,  # "ball hit purple line"
-            f"went {keyword_lower}" in question_lower,  # "ball went out of bounds"
-            f"into {keyword_lower}" in question_lower,  # "into maintenance facility"
-            f"near {keyword_lower}" in question_lower,  # "near purple line"
-        ]
+        moderate_signal = (
+            len(keyword_lower) / len(question_lower) > 0.4  # Keyword is 40%+ of question
+            or (question_lower.startswith(tuple(QUESTION_OPENERS)) and hits.within(keyword_lower, 50))  # What/How/Where + keyword early
+            or hits.any(signal['moderate'])  # "ball hit purple line", "went out of bounds", ...
+        )
         
         # Check for Columbia-specific partial matches (for things like "lost ball")
-        columbia_partial_matches = {
-            'lost ball': ['lost', 'ball'],
-            'cart path': ['cart', 'path'],
-            'green stakes': ['green', 'stakes'],
-            'purple line': ['purple', 'line'],
-            'maintenance': ['maintenance'],
-            'water': ['water', 'hazard'],
-        }
-        
-        partial_match = False
-        for phrase, required_words in columbia_partial_matches.items():
-            if all(word in keyword_lower for word in required_words):
-                if all(word in question_lower for word in required_words):
-                    # Check if this is asking about the rule/procedure
-                    if any(asking_word in question_lower for asking_word in 
-                           ['rule', 'relief', 'procedure', 'what', 'how', 'where']):
-                        partial_match = True
-                        break
+        partial_match = (any(all(word in hits for word in required_words) for required_words in signal['partial_words'])
+                         and hits.any(ASKING_WORDS))  # Asking about the rule/procedure
         
         # Assign confidence based on signals
-        if any(strong_signals):
+        if strong_signal:
             confidence = 0.8
-            matched_keyword = keyword_phrase
+            matched_keyword = signal['keyword']
             break
-        elif any(moderate_signals):
+        elif moderate_signal:
             confidence = 0.6
-            matched_keyword = keyword_phrase
+            matched_keyword = signal['keyword']
             break
         elif partial_match:
             confidence = 0.5
-            matched_keyword = keyword_phrase
+            matched_keyword = signal['keyword']
             # Don't break - keep looking for better matches
     
     # EARLY EXIT: No match found
@@ -1333,35 +1564,23 @@ def calculate_template_confidence(question, template_data):
         return 0.0
     
     # DISQUALIFIERS - Complex scenarios that should go to AI
+    word_count = len(question_lower.split())
     disqualifiers = [
-        # Multi-step scenarios
-        'and then' in question_lower,
-        'after that' in question_lower,
-        'which caused' in question_lower,
-        'resulted in' in question_lower,
-        'subsequently' in question_lower,
-        
-        # Ball in motion scenarios
-        'in motion' in question_lower,
-        'moving ball' in question_lower,
-        'while it was still' in question_lower,
-        'accidentally hit' in question_lower,
-        'accidentally deflected' in question_lower,
+        # Multi-step scenarios and ball in motion scenarios
+        hits.any(DISQUALIFIER_PHRASES),
         
         # Multi-player interactions
-        ('my opponent' in question_lower or 'another player' in question_lower) and 
-        any(action in question_lower for action in ['hit', 'played', 'moved', 'touched']),
+        hits.any(OTHER_PLAYER_PHRASES) and hits.any(OTHER_PLAYER_ACTIONS),
         
         # Complex rules scenarios
-        'what happens if' in question_lower and len(question_lower.split()) > 15,
-        'is it legal' in question_lower and 'then' in question_lower,
+        'what happens if' in hits and word_count > 15,
+        'is it legal' in hits and 'then' in hits,
         
         # Query is too long (likely a complex scenario)
-        len(question_lower.split()) > 25,
+        word_count > 25,
         
         # Multiple golf actions (complex scenario)
-        sum(1 for action in ['hit', 'chipped', 'putted', 'drove', 'played', 'dropped', 'placed', 'lifted'] 
-            if action in question_lower) > 2,
+        hits.count(GOLF_ACTIONS) > 2,
     ]
     
     if any(disqualifiers):
@@ -1372,69 +1591,30 @@ def calculate_template_confidence(question, template_data):
     
     # For LOST BALL template - avoid penalty area confusion
     if 'lost_ball' in template_name.lower() or template_data.get('local_rule') == 'CCC-1':
-        if any(indicator in question_lower for indicator in 
-               ['red stake', 'yellow stake', 'penalty area', 'water hazard', 'water', 'pond', 'creek']):
+        if hits.any(PENALTY_AREA_INDICATORS):
             return 0.0  # This is a penalty area, not a lost ball scenario
     
     # For OUT OF BOUNDS template - avoid penalty area confusion  
     if 'out_of_bounds' in template_name.lower():
-        if any(indicator in question_lower for indicator in ['red stake', 'yellow stake', 'penalty area']):
+        if hits.any(OB_PENALTY_AREA_INDICATORS):
             return 0.0  # This is a penalty area, not OB
         
         # Boost for white stakes (indicate OB)
-        if 'white stake' in question_lower:
+        if 'white stake' in hits:
             confidence = min(1.0, confidence * 1.3)
     
     # FINAL ADJUSTMENTS
     
     # Boost for explicit Columbia context
-    if any(term in question_lower for term in ['columbia', 'cc', 'our course', 'here at']):
+    if hits.any(COLUMBIA_CONTEXT_TERMS):
         confidence = min(1.0, confidence * 1.2)
     
     # Penalty for explicit general/USGA context
-    if any(term in question_lower for term in ['usga', 'official rule', 'rules of golf']):
+    if hits.any(GENERAL_CONTEXT_TERMS):
         confidence *= 0.3
     
     return confidence
 
-def extract_key_concepts(text):
-    """
-    Extract important concepts from text for matching.
-    Returns a set of key terms.
-    """
-    # Remove common words and extract key concepts
-    stop_words = {'the', 'a', 'an', 'is', 'my', 'in', 'on', 'at', 'to', 'for', 
-                  'of', 'with', 'what', 'if', 'do', 'i', 'how', 'can', 'get',
-                  'from', 'when', 'where', 'rule', 'rules', 'happens'}
-    
-    # Special handling for compound concepts
-    text = text.replace('out of bounds', 'out_of_bounds')
-    text = text.replace('lost ball', 'lost_ball')
-    text = text.replace('cart path', 'cart_path')
-    text = text.replace('green stakes', 'green_stakes')
-    text = text.replace('maintenance facility', 'maintenance_facility')
-    text = text.replace('purple line', 'purple_line')
-    text = text.replace('water hazard', 'water_hazard')
-    
-    # Extract words
-    words = text.lower().split()
-    
-    # Keep important words and numbers
-    concepts = set()
-    for word in words:
-        # Keep numbers (hole numbers)
-        if any(char.isdigit() for char in word):
-            # Extract just the number
-            import re
-            numbers = re.findall(r'\d+', word)
-            concepts.update(numbers)
-        # Keep non-stop words
-        elif word not in stop_words and len(word) > 2:
-            concepts.add(word)
-    
-    return concepts
-
-
 def check_critical_concepts(matching_concepts, template_name):
     """
     Check if the matching concepts include critical identifiers for this template.
@@ -1470,7 +1650,7 @@ def check_critical_concepts(matching_concepts, template_name):
     # Return True only if we meet the minimum threshold
     return matched_count >= min_required    
 
-def check_common_query_with_confidence(question, confidence_threshold=0.6):
+def check_common_query_with_confidence(question, confidence_threshold=0.6, analysis=None):
     """
     Check templates with confidence scoring.
     Uses same approach as vector search: calculate similarity, apply threshold.
@@ -1481,8 +1661,11 @@ def check_common_query_with_confidence(question, confidence_threshold=0.6):
     # Debug output
     debug_matches = []
     
+    # One analysis (signal scan, key concepts) serves every template
+    analysis = QueryAnalysis.of(question, analysis)
+    
     for template_name, template_data in COMMON_QUERY_TEMPLATES.items():
-        confidence = calculate_template_confidence(question, template_data)
+        confidence = calculate_template_confidence(question, template_data, analysis=analysis, template_name=template_name)
         
         debug_matches.append((template_name, confidence))
         
@@ -1518,16 +1701,18 @@ def check_common_query_with_confidence(question, confidence_threshold=0.6):
     
     return None
 
-def get_hybrid_interpretation(question, verbose=False):
+def get_hybrid_interpretation(question, verbose=False, analysis=None):
     """
     ENHANCED: Two-stage approach with confidence-based routing
     """
     try:
         start_time = time.time()
+        analysis = QueryAnalysis.of(question, analysis)
         
         # STEP 1: Check templates with confidence scoring
         # Use lower threshold for initial check, will validate further
-        template = check_common_query_with_confidence(question, confidence_threshold=0.5)
+        with metrics.timed('template', path='hybrid'):
+            template = check_common_query_with_confidence(question, confidence_threshold=0.5, analysis=analysis)
         
         if template:
             confidence = template.get('match_confidence', 0)
@@ -1580,21 +1765,22 @@ def get_hybrid_interpretation(question, verbose=False):
                     logger.info(f" Low confidence ({confidence:.3f}) - routing to AI")
         
         # STEP 2: No good template match, classify intent for AI routing
-        intent = classify_intent_enhanced(question)
+        with metrics.timed('intent', path='hybrid'):
+            intent = classify_intent_enhanced(question, verbose)
         if verbose:
             logger.info(f" Intent classified as: {intent}")
         
         # STEP 3: Route to appropriate AI handler
         if intent == 'position':
-            result = get_position_focused_response(question, verbose)
+            result = get_position_focused_response(question, verbose, analysis)
         elif intent == 'relief':
-            result = get_relief_focused_response(question, verbose)
+            result = get_relief_focused_response(question, verbose, analysis)
         elif intent == 'penalty':
-            result = get_penalty_focused_response(question, verbose)
+            result = get_penalty_focused_response(question, verbose, analysis)
         elif intent == 'procedure':
-            result = get_procedure_focused_response(question, verbose)
+            result = get_procedure_focused_response(question, verbose, analysis)
         else:
-            result = get_general_focused_response(question, verbose)
+            result = get_general_focused_response(question, verbose, analysis)
         
         # Add timing and intent info
         response_time = round(time.time() - start_time, 2)
@@ -1675,31 +1861,45 @@ def initialize_ai_system():
     try:
         logger.info(" Initializing production hybrid AI system...")
         
-        # Test OpenAI connection
-        test_response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=["test"]
-        )
+        # Building the search engine loads rule embeddings from the on-disk store and
+        # only calls the embeddings API for new or changed rules. No separate test call:
+        # a ready search index is the availability signal. Without rule embeddings the
+        # engine serves BM25 results (degraded) and keeps retrying the embeddings.
+        search_engine = get_search_engine()
         
-        if test_response:
+        if search_engine.is_ready():
             ai_system_available = True
-            logger.info(" Production hybrid system ready - Templates + AI with Rule Scoring")
+            if search_engine.is_degraded():
+                logger.warning(" Rule embeddings unavailable - AI system running in degraded lexical (BM25) "
+                               "search mode, retrying embeddings in the background")
+            else:
+                logger.info(" Production hybrid system ready - Templates + AI with Rule Scoring")
             try:
+                # Built now so the first hybrid-path request does not pay for it
+                get_intent_classifier()
+            except Exception as e:
+                logger.error(f" Intent classifier init failed: {e}")
+            try:
+                # Answers are only reused while the knowledge base they came from is unchanged
+                kb_version = compute_kb_version(RULES_DATABASE, COLUMBIA_CC_LOCAL_RULES,
+                                                USGA_CLARIFICATIONS, GOLF_DEFINITIONS_DATABASE)
                 simplified_system = create_simplified_system(
                     templates=COMMON_QUERY_TEMPLATES,
                     definitions_db=GOLF_DEFINITIONS_DATABASE,
-                    search_engine=ProductionHybridVectorSearch(),
+                    search_engine=search_engine,
                     client=client,
                     rules_db=RULES_DATABASE,
                     local_rules=COLUMBIA_CC_LOCAL_RULES,
-                    clarifications_db=USGA_CLARIFICATIONS
+                    clarifications_db=USGA_CLARIFICATIONS,
+                    answer_cache=SemanticAnswerCache(kb_version=kb_version) if ANSWER_CACHE_ENABLED else None,
+                    kb_version=kb_version
                 )
                 logger.info(" Simplified system ready")
             except Exception as e:
                 logger.error(f" Simplified system init failed: {e}")
             return True
         else:
-            raise Exception("OpenAI API test failed")
+            raise Exception("Search index unavailable")
             
     except Exception as e:
         ai_system_available = False
@@ -1707,9 +1907,202 @@ def initialize_ai_system():
         logger.error(f" AI initialization failed: {str(e)}")
         return False
 
+def build_definition_answer(definition_id, question, start_time):
+    """/api/ask response for a definitions-database answer (logged and counted), or None."""
+    response_data = create_definition_response(definition_id, question)
+    if not response_data:
+        return None
+    
+    response_time = round(time.time() - start_time, 2)
+    
+    # Add standard response metadata
+    response_data['response_time'] = response_time
+    response_data['club_id'] = 'columbia_cc'
+    response_data['ai_system'] = 'definitions_database'
+    response_data['timestamp'] = datetime.now().isoformat()
+    response_data['tokens_used'] = 0  # Definitions are free
+    response_data['estimated_cost'] = 0.0
+    response_data['intent_detected'] = 'definition'
+    
+    # ADD COMPREHENSIVE LOGGING (same format as other sources)
+    try:
+        comprehensive_log = {
+            "timestamp": datetime.now().isoformat(),
+            "question": question,
+            "answer": response_data.get('answer', ''),
+            "source": 'definitions_database',
+            "rule_type": 'definition',
+            "confidence": response_data.get('confidence', 'high'),
+            "tokens_used": 0,
+            "estimated_cost": 0.0,
+            "response_time": response_time,
+            "intent_detected": 'definition',
+            "success": True,
+            "definition_id": definition_id  # Additional metadata for definitions
+        }
+        
+        # Log to Cloud Logging (persists forever) - SAME FORMAT AS OTHER SOURCES
+        logger.info(f"GOLF_QUERY: {json.dumps(comprehensive_log)}")
+        
+    except Exception as e:
+        logger.error(f"Dashboard logging error for definitions: {e}")
+    
+    metrics.record_request(response_data, time.time() - start_time)
+    logger.info(f" Definition response in {response_time}s")
+    return response_data
+
+def build_ai_answer(question, result, start_time):
+    """/api/ask response for a simplified/hybrid system result (logged and counted)."""
+    response_time = round(time.time() - start_time, 2)
+    
+    # Determine rule type from response
+    rule_type = 'local' if 'Columbia' in result['answer'] else 'official'
+    
+    response_data = {
+        'success': True,
+        'answer': result['answer'],
+        'question': question,
+        'club_id': 'columbia_cc',
+        'rule_type': rule_type,
+        'source': result['source'],
+        'confidence': result['confidence'],
+        'response_time': response_time,
+        'ai_system': 'production_hybrid',
+        'tokens_used': result.get('tokens_used', 0),
+        'estimated_cost': round(result.get('tokens_used', 0) * 0.00001, 4),
+        'intent_detected': result.get('intent_detected', 'unknown'),
+        'cache_hit': result.get('cache_hit', False),
+        'timestamp': datetime.now().isoformat()
+    }
+    
+    if 'rules_used' in result:
+        response_data['rules_used'] = result['rules_used']
+    if 'rule_id' in result:
+        response_data['rule_id'] = result['rule_id']
+    if 'prompt_tokens' in result:
+        response_data['prompt_tokens'] = result['prompt_tokens']
+        response_data['cached_tokens'] = result['cached_tokens']
+    
+    metrics.record_request(result, time.time() - start_time)
+    logger.info(f" Production hybrid response ({result['source']}) in {response_time}s")
+    try:
+        comprehensive_log = {
+            "timestamp": datetime.now().isoformat(),
+            "question": question,
+            "answer": response_data.get('answer', ''),
+            "source": response_data.get('source', ''),
+            "rule_type": response_data.get('rule_type', ''),
+            "confidence": response_data.get('confidence', ''),
+            "tokens_used": response_data.get('tokens_used', 0),
+            "estimated_cost": response_data.get('estimated_cost', 0),
+            "response_time": response_data.get('response_time', 0),
+            "intent_detected": response_data.get('intent_detected', ''),
+            "cache_hit": response_data.get('cache_hit', False),
+            "prompt_tokens": response_data.get('prompt_tokens'),
+            "cached_tokens": response_data.get('cached_tokens'),
+            "success": response_data.get('success', False)
+        }
+        logger.info(f"GOLF_QUERY: {json.dumps(comprehensive_log)}")
+        
+    except Exception as e:
+        logger.error(f"Dashboard logging error: {e}")
+    
+    return response_data
+
+def build_fallback_answer(question, start_time):
+    """/api/ask response when the AI system is unavailable."""
+    fallback_answer = "AI system temporarily unavailable. Please try again or contact support."
+    response_time = round(time.time() - start_time, 2)
+    
+    response_data = {
+        'success': True,
+        'answer': fallback_answer,
+        'question': question,
+        'club_id': 'columbia_cc',
+        'rule_type': 'general',
+        'source': 'fallback',
+        'confidence': 'low',
+        'response_time': response_time,
+        'ai_system': 'fallback',
+        'timestamp': datetime.now().isoformat()
+    }
+    
+    metrics.record_request(response_data, time.time() - start_time)
+    logger.info(f" Fallback response in {response_time}s") 
+    return response_data
+
+def warm_up():
+    """
+    Run every request stage once on a sample question, without API calls, so the
+    first real request does not pay for first-use costs. Marks this process warm.
+    """
+    started = time.time()
+    question = "My ball is on the cart path near the 17th green, do I get relief?"
+    analysis = QueryAnalysis(question)
+    
+    detect_definition_query(question, analysis)
+    check_common_query_with_confidence(question, analysis=analysis)
+    
+    search_engine = app.extensions.get('golf_search_engine')
+    if search_engine is not None and search_engine.is_ready():
+        # A rule's own embedding stands in for the query vector (BM25 only in lexical mode)
+        query_vector = search_engine.chunk_matrix[0] if search_engine.chunk_matrix is not None else None
+        results = search_engine.search_with_precedence(
+            question, top_n=12, query_vector=query_vector, analysis=analysis
+        )
+        if simplified_system:
+            simplified_system._check_fast_paths(question, analysis=analysis)
+            simplified_system._build_enhanced_context(results, question, analysis)
+    
+    # Warm-up traffic is not real traffic
+    metrics.reset()
+    app.extensions['golf_warmed_up'] = True
+    logger.info(f" Warm-up complete in {time.time() - started:.2f}s")
+
+def retry_ai_system_init():
+    """
+    In a process that came up without the AI system (e.g. OpenAI unreachable at preload),
+    retry initialization at most every READY_RETRY_SECONDS. Never blocks on another
+    thread's attempt. Every worker calls this itself: forked workers share no globals.
+    """
+    global _last_init_attempt
+    if ai_system_available or not _ready_lock.acquire(blocking=False):
+        return
+    try:
+        if time.time() - _last_init_attempt >= READY_RETRY_SECONDS:
+            _last_init_attempt = time.time()
+            if initialize_ai_system():
+                warm_up()
+    finally:
+        _ready_lock.release()
+
+def is_ready():
+    """True once this process is warm and (unless READY_REQUIRES_AI is off) the AI system is up."""
+    return bool(app.extensions.get('golf_warmed_up')) and (ai_system_available or not READY_REQUIRES_AI)
+
+def reset_after_fork():
+    """
+    Called in each forked worker (gunicorn post_fork). The knowledge base, matchers
+    and embedding matrix loaded by the parent are shared copy-on-write; network
+    clients and SQLite connections are not safe to share, so they are recreated.
+    """
+    global client
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    if simplified_system:
+        simplified_system.client = client
+    # Rebuilt lazily with a fresh AsyncOpenAI on the worker's event loop
+    app.extensions.pop('golf_async_pipeline', None)
+    search_engine = app.extensions.get('golf_search_engine')
+    if search_engine is not None:
+        search_engine.query_cache.after_fork()
+
 @app.route('/api/ask', methods=['POST'])
 def ask_question():
     """RESTORED: Your original sophisticated API endpoint."""
+    # Clients that accept Server-Sent Events get the streaming variant
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        return ask_question_stream()
+    
     try:
         data = request.json
         question = data.get('question', '').strip()
@@ -1722,47 +2115,16 @@ def ask_question():
         
         logger.info(f" Question: {question}")
         start_time = time.time()
+        retry_ai_system_init()
+        
+        # Analyze the question once for every stage of this request
+        analysis = QueryAnalysis(question)
 
-        definition_id = detect_definition_query(question)
+        definition_id = detect_definition_query(question, analysis)
         if definition_id:
             logger.info(f" Definition query detected: {definition_id}")
-            response_data = create_definition_response(definition_id, question)
+            response_data = build_definition_answer(definition_id, question, start_time)
             if response_data:
-                response_time = round(time.time() - start_time, 2)
-                
-                # Add standard response metadata
-                response_data['response_time'] = response_time
-                response_data['club_id'] = 'columbia_cc'
-                response_data['ai_system'] = 'definitions_database'
-                response_data['timestamp'] = datetime.now().isoformat()
-                response_data['tokens_used'] = 0  # Definitions are free
-                response_data['estimated_cost'] = 0.0
-                response_data['intent_detected'] = 'definition'
-                
-                # ADD COMPREHENSIVE LOGGING (same format as other sources)
-                try:
-                    comprehensive_log = {
-                        "timestamp": datetime.now().isoformat(),
-                        "question": question,
-                        "answer": response_data.get('answer', ''),
-                        "source": 'definitions_database',
-                        "rule_type": 'definition',
-                        "confidence": response_data.get('confidence', 'high'),
-                        "tokens_used": 0,
-                        "estimated_cost": 0.0,
-                        "response_time": response_time,
-                        "intent_detected": 'definition',
-                        "success": True,
-                        "definition_id": definition_id  # Additional metadata for definitions
-                    }
-                    
-                    # Log to Cloud Logging (persists forever) - SAME FORMAT AS OTHER SOURCES
-                    logger.info(f"GOLF_QUERY: {json.dumps(comprehensive_log)}")
-                    
-                except Exception as e:
-                    logger.error(f"Dashboard logging error for definitions: {e}")
-                
-                logger.info(f" Definition response in {response_time}s")
                 return jsonify(response_data)
             
         if ai_system_available:
@@ -1770,82 +2132,18 @@ def ask_question():
                 # Use restored sophisticated hybrid system
                 if USE_SIMPLIFIED_SYSTEM and simplified_system:
                     logger.info(" Using SIMPLIFIED system")
-                    result = simplified_system.process_query(question, verbose=True)
+                    result = simplified_system.process_query(question, verbose=True, analysis=analysis)
                 else:
                     logger.info(" Using ORIGINAL hybrid system")
-                    result = get_hybrid_interpretation(question, verbose=True)
-                response_time = round(time.time() - start_time, 2)
-                
-                # Determine rule type from response
-                rule_type = 'local' if 'Columbia' in result['answer'] else 'official'
-                
-                response_data = {
-                    'success': True,
-                    'answer': result['answer'],
-                    'question': question,
-                    'club_id': 'columbia_cc',
-                    'rule_type': rule_type,
-                    'source': result['source'],
-                    'confidence': result['confidence'],
-                    'response_time': response_time,
-                    'ai_system': 'production_hybrid',
-                    'tokens_used': result.get('tokens_used', 0),
-                    'estimated_cost': round(result.get('tokens_used', 0) * 0.00001, 4),
-                    'intent_detected': result.get('intent_detected', 'unknown'),
-                    'timestamp': datetime.now().isoformat()
-                }
-                
-                if 'rules_used' in result:
-                    response_data['rules_used'] = result['rules_used']
-                if 'rule_id' in result:
-                    response_data['rule_id'] = result['rule_id']
-                
-                logger.info(f" Production hybrid response ({result['source']}) in {response_time}s")
-                try:
-                    comprehensive_log = {
-                        "timestamp": datetime.now().isoformat(),
-                        "question": question,
-                        "answer": response_data.get('answer', ''),
-                        "source": response_data.get('source', ''),
-                        "rule_type": response_data.get('rule_type', ''),
-                        "confidence": response_data.get('confidence', ''),
-                        "tokens_used": response_data.get('tokens_used', 0),
-                        "estimated_cost": response_data.get('estimated_cost', 0),
-                        "response_time": response_data.get('response_time', 0),
-                        "intent_detected": response_data.get('intent_detected', ''),
-                        "success": response_data.get('success', False)
-                    }
-                    logger.info(f"GOLF_QUERY: {json.dumps(comprehensive_log)}")
-                    
-                except Exception as e:
-                    logger.error(f"Dashboard logging error: {e}")
-
-                return jsonify(response_data)
+                    result = get_hybrid_interpretation(question, verbose=True, analysis=analysis)
+                return jsonify(build_ai_answer(question, result, start_time))
                 
             except Exception as e:
                 logger.error(f" Hybrid system error: {str(e)}")
                 # Fall through to fallback
         
         # Fallback if AI unavailable
-        fallback_answer = "AI system temporarily unavailable. Please try again or contact support."
-        response_time = round(time.time() - start_time, 2)
-        
-        response_data = {
-            'success': True,
-            'answer': fallback_answer,
-            'question': question,
-            'club_id': 'columbia_cc',
-            'rule_type': 'general',
-            'source': 'fallback',
-            'confidence': 'low',
-            'response_time': response_time,
-            'ai_system': 'fallback',
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        logger.info(f" Fallback response in {response_time}s") 
-        
-        return jsonify(response_data)
+        return jsonify(build_fallback_answer(question, start_time))
         
     except Exception as e:
         logger.error(f" API Error: {str(e)}")
@@ -1855,6 +2153,123 @@ def ask_question():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+def format_sse(event, data):
+    """One Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/ask/stream', methods=['GET', 'POST'])
+def ask_question_stream():
+    """
+    Streaming /api/ask over Server-Sent Events.
+    
+    Events: 'answer' (template, definition or cached answer, sent at once), 'token'
+    (LLM text as it arrives), 'enrichment' (appended Columbia CC local rule), 'error',
+    and a closing 'done' with the same metadata /api/ask returns plus
+    time_to_first_token. GET with ?question= is accepted for EventSource clients.
+    """
+    if request.method == 'POST':
+        question = ((request.get_json(silent=True) or {}).get('question') or '').strip()
+    else:
+        question = request.args.get('question', '').strip()
+    
+    if not question:
+        return jsonify({
+            'success': False,
+            'error': 'Question is required'
+        }), 400
+    
+    logger.info(f" Streaming question: {question}")
+    retry_ai_system_init()
+    
+    def generate():
+        start_time = time.time()
+        response_data = None
+        try:
+            analysis = QueryAnalysis(question)
+            definition_id = detect_definition_query(question, analysis)
+            definition_data = create_definition_response(definition_id, question) if definition_id else None
+            
+            if definition_data:
+                yield format_sse('answer', {'answer': definition_data['answer']})
+                response_data = definition_data
+                response_data.update({
+                    'ai_system': 'definitions_database',
+                    'tokens_used': 0,
+                    'estimated_cost': 0.0,
+                    'intent_detected': 'definition',
+                    'cache_hit': False
+                })
+                
+            elif ai_system_available and USE_SIMPLIFIED_SYSTEM and simplified_system:
+                for event, data in simplified_system.stream_query(question, verbose=True, analysis=analysis):
+                    if event == 'done':
+                        response_data = data
+                    else:
+                        yield format_sse(event, data)
+                        
+            elif ai_system_available:
+                # Legacy hybrid path has no streaming chat call; send its answer whole
+                response_data = get_hybrid_interpretation(question, verbose=True, analysis=analysis)
+                yield format_sse('answer', {'answer': response_data['answer']})
+                
+            else:
+                response_data = {
+                    'answer': "AI system temporarily unavailable. Please try again or contact support.",
+                    'source': 'fallback',
+                    'confidence': 'low',
+                    'ai_system': 'fallback'
+                }
+                yield format_sse('answer', {'answer': response_data['answer']})
+            
+            response_time = round(time.time() - start_time, 2)
+            response_data.setdefault('time_to_first_token', response_time)
+            response_data.setdefault('ai_system', 'production_hybrid')
+            response_data.update({
+                'success': response_data.get('source') != 'error',
+                'question': question,
+                'club_id': 'columbia_cc',
+                'rule_type': response_data.get('rule_type') or ('local' if 'Columbia' in response_data['answer'] else 'official'),
+                'response_time': response_time,
+                'estimated_cost': round(response_data.get('tokens_used', 0) * 0.00001, 4),
+                'timestamp': datetime.now().isoformat()
+            })
+            response_data.pop('error', None)
+            yield format_sse('done', response_data)
+            metrics.record_request(response_data, time.time() - start_time)
+            
+            try:
+                comprehensive_log = {
+                    "timestamp": datetime.now().isoformat(),
+                    "question": question,
+                    "answer": response_data.get('answer', ''),
+                    "source": response_data.get('source', ''),
+                    "rule_type": response_data.get('rule_type', ''),
+                    "confidence": response_data.get('confidence', ''),
+                    "tokens_used": response_data.get('tokens_used', 0),
+                    "estimated_cost": response_data.get('estimated_cost', 0),
+                    "response_time": response_data.get('response_time', 0),
+                    "time_to_first_token": response_data.get('time_to_first_token'),
+                    "intent_detected": response_data.get('intent_detected', ''),
+                    "cache_hit": response_data.get('cache_hit', False),
+                    "prompt_tokens": response_data.get('prompt_tokens'),
+                    "cached_tokens": response_data.get('cached_tokens'),
+                    "streamed": True,
+                    "success": response_data.get('success', False)
+                }
+                logger.info(f"GOLF_QUERY: {json.dumps(comprehensive_log)}")
+                
+            except Exception as e:
+                logger.error(f"Dashboard logging error: {e}")
+                
+        except Exception as e:
+            logger.error(f" Streaming API Error: {str(e)}")
+            yield format_sse('error', {'error': f'Failed to process question: {str(e)}'})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop reverse proxies from buffering the stream
+    })
+
 @app.route('/api/definitions', methods=['GET'])
 def get_definitions():
     """Get golf definitions - can search or get by category."""
@@ -1915,6 +2330,9 @@ def health_check():
     official_rules_count = len(RULES_DATABASE)
     definitions_count = len(GOLF_DEFINITIONS_DATABASE)
     
+    # Read the registered engine only - a health check must never trigger a build
+    search_engine = app.extensions.get('golf_search_engine')
+    
     return jsonify({
         'status': 'healthy',
         'service': 'production_hybrid_golf_rules',
@@ -1928,7 +2346,13 @@ def health_check():
             'local_rules_loaded': local_rules_count,
             'official_rules_loaded': official_rules_count,
             'definitions_loaded': definitions_count,
-            'total_rules': local_rules_count + official_rules_count
+            'total_rules': local_rules_count + official_rules_count,
+            'embedding_backend': search_engine.embedder.name if search_engine else None,
+            'search_degraded': search_engine.is_degraded() if search_engine else None
+        },
+        'caches': {
+            'query_embeddings': search_engine.query_cache.stats() if search_engine else None,
+            'answers': simplified_system.answer_cache.stats() if simplified_system and simplified_system.answer_cache else None
         },
         'features': {
             'template_matching': True,
@@ -1940,6 +2364,46 @@ def health_check():
         }
     })
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness probe: 503 until startup warm-up has finished (use for Cloud Run startup probes).
+    Reports the worker that answers the probe; every worker also retries a failed AI
+    initialization on its own requests (retry_ai_system_init).
+    """
+    if not is_ready():
+        retry_ai_system_init()
+    
+    ready = is_ready()
+    return jsonify({
+        'ready': ready,
+        'ai_available': ai_system_available,
+        'warmed_up': bool(app.extensions.get('golf_warmed_up')),
+        'timestamp': datetime.now().isoformat()
+    }), 200 if ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage latency histograms and route/token/cache counters in Prometheus text format."""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/answer-cache/invalidate', methods=['POST'])
+def invalidate_answer_cache():
+    """
+    Drop all cached AI answers, e.g. after a local rules or clarifications update. Every
+    worker of this instance drops its entries (shared invalidation generation, see
+    answer_cache.py); other instances need their own call.
+    """
+    if not simplified_system:
+        return jsonify({'success': False, 'error': 'Simplified system not initialized'}), 503
+    
+    simplified_system.invalidate_answer_cache()
+    return jsonify({
+        'success': True,
+        'kb_version': simplified_system.kb_version,
+        'timestamp': datetime.now().isoformat()
+    })
+
 @app.route('/api/quick-questions', methods=['GET'])
 def get_quick_questions():
     """Test questions covering the full system capability."""
@@ -2165,6 +2629,8 @@ logger.info(f"  - {len(COLUMBIA_CC_LOCAL_RULES.get('local_rules', []))} Columbia
 logger.info(f"  - {len(RULES_DATABASE)} official golf rules")
 
 ai_initialized = initialize_ai_system()
+_last_init_attempt = time.time()
+warm_up()
 
 if ai_initialized: 
     logger.info(" Production Hybrid System Ready - Templates + AI + Rule Scoring + Local Precedence!")